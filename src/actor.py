@@ -1,16 +1,17 @@
 from app import App
 from compendium import CompendiumMgr
 from component import *
+from edit import SharedEdit
 from gmd import GameDataMgr, FlagHandle
+from instrument import Tracer
 from pack import ActorPack
 from res import ResourceSystem
-from rsdb import RSDBMgr
+from rsdb import RSDBMgr, scale_weapon_dmg
 from utils import *
 
 import oead
 
-from math import ceil, floor
-from typing import List
+from typing import Dict, List
 
 class Actor:
     # GameData flag presets -> list of lists (list of flags)
@@ -81,8 +82,16 @@ class Actor:
         if self._pack is not None:
             self._pack.name = name
     
+    # if edits is provided, every change made to the shared managers is also recorded there so it can be replayed
     @staticmethod
-    def copy(name: str, base_actor_name: str) -> "Actor":
+    def copy(name: str, base_actor_name: str, edits: List[SharedEdit] | None = None) -> "Actor":
+        # everything underneath gets tagged with the actor so the trace can be broken down per actor
+        tracer: Tracer = Tracer.get()
+        with tracer.span("Actor.copy", "actor", actor=name, base=base_actor_name), tracer.profile(f"Actor.copy_{name}"):
+            return Actor._copy(name, base_actor_name, edits)
+
+    @staticmethod
+    def _copy(name: str, base_actor_name: str, edits: List[SharedEdit] | None = None) -> "Actor":
         if name == base_actor_name:
             return Actor(name)
         sys = ResourceSystem.get()
@@ -93,36 +102,35 @@ class Actor:
         else:
             actor = Actor(base_actor_name)
             actor.name = name
-        rsdb_mgr.actorinfo.copy_row_to(base_actor_name, name)
+        SharedEdit("rsdb", "copy_row_to", (base_actor_name, name), "actorinfo").run(edits)
         actor._actor_info = rsdb_mgr.actorinfo.find_row(name)
-        rsdb_mgr.gameactorinfo.copy_row_to(base_actor_name, name)
+        SharedEdit("rsdb", "copy_row_to", (base_actor_name, name), "gameactorinfo").run(edits)
         actor._game_info = rsdb_mgr.gameactorinfo.find_row(name)
-        rsdb_mgr.tagtable.copy_actor(name, base_actor_name)
+        SharedEdit("rsdb", "copy_actor", (name, base_actor_name), "tagtable").run(edits)
         actor._tags = rsdb_mgr.tagtable.get_actor_tags(name)
         if actor._pouch_info is not None:
-            rsdb_mgr.pouchactorinfo.copy_row(base_actor_name, name)
+            SharedEdit("rsdb", "copy_row", (base_actor_name, name), "pouchactorinfo").run(edits)
         if actor._has_compendium_entry:
-            comp_mgr: CompendiumMgr = CompendiumMgr.get()
-            comp_mgr.copy_compendium_data(base_actor_name, name)
-            actor.copy_flags(base_actor_name, Actor.GENERIC_COMPENDIUM)
+            SharedEdit("compendium", "copy_compendium_data", (base_actor_name, name)).run(edits)
+            actor.copy_flags(base_actor_name, Actor.GENERIC_COMPENDIUM, edits)
         if actor._pack is not None:
             actor._pack.name = name
             for component in actor._pack._components:
                 component.actor = name
             if (attachment_component := actor._pack.get_component("AttachmentRef")) is not None:
-                attachment_component.copy(base_actor_name, name)
+                attachment_component.copy(base_actor_name, name, edits)
             if (pouch_content_component := actor._pack.get_component("PouchContentRef")) is not None:
-                actor.copy_flags(base_actor_name, Actor.GENERIC_POUCH)
+                actor.copy_flags(base_actor_name, Actor.GENERIC_POUCH, edits)
                 if attachment_component is not None and pouch_content_component.category in ["Material", "SpecialParts"]:
-                    actor.copy_flags(base_actor_name, Actor.GENERIC_THROWABLE_MATERIAL)
+                    actor.copy_flags(base_actor_name, Actor.GENERIC_THROWABLE_MATERIAL, edits)
             if (armor_component := actor._pack.get_component("ArmorRef")) is not None:
-                armor_component.copy(base_actor_name, name)
+                armor_component.copy(base_actor_name, name, edits)
             if (gp_tbl_component := actor._pack.get_component("GameParameterTableRef")) is not None:
                 if "EnemyCommonParam" in gp_tbl_component._param["Components"] and (path:= gp_tbl_component._param["Components"]["EnemyCommonParam"]) != "":
-                    actor.copy_flags(base_actor_name, Actor.GENERIC_ENEMY)
+                    actor.copy_flags(base_actor_name, Actor.GENERIC_ENEMY, edits)
                     # scuffed saving bc I don't feel like implementing GameParameterTable
                     gmd_mgr: GameDataMgr = GameDataMgr.get()
-                    enemy_common: oead.byml.Dictionary = TypedParam(oead.byml.from_binary(sys.load_file(path)), "game__enemy__EnemyCommonParam").data
+                    enemy_common: oead.byml.Dictionary = TypedParam(parse_byml(sys.load_file(path)), "game__enemy__EnemyCommonParam").data
                     enemy_common["DefeatedNumGameDataHash"] = gmd_mgr.hash(f"DefeatedEnemyNum.{actor._name}")
                     enemy_common["DefeatedNoDamageCountHash"] = gmd_mgr.hash(f"EnemyBattleData.{actor._name}.DefeatedNoDamageCount")
                     enemy_common["GuardJustCountHash"] = gmd_mgr.hash(f"EnemyBattleData.{actor._name}.GuardJustCount")
@@ -131,27 +139,31 @@ class Actor:
                     gp_tbl_component._param["Components"]["EnemyCommonParam"] = f"?GameParameter/EnemyCommonParam/{actor._name}.game__enemy__EnemyCommonParam.bgyml"
                     gp_tbl_component._needs_save = True
                     sys.save_archive_file(f"GameParameter/EnemyCommonParam/{actor._name}.game__enemy__EnemyCommonParam.bgyml",
-                                          oead.byml.to_binary(enemy_common, False, 7), ResourceSystem.ARCHIVE_CURRENT)
+                                          serialize_byml(enemy_common), ResourceSystem.ARCHIVE_CURRENT)
         return actor
     
     # move the mgr save calls to the app class
     def save(self) -> None:
         if self._pack is not None:
-            self._pack.save()
-
-    def copy_flags(self, old: str, preset: List[List[str | List[tuple[str, str]]]]) -> bool:
-        gmd_mgr: GameDataMgr = GameDataMgr.get()
-        handles: List[FlagHandle] = self.preset_to_handles(old, preset)
-        for handle in handles:
-            if not gmd_mgr.add_flag_handle(handle):
-                print(f"{handle.parent} failed to be added")
-                return False
-        return True
+            with Tracer.get().span("Actor.save", "actor", actor=self._name):
+                self._pack.save()
+
+    def copy_flags(self, old: str, preset: List[List[str | List[tuple[str, str]]]], edits: List[SharedEdit] | None = None) -> bool:
+        return Actor.copy_flags_bulk([(self._name, old, preset)], edits).get(self._name, True)
 
-    def preset_to_handles(self, to_copy: str, preset: List[List[str | List[tuple[str, str]]]]) -> List[FlagHandle]:
+    # copies the flags of many actors in one go, copies are (new actor, actor to copy from, preset)
+    # returns whether each actor's flags were added
+    @staticmethod
+    def copy_flags_bulk(copies: List[tuple[str, str, List[List[str | List[tuple[str, str]]]]]],
+                        edits: List[SharedEdit] | None = None) -> Dict[str, bool]:
+        handles: List[FlagHandle] = [handle for name, old, preset in copies for handle in Actor.preset_to_handles(name, old, preset)]
+        return SharedEdit("gmd", "add_flag_handles", (handles,)).run(edits)
+
+    @staticmethod
+    def preset_to_handles(name: str, to_copy: str, preset: List[List[str | List[tuple[str, str]]]]) -> List[FlagHandle]:
         handles: List[FlagHandle] = []
         for flag in preset:
-            handles.append(FlagHandle(self._name, flag[0], to_copy, flag[1], flag[2]))
+            handles.append(FlagHandle(name, flag[0], to_copy, flag[1], flag[2]))
         return handles
     
     def get_or_add_component(self, name: str) -> ComponentBase:
@@ -167,9 +179,6 @@ class Actor:
             self._actor_info["AnimationResources"] = to_array([])
         self._actor_info["AnimationResources"].append(to_dict({"ModelProjectName" : name, "IsRetarget" : retarget,
                                                           "IgnoreRetargetRate" : ignore_retarget_rate, "RetargetModel" : retarget_model}))
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        # I don't like having to set this manually but not sure how to avoid that without manually creating settings for every param
-        rsdb_mgr.actorinfo._is_changed = True
         if self._pack is None:
             return
         anim_component: AnimationComponent | None = self.get_or_add_component("AnimationRef")
@@ -181,8 +190,6 @@ class Actor:
         for i, resource in enumerate(self._actor_info["AnimationResources"]):
             if resource["ModelProjectName"] == name:
                 self._actor_info["AnimationResources"].pop(i)
-                rsdb_mgr: RSDBMgr = RSDBMgr.get()
-                rsdb_mgr.actorinfo._is_changed = True
                 if self._pack is None:
                     return
                 else:
@@ -193,8 +200,6 @@ class Actor:
     def set_model(self, fmdb_name: str, project_name: str) -> None:
         self._actor_info["FmdbName"] = fmdb_name
         self._actor_info["ModelProjectName"] = project_name
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.actorinfo._is_changed = True
         if self._pack is None:
             return
         model_component: ModelInfoComponent | None = self.get_or_add_component("ModelInfoRef")
@@ -203,8 +208,6 @@ class Actor:
 
     def set_slink_user(self, username: str) -> None:
         self._actor_info["SLinkUserName"] = username
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.actorinfo._is_changed = True
         if self._pack is None:
             return
         slink_component: SLinkComponent | None = self.get_or_add_component("SLinkRef")
@@ -212,8 +215,6 @@ class Actor:
     
     def set_elink_user(self, username: str) -> None:
         self._actor_info["ELinkUserName"] = username
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.actorinfo._is_changed = True
         if self._pack is None:
             return
         elink_component: ELinkComponent | None = self.get_or_add_component("ELinkRef")
@@ -228,8 +229,6 @@ class Actor:
         self.actor_info[key].append(to_dict({
             "FileName" : anim, "IsRandom" : is_random
         }))
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.actorinfo._is_changed = True
         if self._pack is None:
             return True
         as_info_component: ASInfoComponent = self.get_or_add_component("ASInfoRef")
@@ -243,8 +242,6 @@ class Actor:
         for i, a in enumerate(self.actor_info[key]):
             if a["FileName"] == anim:
                 self.actor_info[key].pop(i)
-                rsdb_mgr: RSDBMgr = RSDBMgr.get()
-                rsdb_mgr.actorinfo._is_changed = True
                 if self._pack is None:
                     return True
                 else:
@@ -257,8 +254,6 @@ class Actor:
         if priority not in ["Auto", "Highest", "High", "Normal", "Low", "NormalForce", "LowForce", "HighIfSingle"]:
             return False
         self._game_info["CreatePriority"] = priority
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.gameactorinfo._is_changed = True
         return True
     
     def set_use_common_name(self, use: bool) -> None:
@@ -292,7 +287,6 @@ class Actor:
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
         self._pouch_info["ArmorNextRankActor"] = actor
-        rsdb_mgr.pouchactorinfo._is_changed = True
     
     def set_armor_series_name(self, name: str) -> None:
         armor_component: ArmorComponent = self.get_or_add_component("ArmorRef")
@@ -305,7 +299,6 @@ class Actor:
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
         self._pouch_info["EquipmentPerformance"] = defense
-        rsdb_mgr.pouchactorinfo._is_changed = True
 
     def set_armor_rank(self, rank: oead.S32) -> None:
         armor_component: ArmorComponent = self.get_or_add_component("ArmorRef")
@@ -314,7 +307,6 @@ class Actor:
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
         self._pouch_info["ArmorRank"] = rank
-        rsdb_mgr.pouchactorinfo._is_changed = True
     
     def set_upgrade_price(self, price: oead.S32) -> None:
         armor_component: ArmorComponent = self.get_or_add_component("ArmorRef")
@@ -323,14 +315,14 @@ class Actor:
         enhance_info: oead.byml.Dictionary
         sys: ResourceSystem = ResourceSystem.get()
         if "EnhancementMaterial" in gp_tbl_component._param["Components"] and (path := gp_tbl_component._param["Component"]["EnhancementMaterial"]) != "":
-            enhance_info = TypedParam(oead.byml.from_binary(sys.load_file(path)), "game__pouchcontent__EnhancementMaterial").data
+            enhance_info = TypedParam(parse_byml(sys.load_file(path)), "game__pouchcontent__EnhancementMaterial").data
         else:
             enhance_info = copy_dict(TypedParam.load_default("game__pouchcontent__EnhancementMaterial"))
         enhance_info["Price"] = price
         gp_tbl_component._param["Components"]["EnhancementMaterial"] = f"?GameParameter/EnhancementMaterial/{self._name}.game__pouchcontent__EnhancementMaterial.bgyml"
         gp_tbl_component._needs_save = True
         sys.save_archive_file(f"GameParameter/EnhancementMaterial/{self._name}.game__pouchcontent__EnhancementMaterial.bgyml",
-                                oead.byml.to_binary(enhance_info, False, 7), ResourceSystem.ARCHIVE_CURRENT)
+                                serialize_byml(enhance_info), ResourceSystem.ARCHIVE_CURRENT)
     
     def add_armor_effect(self, effect: str, level: oead.S32 = 1) -> None:
         armor_component: ArmorComponent = self.get_or_add_component("ArmorRef")
@@ -341,7 +333,6 @@ class Actor:
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
         self._pouch_info["ArmorEffectType"] = effect
-        rsdb_mgr.pouchactorinfo._is_changed = True
 
     def add_armor_hide_group(self, group_name: str, materials: List[str]) -> None:
         armor_component: ArmorComponent = self.get_or_add_component("ArmorRef")
@@ -356,14 +347,14 @@ class Actor:
         enhance_info: oead.byml.Dictionary
         sys: ResourceSystem = ResourceSystem.get()
         if "EnhancementMaterial" in gp_tbl_component._param["Components"] and (path := gp_tbl_component._param["Component"]["EnhancementMaterial"]) != "":
-            enhance_info = TypedParam(oead.byml.from_binary(sys.load_file(path)), "game__pouchcontent__EnhancementMaterial").data
+            enhance_info = TypedParam(parse_byml(sys.load_file(path)), "game__pouchcontent__EnhancementMaterial").data
         else:
             enhance_info = copy_dict(TypedParam.load_default("game__pouchcontent__EnhancementMaterial"))
         enhance_info["Items"].append(to_dict({"Actor" : material, "Number" : count}))
         gp_tbl_component._param["Components"]["EnhancementMaterial"] = f"?GameParameter/EnhancementMaterial/{self._name}.game__pouchcontent__EnhancementMaterial.bgyml"
         gp_tbl_component._needs_save = True
         sys.save_archive_file(f"GameParameter/EnhancementMaterial/{self._name}.game__pouchcontent__EnhancementMaterial.bgyml",
-                                oead.byml.to_binary(enhance_info, False, 7), ResourceSystem.ARCHIVE_CURRENT)
+                                serialize_byml(enhance_info), ResourceSystem.ARCHIVE_CURRENT)
 
     def add_shield_hide_group(self, group_name: str, materials: List[str]) -> None:
         shield_component: ShieldComponent = self.get_or_add_component("ShieldRef")
@@ -384,7 +375,6 @@ class Actor:
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
         self._pouch_info["EquipmentPerformance"] = dmg
-        rsdb_mgr.pouchactorinfo._is_changed = True
     
     def set_shield_dmg(self, dmg: oead.S32) -> None:
         shield_component: ShieldComponent = self.get_or_add_component("ShieldRef")
@@ -404,13 +394,7 @@ class Actor:
         rsdb_mgr: RSDBMgr = RSDBMgr.get()
         if self._pouch_info is None:
             self._pouch_info = rsdb_mgr.pouchactorinfo.add_row_by_id(self._name)
-        if weapon_component.weapon_type == "SmallSword":
-            self._pouch_info["EquipmentPerformance"] = dmg
-        elif weapon_component.weapon_type == "Spear":
-            self._pouch_info["EquipmentPerformance"] = oead.S32(int(ceil(int(dmg) * 1.326856)))
-        else:
-            self._pouch_info["EquipmentPerformance"] = oead.S32(int(floor(int(dmg) * 0.95)))
-        rsdb_mgr.pouchactorinfo._is_changed = True
+        self._pouch_info["EquipmentPerformance"] = oead.S32(scale_weapon_dmg(dmg, weapon_component.weapon_type))
 
     def set_weapon_subtypes(self, subtypes: List[str]) -> None:
         weapon_component: WeaponComponent = self.get_or_add_component("WeaponRef")
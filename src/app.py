@@ -1,13 +1,30 @@
+from catalog import ActorCatalog
 from compendium import CompendiumMgr
 from component import ComponentFactory
+from depgraph import DependencyGraph
 from gmd import GameDataMgr
+from instrument import Tracer
+from journal import ChangeJournal, Edit
 from logic import LogicMgr
+from refindex import ReferenceIndex
 from res import ResourceSystem
-from rsdb import RSDBMgr
+from rsdb import RSDB_EXT_MAP, RSDBMgr
+from session import file_stat, read_session, read_session_info, write_session
+from strpool import StringPool
+
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
 
 GLOBAL_APP_INSTANCE = None
+GLOBAL_APPCACHE_INSTANCE = None
 
 class App:
+    SNAPSHOT_NAME: str = ".session.snapshot"
+
+    # what goes in a snapshot, the component factory and catalog are cheap to set up again
+    SESSION_MEMBERS: tuple = ("sys", "journal", "compact_rsdb", "rsdb_mgr", "gmd_mgr", "comp_mgr", "logic_mgr", "dep_graph", "ref_index")
+
     @classmethod
     def get(cls) -> "App":
         global GLOBAL_APP_INSTANCE
@@ -15,20 +32,225 @@ class App:
             raise ValueError("App backend has not yet been initialized")
         return GLOBAL_APP_INSTANCE
 
-    def __init__(self, project_path: str, romfs_path: str, enable_logs: bool = True):
+    # compact_rsdb trades slower row edits for much lower memory use on the RSDB tables
+    def __init__(self, project_path: str, romfs_path: str, enable_logs: bool = True, compact_rsdb: bool = False):
         self.sys = ResourceSystem(project_path, romfs_path, enable_logs) # initialize ResourceSystem
-        self.rsdb_mgr: RSDBMgr = RSDBMgr()
+        self.journal: ChangeJournal = ChangeJournal() # needs to exist before the managers
+        self.compact_rsdb: bool = compact_rsdb
+        self.rsdb_mgr: RSDBMgr = RSDBMgr(compact_rsdb)
         self.gmd_mgr: GameDataMgr = GameDataMgr()
         self.comp_mgr: CompendiumMgr = CompendiumMgr()
         self.logic_mgr: LogicMgr = LogicMgr()
         self.component_factory: ComponentFactory = ComponentFactory()
+        self.dep_graph: DependencyGraph = DependencyGraph() # loads the existing index, refresh() rescans the packs that changed, build() everything
+        self.ref_index: ReferenceIndex = ReferenceIndex() # same as above, refresh() rescans only the packs that changed
+        self.catalog: ActorCatalog = ActorCatalog(project_path, romfs_path) # call build() to (re)generate it
+        self._layer_revisions: Dict[str, int] = self._current_layer_revisions()
 
         global GLOBAL_APP_INSTANCE
         GLOBAL_APP_INSTANCE = self
     
+    # restores the snapshot in the cache directory (see ResourceSystem.cache_dir) if it's still up to date, otherwise loads everything and writes a
+    # new snapshot for next time
+    @classmethod
+    def open(cls, project_path: str, romfs_path: str, enable_logs: bool = True, compact_rsdb: bool = False) -> "App":
+        path: str = os.path.join(ResourceSystem.cache_dir(project_path, romfs_path), App.SNAPSHOT_NAME)
+        if (app := cls.restore(path, project_path, romfs_path, compact_rsdb)) is not None:
+            app.sys._is_log = enable_logs
+            return app
+        app = cls(project_path, romfs_path, enable_logs, compact_rsdb)
+        try:
+            app.snapshot(path)
+        except Exception as e: # not being able to write one just means the next start is slow too
+            print(f"Could not write session snapshot: {e}")
+        return app
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.sys.cache_path, App.SNAPSHOT_NAME)
+
+    # everything the loaded state depends on: the files read so far, the zstd dictionaries and the project's indexes
+    def _session_files(self) -> Dict[str, List[int] | None]:
+        files: Dict[str, List[int] | None] = dict(self.sys.read_files)
+        for path in (os.path.join(self.sys.romfs_path, "Pack/ZsDic.pack.zs"), os.path.abspath("res/hashes.byml"),
+                     self.sys.manifest_path, self.dep_graph.index_path, self.ref_index.index_path):
+            files[path] = file_stat(path)
+        return files
+
+    # writes the whole parsed state (including anything that hasn't been saved yet) so restore() can skip loading it all
+    # again, the undo history isn't kept
+    def snapshot(self, path: str = "") -> int:
+        info: Dict[str, Any] = {
+            "RomfsPath" : self.sys.romfs_path,
+            "ProjectPath" : self.sys.project_path,
+            "CompactRsdb" : self.compact_rsdb,
+            "Files" : self._session_files()
+        }
+        with Tracer.get().span("App.snapshot", "app"):
+            return write_session(path or self.snapshot_path, info, {name: getattr(self, name) for name in App.SESSION_MEMBERS})
+
+    # the snapshot is out of date if any file it was loaded from changed or if a file that was loaded from the romfs
+    # now exists in the project directory (and would be loaded from there instead)
+    @staticmethod
+    def is_snapshot_current(info: Dict[str, Any]) -> bool:
+        for path, stat in info["Files"].items():
+            if file_stat(path) != stat:
+                return False
+            if not (local_path := os.path.relpath(path, info["RomfsPath"])).startswith(".."):
+                if os.path.exists(os.path.join(info["ProjectPath"], local_path)):
+                    return False
+        return True
+
+    # None if there's no snapshot or it doesn't match the given paths/is out of date
+    @classmethod
+    def restore(cls, path: str, project_path: str = "", romfs_path: str = "", compact_rsdb: bool | None = None) -> "App | None":
+        if (info := read_session_info(path)) is None:
+            return None
+        if (project_path and os.path.abspath(project_path) != os.path.abspath(info["ProjectPath"])) or \
+           (romfs_path and os.path.abspath(romfs_path) != os.path.abspath(info["RomfsPath"])) or \
+           (compact_rsdb is not None and compact_rsdb != info["CompactRsdb"]) or not App.is_snapshot_current(info):
+            return None
+        with Tracer.get().span("App.restore", "app"):
+            state: Dict[str, Any] = read_session(path)
+        app: App = cls.__new__(cls)
+        app.__dict__.update(state)
+        app.component_factory = ComponentFactory()
+        app.catalog = ActorCatalog(app.sys.project_path, app.sys.romfs_path)
+        app._layer_revisions = app._current_layer_revisions()
+        app._set_instances()
+        return app
+
+    # members that are loaded from a fixed set of files (relative to the romfs/project) -> (prefix of their journal
+    # targets, files, how to load it again)
+    def _layers(self) -> Dict[str, tuple[str, List[str], Callable[[], Any]]]:
+        version: int = self.sys.version
+        return {
+            "rsdb_mgr" : ("RSDB/", [f"RSDB/{name}.Product.{version}.rstbl.byml.zs" for name in ["Tag", *RSDB_EXT_MAP]],
+                          lambda: RSDBMgr(self.compact_rsdb)),
+            "gmd_mgr" : (GameDataMgr.TARGET, [f"GameData/GameDataList.Product.{100 if version == 100 else 110}.byml.zs"], GameDataMgr),
+            "comp_mgr" : ("Compendium/", ["Pack/ResidentCommon.pack.zs"], CompendiumMgr),
+            "logic_mgr" : (LogicMgr.TARGET, [self.logic_mgr.path], LogicMgr)
+        }
+
+    def _current_layer_revisions(self) -> Dict[str, int]:
+        return {member: self.journal.total_revision(prefix) for member, (prefix, files, load) in self._layers().items()}
+
+    # switches this App over to another project on the same romfs without loading everything again, the romfs data
+    # (zstd dictionaries, resident archives, tables) is kept unless either project has its own copy of it or it was
+    # edited for the old project, the indexes always belong to the project so they're loaded again
+    # returns the members that were kept
+    def change_project(self, project_path: str) -> List[str]:
+        if self.journal.changed_targets:
+            raise ValueError(f"{self.sys.project_path} has unsaved changes")
+        self._set_instances()
+        old_project_path: str = self.sys.project_path
+        layers: Dict[str, tuple[str, List[str], Callable[[], Any]]] = self._layers()
+        kept: List[str] = [
+            member for member, (prefix, files, load) in layers.items()
+            if self.journal.total_revision(prefix) == self._layer_revisions.get(member)
+            and not any(os.path.exists(os.path.join(path, file)) for path in (old_project_path, project_path) for file in files)
+        ]
+        with Tracer.get().span("App.change_project", "app", project=project_path, kept=len(kept)):
+            self.sys.change_project_dir(project_path, False)
+            self.journal.clear_history() # the edits belong to the old project
+            for member, (prefix, files, load) in layers.items():
+                if member not in kept:
+                    setattr(self, member, load())
+            self.dep_graph = DependencyGraph()
+            self.ref_index = ReferenceIndex()
+            self.component_factory = ComponentFactory()
+            self.catalog = ActorCatalog(project_path, self.sys.romfs_path)
+            self._layer_revisions = self._current_layer_revisions()
+            self._set_instances()
+        return kept
+
+    # restored objects skip __init__ so they have to be made the current instances here
+    def _set_instances(self) -> None:
+        import compendium, depgraph, gmd, journal, logic, refindex, res, rsdb
+        res.GLOBAL_RESOURCESYSTEM_INSTANCE = self.sys
+        journal.GLOBAL_CHANGEJOURNAL_INSTANCE = self.journal
+        rsdb.GLOBAL_RSDBMGR_INSTANCE = self.rsdb_mgr
+        gmd.GLOBAL_GAMEDATAMGR_INSTANCE = self.gmd_mgr
+        compendium.GLOBAL_COMPENDIUMMGR_INSTANCE = self.comp_mgr
+        logic.GLOBAL_LOGICMGR_INSTANCE = self.logic_mgr
+        depgraph.GLOBAL_DEPGRAPH_INSTANCE = self.dep_graph
+        refindex.GLOBAL_REFINDEX_INSTANCE = self.ref_index
+        global GLOBAL_APP_INSTANCE
+        GLOBAL_APP_INSTANCE = self
+
+    # each manager only writes the files the journal has marked as changed
     def save(self) -> None:
-        self.rsdb_mgr.save()
-        self.gmd_mgr.save()
-        self.comp_mgr.save()
-        self.logic_mgr.save()
-        self.sys.save()
\ No newline at end of file
+        tracer: Tracer = Tracer.get()
+        with tracer.span("App.save", "app"), tracer.profile("App.save"):
+            self.rsdb_mgr.save()
+            self.gmd_mgr.save()
+            self.comp_mgr.save()
+            self.logic_mgr.save()
+            self.sys.save()
+
+    def undo(self) -> Edit | None:
+        return self.journal.undo()
+
+    def redo(self) -> Edit | None:
+        return self.journal.redo()
+
+    # what the shared string pool has saved so far per subsystem
+    def memory_report(self) -> str:
+        return StringPool.get().format_report()
+
+    def edit_summary(self) -> str:
+        return "\n".join(f"{target}: {count} edit(s)" for target, count in self.journal.summary().items())
+
+# Loaded Apps by (romfs, project, compact_rsdb) so going back to a project that was already opened is free, a project that isn't
+# loaded yet takes over an App with the same romfs (through App.change_project) if it has nothing unsaved, otherwise
+# it's opened like normal
+# Apps with unsaved changes are never dropped to make room
+class AppCache:
+    @classmethod
+    def get(cls) -> "AppCache":
+        global GLOBAL_APPCACHE_INSTANCE
+        if GLOBAL_APPCACHE_INSTANCE is None:
+            GLOBAL_APPCACHE_INSTANCE = cls()
+        return GLOBAL_APPCACHE_INSTANCE
+
+    def __init__(self, size: int = 2):
+        self.size: int = size
+        self._apps: OrderedDict[tuple[str, str, bool], App] = OrderedDict() # least recently used first
+
+    # compact_rsdb is part of the key so asking for the other mode opens a second App instead of replacing (and losing
+    # the unsaved changes of) the cached one
+    @staticmethod
+    def key(project_path: str, romfs_path: str, compact_rsdb: bool = False) -> tuple[str, str, bool]:
+        return os.path.abspath(romfs_path), os.path.abspath(project_path), compact_rsdb
+
+    def find(self, project_path: str, romfs_path: str, compact_rsdb: bool = False) -> App | None:
+        return self._apps.get(AppCache.key(project_path, romfs_path, compact_rsdb))
+
+    # also makes it the current App
+    def open(self, project_path: str, romfs_path: str, enable_logs: bool = True, compact_rsdb: bool = False) -> App:
+        key: tuple[str, str, bool] = AppCache.key(project_path, romfs_path, compact_rsdb)
+        app: App | None
+        if (app := self._apps.get(key)) is not None:
+            self._apps.move_to_end(key)
+            app._set_instances()
+            return app
+        for other_key, other in self._apps.items():
+            if other_key[0] == key[0] and other_key[2] == compact_rsdb and not other.journal.changed_targets:
+                # taken out first so an App that failed halfway through switching doesn't stay in the cache
+                del self._apps[other_key]
+                other.change_project(project_path)
+                app = other
+                break
+        else:
+            app = App.open(project_path, romfs_path, enable_logs, compact_rsdb)
+        self._apps[key] = app
+        self._evict(key)
+        return app
+
+    def _evict(self, keep: tuple[str, str, bool]) -> None:
+        clean: List[tuple[str, str, bool]] = [key for key, app in self._apps.items() if key != keep and not app.journal.changed_targets]
+        for key in clean[:max(len(self._apps) - self.size, 0)]:
+            del self._apps[key]
+
+    def clear(self) -> None:
+        self._apps.clear()
@@ -0,0 +1,368 @@
+# Benchmarks for the load/edit/save hot paths, run from the repo root:
+#   python src/bench.py [--filter name] [--repeat N] [--scale F] [--history bench_history.jsonl]
+# Everything runs on a synthetic romfs generated into a temp directory so no game files are needed
+# Every run gets appended to the history file and compared against the previous run to catch regressions
+
+from archive import Archive
+from gmd import GAMEDATA_TYPES, GameDataMgr
+from res import ResourceSystem
+from rsdb import TagTable
+from typedparam import TypedParam
+from utils import *
+
+import mmh3
+import oead
+import zstandard
+from bitarray import bitarray
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+VERSION: int = 121
+BASE_ACTOR: str = "Bench_Base"
+
+def hash32(string: str) -> oead.U32:
+    return oead.U32(mmh3.hash(string, signed=False))
+
+# Generates a fake romfs with enough of the real structure for App to load
+# Sizes are roughly those of the real game (scale multiplies all of the counts)
+class SyntheticRomfs:
+    def __init__(self, path: str, scale: float = 1.0, seed: int = 0):
+        self.path: str = path
+        self.scale: float = scale
+        self._rng: random.Random = random.Random(seed)
+        self._ctx: List[zstandard.ZstdCompressor] = []
+        self.actor_count: int = max(int(10000 * scale), 16)
+        self.tag_count: int = 256
+        self.actors: List[str] = [BASE_ACTOR] + [f"Bench_Actor_{i:05}" for i in range(self.actor_count - 1)]
+        self.pack_count: int = max(int(64 * scale), 4) # only a subset of actors need actual packs
+
+    def count(self, n: int) -> int:
+        return max(int(n * self.scale), 1)
+
+    def generate(self) -> None:
+        self.write_dicts()
+        self.write("System/RegionLangMask.txt", f"0\n0\n{VERSION}\n".encode(), -1)
+        self.write_rsdb()
+        self.write_gamedata()
+        self.write_logic()
+        self.write_resident()
+        self.write("Pack/Bootup.Nin_NX_NVN.pack.zs", self.sarc({"System/Bench.txt": b"bench"}), 3)
+        for actor in self.actors[:self.pack_count]:
+            self.write_actor_pack(actor)
+
+    def write(self, path: str, data: bytes, dict_id: int) -> None:
+        full_path: str = os.path.join(self.path, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(data if dict_id == -1 else self._ctx[dict_id].compress(data))
+
+    @staticmethod
+    def sarc(files: Dict[str, bytes]) -> bytes:
+        writer: oead.SarcWriter = oead.SarcWriter(oead.Endianness.Little)
+        for name, data in files.items():
+            writer.files[name] = data
+        return writer.write()[1]
+
+    # The ZstdContext expects the zs, bcett and pack dictionaries to have the IDs 1, 2 and 3
+    def write_dicts(self) -> None:
+        samples: List[bytes] = [oead.byml.to_binary(to_array([self.actor_info_row(f"Sample_{i}_{j}") for j in range(4)]), False, 7)
+                                for i in range(512)]
+        dicts: List[zstandard.ZstdCompressionDict] = [zstandard.train_dictionary(16384, samples, dict_id=i) for i in range(1, 4)]
+        self._ctx = [zstandard.ZstdCompressor(level=3)] + [
+            zstandard.ZstdCompressor(level=3, dict_data=d, write_dict_id=True, write_content_size=True) for d in dicts
+        ]
+        self.write("Pack/ZsDic.pack.zs", self.sarc({
+            "zs.zsdic" : dicts[0].as_bytes(), "bcett.byml.zsdic" : dicts[1].as_bytes(), "pack.zsdic" : dicts[2].as_bytes()
+        }), 0)
+
+    def actor_info_row(self, name: str) -> oead.byml.Dictionary:
+        return to_dict({
+            "__RowId" : name,
+            "ActorCategory" : "Enemy",
+            "CalcRadius" : oead.F32(self._rng.random() * 10),
+            "ELinkUserName" : name,
+            "FmdbName" : f"{name}_Model",
+            "InstanceHeapSize" : oead.S32(self._rng.randrange(0, 0x100000)),
+            "ModelProjectName" : f"Bench/{name}",
+            "SLinkUserName" : name,
+            "Tags" : to_array(["Enemy", "Bench"])
+        })
+
+    def write_rsdb(self) -> None:
+        tables: Dict[str, Callable[[str], oead.byml.Dictionary]] = {
+            "ActorInfo" : self.actor_info_row,
+            "GameActorInfo" : lambda name: to_dict({"__RowId" : name, "CreatePriority" : "Normal", "Life" : oead.S32(100)}),
+            "PouchActorInfo" : lambda name: to_dict({"__RowId" : name, "EquipmentPerformance" : oead.S32(10), "Price" : oead.S32(20)}),
+            "AttachmentActorInfo" : lambda name: to_dict({"__RowId" : name, "AttachmentAdditionalDamage" : oead.S32(5)}),
+            "XLinkPropertyTable" : lambda name: to_dict({"__RowId" : name, "Property" : oead.S32(0)}),
+            "XLinkPropertyTableList" : lambda name: to_dict({"__RowId" : name, "Table" : name}),
+            "EnhancementMaterialInfo" : lambda name: to_dict({"__RowId" : f"Work/Actor/{name}.engine__actor__ActorParam.gyml",
+                                                              "Price" : oead.S32(10), "Items" : to_array([])})
+        }
+        for table, make_row in tables.items():
+            rows: oead.byml.Array = to_array([make_row(actor) for actor in self.actors])
+            self.write(f"RSDB/{table}.Product.{VERSION}.rstbl.byml.zs", oead.byml.to_binary(rows, False, 7), 1)
+        tags: List[str] = sorted(f"Tag{i:03}" for i in range(self.tag_count))
+        bits: List[int] = []
+        paths: List[str] = []
+        for actor in sorted(self.actors):
+            paths += ["Work/Actor/", actor, ".engine__actor__ActorParam.gyml"]
+            bits += [1 if self._rng.random() < 0.05 else 0 for tag in tags]
+        bit_table: bitarray = bitarray(bits)
+        bit_table.bytereverse()
+        self.write(f"RSDB/Tag.Product.{VERSION}.rstbl.byml.zs", oead.byml.to_binary(to_dict({
+            "BitTable" : oead.Bytes(bit_table.tobytes()), "PathList" : to_array(paths), "RankTable" : oead.Bytes(b''), "TagList" : to_array(tags)
+        }), False, 7), 1)
+
+    def flag(self, name: str, default: Any, **extra: Any) -> oead.byml.Dictionary:
+        flag: Dict[str, Any] = {
+            "Hash" : hash32(name), "DefaultValue" : default, "SaveFileIndex" : oead.S32(self._rng.randrange(-1, 7)),
+            "ResetTypeValue" : oead.S32(self._rng.randrange(0, 1024)), "ExtraByte" : oead.S32(self._rng.randrange(0, 81))
+        }
+        flag.update(extra)
+        return to_dict(flag)
+
+    def write_gamedata(self) -> None:
+        data: Dict[str, List[oead.byml.Dictionary]] = {datatype : [] for datatype in GAMEDATA_TYPES}
+        for i in range(self.count(40000)):
+            data["Bool"].append(self.flag(f"BenchBool_{i}", False))
+        for i in range(self.count(15000)):
+            data["Int"].append(self.flag(f"BenchInt_{i}", oead.S32(0)))
+        for i in range(self.count(5000)):
+            data["UInt"].append(self.flag(f"BenchUInt_{i}", oead.U32(0)))
+            data["Float"].append(self.flag(f"BenchFloat_{i}", oead.F32(0)))
+            data["Enum"].append(self.flag(f"BenchEnum_{i}", oead.U32(0), RawValues=to_array(["A", "B"]), Values=to_array([hash32("A"), hash32("B")])))
+        for i in range(self.count(2000)):
+            data["String64"].append(self.flag(f"BenchString_{i}", ""))
+            data["Vector3"].append(self.flag(f"BenchVector_{i}", to_dict({"x" : oead.F32(0), "y" : oead.F32(0), "z" : oead.F32(0)})))
+        for i in range(self.count(1000)):
+            data["IntArray"].append(self.flag(f"BenchIntArray_{i}", to_array([oead.S32(0)] * 8)))
+            data["BoolArray"].append(self.flag(f"BenchBoolArray_{i}", to_array([False] * 16), ArraySize=oead.U32(16)))
+        for i in range(self.count(10000)):
+            data["Bool64bitKey"].append(self.flag(f"BenchKey_{i}", False))
+        # everything Actor.copy needs for the compendium + pouch flag presets
+        data["Struct"].append(self.flag("PictureBookData", to_array([])))
+        data["Struct"].append(self.flag(f"PictureBookData.{BASE_ACTOR}", to_array([
+            to_dict({"Hash" : hash32("IsNew"), "Value" : hash32(f"PictureBookData.{BASE_ACTOR}.IsNew")}),
+            to_dict({"Hash" : hash32("State"), "Value" : hash32(f"PictureBookData.{BASE_ACTOR}.State")})
+        ])))
+        data["Bool"].append(self.flag(f"PictureBookData.{BASE_ACTOR}.IsNew", False))
+        data["Enum"].append(self.flag(f"PictureBookData.{BASE_ACTOR}.State", oead.U32(0)))
+        data["Bool"].append(self.flag(f"IsGet.{BASE_ACTOR}", False))
+        data["Bool"].append(self.flag(f"IsGetAnyway.{BASE_ACTOR}", False))
+        data["Struct"].append(self.flag("IsGet", to_array([])))
+        data["Struct"].append(self.flag("IsGetAnyway", to_array([])))
+        gdl: oead.byml.Dictionary = to_dict({
+            "Data" : to_dict({datatype : to_array(flags) for datatype, flags in data.items() if flags}),
+            "MetaData" : to_dict({
+                "SaveDirectory" : to_array(["slot"] + [""] * 6),
+                "SaveTypeHash" : to_array([to_dict({"SaveDirectory" : "slot", "SaveTypeHash" : hash32("slot")})])
+            })
+        })
+        self.write("GameData/GameDataList.Product.110.byml.zs", oead.byml.to_binary(gdl, False, 7), 1)
+
+    def write_logic(self) -> None:
+        nodes: oead.byml.Dictionary = to_dict({
+            f"Node{i:05}" : to_dict({"Inputs" : to_array([]), "Outputs" : to_array([]), "Type" : "Bench"}) for i in range(self.count(20000))
+        })
+        self.write("Logic/NodeDefinition/Node.Product.120.aidefn.byml.zs", oead.byml.to_binary(nodes, False, 7), 1)
+
+    def write_resident(self) -> None:
+        files: Dict[str, bytes] = {}
+        for category in ["Animal", "Enemy", "Material", "Treasure", "Weapon"]:
+            entries: List[str] = self.actors[:self.count(200)] if category == "Enemy" else [f"Bench_{category}_{i}" for i in range(self.count(100))]
+            files[f"Game/PictureBookInfo/{category}.game__ui__PictureBookInfo.bgyml"] = oead.byml.to_binary(to_dict({
+                "PictureBookParamArray" : to_array([to_dict({"ActorNameShort" : name, "IconName" : name}) for name in entries])
+            }), False, 7)
+        files["Component/ModelInfo/BenchParent.engine__component__ModelInfo.bgyml"] = oead.byml.to_binary(to_dict({
+            "ModelProjectName" : "Bench/Parent", "FmdbName" : "Parent"
+        }), False, 7)
+        self.write("Pack/ResidentCommon.pack.zs", self.sarc(files), 3)
+
+    def write_actor_pack(self, name: str) -> None:
+        self.write(f"Pack/Actor/{name}.pack.zs", self.sarc({
+            f"Actor/{name}.engine__actor__ActorParam.bgyml" : oead.byml.to_binary(to_dict({
+                "Category" : "Enemy",
+                "Components" : to_dict({
+                    "ModelInfoRef" : f"Work/Component/ModelInfo/{name}.engine__component__ModelInfo.gyml",
+                    "PouchContentRef" : f"Work/Component/PouchContentParam/{name}.game__component__PouchContentParam.gyml"
+                })
+            }), False, 7),
+            f"Component/ModelInfo/{name}.engine__component__ModelInfo.bgyml" : oead.byml.to_binary(to_dict({
+                "$parent" : "Work/Component/ModelInfo/BenchParent.engine__component__ModelInfo.gyml", "FmdbName" : name
+            }), False, 7),
+            f"Component/PouchContentParam/{name}.game__component__PouchContentParam.bgyml" : oead.byml.to_binary(to_dict({
+                "Category" : "Weapon"
+            }), False, 7)
+        }), 3)
+
+class Benchmark:
+    def __init__(self, name: str, func: Callable[[], Any], repeat: int, setup: Callable[[], Any] | None = None):
+        self.name: str = name
+        self.func: Callable[[], Any] = func
+        self.repeat: int = repeat
+        self.setup: Callable[[], Any] | None = setup
+        self.times: List[float] = []
+
+    def run(self) -> None:
+        for i in range(self.repeat):
+            if self.setup is not None:
+                self.setup()
+            start: float = time.perf_counter()
+            self.func()
+            self.times.append(time.perf_counter() - start)
+
+    @property
+    def result(self) -> Dict[str, float]:
+        return {"min" : min(self.times), "median" : statistics.median(self.times), "runs" : len(self.times)}
+
+class BenchmarkSuite:
+    def __init__(self, romfs: str, project: str, repeat: int = 5):
+        self.romfs: str = romfs
+        self.project: str = project
+        self.repeat: int = repeat
+        self.benchmarks: List[Benchmark] = []
+        self._copies: int = 0
+
+    def add(self, name: str, func: Callable[[], Any], repeat: int | None = None, setup: Callable[[], Any] | None = None) -> None:
+        self.benchmarks.append(Benchmark(name, func, self.repeat if repeat is None else repeat, setup))
+
+    def register_all(self) -> None:
+        # imported here as these need the ResourceSystem to exist first
+        from app import App
+        from actor import Actor
+
+        self.add("ResourceSystem.__init__", lambda: ResourceSystem(self.project, self.romfs, False))
+        sys: ResourceSystem = ResourceSystem(self.project, self.romfs, False)
+        pack_path: str = os.path.join(self.romfs, "Pack/ResidentCommon.pack.zs")
+        sarc_data: bytes = sys.ctx.decompress_file(pack_path)
+        self.add("Archive.from_sarc", lambda: Archive.from_sarc(oead.Sarc(sarc_data), "Pack/ResidentCommon.pack.zs"))
+        archive: Archive = Archive.from_sarc(oead.Sarc(sarc_data), "Pack/ResidentCommon.pack.zs")
+        def serialize_archive() -> None:
+            archive._is_changed = True
+            archive.serialize()
+        self.add("Archive.serialize", serialize_archive)
+
+        self.add("App.__init__", lambda: App(self.project, self.romfs, False), repeat=max(self.repeat // 2, 1))
+        app: App = App(self.project, self.romfs, False)
+        # switches back and forth between two empty projects, so everything romfs-derived gets kept
+        switch_app: App = App(os.path.join(self.project, "SwitchA"), self.romfs, False)
+        switch_projects: List[str] = [os.path.join(self.project, "SwitchB"), os.path.join(self.project, "SwitchA")]
+        def change_project() -> None:
+            switch_app.change_project(switch_projects[0])
+            switch_projects.reverse()
+            app._set_instances()
+        self.add("App.change_project", change_project)
+        app._set_instances()
+        last_row: str = app.rsdb_mgr.actorinfo._table[len(app.rsdb_mgr.actorinfo._table) - 1]["__RowId"]
+        self.add("ResourceTable.find_row (last row)", lambda: app.rsdb_mgr.actorinfo.find_row(last_row))
+        self.add("ResourceTable.find_row (missing)", lambda: app.rsdb_mgr.actorinfo.find_row("Bench_Missing"))
+
+        tag_data: bytes = sys.load_file(f"RSDB/Tag.Product.{sys.version}.rstbl.byml.zs")
+        self.add("TagTable.__init__", lambda: TagTable(oead.byml.from_binary(tag_data)))
+        def serialize_tags() -> None:
+            app.rsdb_mgr.tagtable._is_changed = True
+            app.rsdb_mgr.tagtable.serialize()
+        self.add("TagTable.serialize", serialize_tags)
+
+        flag_hash: oead.U32 = hash32(f"BenchBool_{len(app.gmd_mgr._list['Data']['Bool']) - 10}")
+        self.add("GameDataMgr.get_flag", lambda: app.gmd_mgr.get_flag(flag_hash, "Bool"))
+        self.add("GameDataMgr.calc_save_file_size", app.gmd_mgr.calc_save_file_size)
+        self.add("FlagColumns reset type/map unit audit", lambda: (app.gmd_mgr.columns("Bool").reset_type_flags().sum(axis=0),
+                                                                   app.gmd_mgr.columns("Bool").map_units()))
+
+        param_data: bytes = sys.load_file(f"Pack/Actor/{BASE_ACTOR}.pack.zs")
+        model_info: bytes = oead.Sarc(param_data).get_file(
+            f"Component/ModelInfo/{BASE_ACTOR}.engine__component__ModelInfo.bgyml").data.tobytes()
+        self.add("TypedParam resolve ($parent)", lambda: TypedParam(oead.byml.from_binary(model_info), "engine__component__ModelInfo"))
+
+        def copy_and_save() -> None:
+            self._copies += 1
+            actor: Actor = Actor.copy(f"Bench_Copy_{self._copies}", BASE_ACTOR)
+            actor.save()
+            app.save()
+        self.add("Actor.copy + App.save", copy_and_save, repeat=max(self.repeat // 2, 1))
+
+    def run(self, filter: str = "") -> Dict[str, Dict[str, float]]:
+        results: Dict[str, Dict[str, float]] = {}
+        for benchmark in self.benchmarks:
+            if filter and filter.lower() not in benchmark.name.lower():
+                continue
+            benchmark.run()
+            results[benchmark.name] = benchmark.result
+            print(f"{benchmark.name:<40} min {benchmark.result['min'] * 1000:>10.3f} ms   median {benchmark.result['median'] * 1000:>10.3f} ms")
+        return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(results: Dict[str, Dict[str, float]], history: List[Dict[str, Any]], threshold: float) -> List[str]:
+    regressions: List[str] = []
+    if not history:
+        return regressions
+    previous: Dict[str, Dict[str, float]] = history[-1]["results"]
+    print(f"\nCompared to {history[-1]['commit'] or 'previous run'} ({history[-1]['timestamp']}):")
+    for name, result in results.items():
+        if name not in previous:
+            continue
+        change: float = result["median"] / previous[name]["median"] - 1 if previous[name]["median"] else 0.0
+        flag: str = ""
+        if change > threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print(f"{name:<40} {change * 100:>+8.1f}%{flag}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the load/edit/save hot paths on a synthetic romfs")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size of the synthetic romfs relative to the real game")
+    parser.add_argument("--history", default="bench_history.jsonl", help="File the results are appended to")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown (relative to the last run) reported as a regression")
+    parser.add_argument("--no-record", action="store_true", help="Don't append this run to the history file")
+    args = parser.parse_args()
+
+    work_dir: str = tempfile.mkdtemp(prefix="actortool_bench_")
+    try:
+        romfs: str = os.path.join(work_dir, "romfs")
+        project: str = os.path.join(work_dir, "project")
+        print(f"Generating synthetic romfs (scale {args.scale})...")
+        SyntheticRomfs(romfs, args.scale).generate()
+        suite: BenchmarkSuite = BenchmarkSuite(romfs, project, args.repeat)
+        suite.register_all()
+        results: Dict[str, Dict[str, float]] = suite.run(args.filter)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history: List[Dict[str, Any]] = load_history(args.history)
+    regressions: List[str] = compare(results, history, args.threshold)
+    if not args.no_record:
+        with open(args.history, "a") as f:
+            f.write(json.dumps({
+                "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"), "commit" : git_commit(), "python" : platform.python_version(),
+                "machine" : platform.machine(), "scale" : args.scale, "results" : results
+            }) + "\n")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
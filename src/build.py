@@ -0,0 +1,167 @@
+# Copies a batch of actors in parallel worker processes and saves the project, run from the repo root:
+#   python src/build.py --romfs path/to/romfs --project path/to/project NewActor=BaseActor [NewActor=BaseActor ...]
+from actor import Actor
+from app import App
+from edit import SharedEdit
+from instrument import Tracer
+from res import ResourceSystem
+from zstd import ZstdContext
+
+import argparse
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Set
+
+# Result of building a single actor pack
+class ActorBuild:
+    def __init__(self, name: str, base_actor: str):
+        self.name: str = name
+        self.base_actor: str = base_actor
+        self.path: str = ""
+        self.data: bytes | None = None # compressed pack or None if the actor has no pack/nothing changed
+        self.digest: str = "" # hash of the uncompressed pack
+        self.edits: List[SharedEdit] = []
+        self.trace: List[dict] = [] # trace events from the worker process
+        self.error: str = ""
+
+    @property
+    def is_success(self) -> bool:
+        return self.error == ""
+
+def _init_worker(project_path: str, romfs_path: str) -> None:
+    try:
+        # forked workers inherit the main process's App so there's no need to load everything again
+        app: App = App.get()
+        # but don't let the worker flush an archive that belongs to the main process
+        app.sys._current_archive = None
+    except ValueError: # spawned workers start from the session snapshot if there's an up to date one
+        App.open(project_path, romfs_path, False)
+    # the trace file belongs to the main process, events get sent back with the results instead
+    Tracer.get().detach()
+
+# The pack work (loading, resolving components, regenerating the ActorParam, serializing, compressing) happens here
+# Any edits to the shared tables only touch the worker's copy and get sent back to be replayed
+def _build_actor(name: str, base_actor: str) -> ActorBuild:
+    result: ActorBuild = ActorBuild(name, base_actor)
+    try:
+        actor: Actor = Actor.copy(name, base_actor, result.edits)
+        if actor._pack is not None:
+            sys: ResourceSystem = ResourceSystem.get()
+            result.path = actor._pack.path
+            if (data := actor._pack.serialize()) is not None:
+                result.digest = sys.hash_data(data)
+                # skip compressing if the pack in the project is already identical
+                if not sys.is_unchanged(result.path, result.digest):
+                    result.data = sys.compress(data, ZstdContext.DICT_TYPE_PACK, result.path)
+    except Exception:
+        result.error = traceback.format_exc()
+    result.trace = Tracer.get().drain()
+    return result
+
+# Copies actors in worker processes, only the shared table edits + writes are done in the main process
+# Workers only see the shared tables as they were when they started, so a job that copies from an actor created earlier
+# in the same batch is built in the main process once the others are done
+class PackBuilder:
+    def __init__(self, workers: int | None = None):
+        self.workers: int = workers if workers else (os.cpu_count() or 1)
+        self._jobs: List[tuple[str, str]] = []
+
+    def add(self, name: str, base_actor: str) -> None:
+        if any(name == job_name for job_name, job_base in self._jobs):
+            raise ValueError(f"{name} is already being built in this batch")
+        self._jobs.append((name, base_actor))
+
+    def build(self) -> List[ActorBuild]:
+        app: App = App.get()
+        results: Dict[int, ActorBuild] = {}
+        parallel: List[int] = []
+        serial: List[int] = []
+        new_names: Set[str] = set()
+        for i, (name, base_actor) in enumerate(self._jobs):
+            (serial if base_actor in new_names else parallel).append(i)
+            new_names.add(name)
+        if self.workers == 1 or len(parallel) <= 1:
+            serial = list(range(len(self._jobs)))
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(parallel)), initializer=_init_worker,
+                                     initargs=(app.sys.project_path, app.sys.romfs_path)) as executor:
+                futures = {i: executor.submit(_build_actor, *self._jobs[i]) for i in parallel}
+                results = {i: future.result() for i, future in futures.items()}
+            # replayed in the order the jobs were added so the output is the same as a serial run
+            for i in parallel:
+                self._replay(app, results[i])
+        for i in serial:
+            results[i] = self._build_serial(app, *self._jobs[i])
+        app.save()
+        self._jobs = []
+        return [results[i] for i in range(len(results))]
+
+    @staticmethod
+    def _rewind(app: App, position: int, result: ActorBuild) -> None:
+        try:
+            app.journal.rewind(position)
+        except ValueError as e:
+            result.error += f"\nSome of the changes could not be undone: {e}"
+
+    # applies the worker's shared table edits, if any of them doesn't come out the same as it did in the worker (the
+    # tables it saw are out of date) everything the actor did is undone and its pack isn't written
+    @staticmethod
+    def _replay(app: App, result: ActorBuild) -> None:
+        app.sys.tracer.merge(result.trace)
+        if not result.is_success:
+            print(f"Failed to build {result.name} from {result.base_actor}:\n{result.error}")
+            return
+        position: int = app.journal.position
+        for edit in result.edits:
+            if (value := edit.apply()) != edit.result:
+                result.error = f"{edit} returned {value} in the main process but {edit.result} in the worker"
+                PackBuilder._rewind(app, position, result)
+                print(f"Failed to build {result.name} from {result.base_actor}: {result.error}")
+                return
+        if result.data is not None:
+            if app.sys.is_log:
+                app.sys.log(f"Saving {result.path}")
+            app.sys.write_file(result.path, result.data, result.digest)
+
+    @staticmethod
+    def _build_serial(app: App, name: str, base_actor: str) -> ActorBuild:
+        result: ActorBuild = ActorBuild(name, base_actor)
+        position: int = app.journal.position
+        try:
+            actor: Actor = Actor.copy(name, base_actor)
+            actor.save()
+            if actor._pack is not None:
+                result.path = actor._pack.path
+        except Exception:
+            result.error = traceback.format_exc()
+            PackBuilder._rewind(app, position, result) # a copy that failed halfway through shouldn't get saved
+            print(f"Failed to build {name} from {base_actor}:\n{result.error}")
+        return result
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Copies a batch of actors (in worker processes) and saves the project")
+    parser.add_argument("--romfs", required=True, help="Path to the romfs dump")
+    parser.add_argument("--project", required=True, help="Path to the project directory")
+    parser.add_argument("--workers", type=int, default=0, help="Number of worker processes (defaults to the CPU count, 1 builds everything here)")
+    parser.add_argument("--log", action="store_true", help="Enable ResourceSystem logging")
+    parser.add_argument("jobs", nargs="+", metavar="NAME=BASE", help="Actor to create and the actor to copy it from")
+    args = parser.parse_args()
+
+    builder: PackBuilder = PackBuilder(args.workers)
+    for job in args.jobs:
+        name, separator, base_actor = job.partition("=")
+        if not separator or not name or not base_actor:
+            parser.error(f"Expected NAME=BASE, got {job}")
+        try:
+            builder.add(name, base_actor)
+        except ValueError as e:
+            parser.error(str(e))
+    App.open(args.project, args.romfs, args.log)
+    results: List[ActorBuild] = builder.build()
+    for result in results:
+        print(f"{result.name} from {result.base_actor}: {'done' if result.is_success else 'failed'}")
+    return 0 if all(result.is_success for result in results) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
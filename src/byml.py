@@ -0,0 +1,750 @@
+from instrument import Tracer
+
+import numpy as np
+import oead
+
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Set
+
+# node types
+BYML_STRING: int = 0xA0
+BYML_BINARY: int = 0xA1
+BYML_FILE: int = 0xA2
+BYML_ARRAY: int = 0xC0
+BYML_DICTIONARY: int = 0xC1
+BYML_STRING_TABLE: int = 0xC2
+BYML_HASH32: int = 0x20
+BYML_HASH64: int = 0x21
+BYML_BOOL: int = 0xD0
+BYML_S32: int = 0xD1
+BYML_F32: int = 0xD2
+BYML_U32: int = 0xD3
+BYML_S64: int = 0xD4
+BYML_U64: int = 0xD5
+BYML_F64: int = 0xD6
+BYML_NULL: int = 0xFF
+
+CONTAINER_TYPES: tuple = (BYML_ARRAY, BYML_DICTIONARY, BYML_HASH32, BYML_HASH64)
+
+# Reads a BYML document in place without decoding the whole thing
+# Only the header is decoded up front, everything else is read straight out of the buffer when asked for
+# Small subtrees are decoded here, anything this doesn't know how to decode (hash dictionaries, files) is left to oead
+# by pointing the root of a copy of the document at the node (see materialize)
+class BymlReader:
+    def __init__(self, data: bytes):
+        self._data: bytes = bytes(data)
+        magic: bytes = self._data[:2]
+        if magic == b"YB":
+            self.endian: str = "<"
+        elif magic == b"BY":
+            self.endian = ">"
+        else:
+            raise ValueError("Invalid BYML magic")
+        self.version: int
+        self.key_table_offset: int
+        self.string_table_offset: int
+        self.root_offset: int
+        self.version, self.key_table_offset, self.string_table_offset, self.root_offset = struct.unpack_from(f"{self.endian}HIII", self._data, 2)
+        if self.version < 2:
+            raise ValueError(f"Unsupported BYML version {self.version}")
+        # strings are only decoded as they're needed
+        self._key_offsets: tuple = self._read_string_offsets(self.key_table_offset) if self.key_table_offset else ()
+        self._keys: Dict[int, str] = {}
+        self._key_ids: Dict[str, int] = {}
+        self._string_offsets: tuple = self._read_string_offsets(self.string_table_offset) if self.string_table_offset else ()
+        self._strings: Dict[int, str] = {}
+        self._string_ids: Dict[str, int] = {}
+        self._scratch: bytearray | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {**self.__dict__, "_scratch" : None, "_lock" : None}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    @property
+    def root_type(self) -> int:
+        return self.node_type(self.root_offset) if self.root_offset else BYML_NULL
+
+    def _u32(self, offset: int) -> int:
+        return struct.unpack_from(f"{self.endian}I", self._data, offset)[0]
+
+    # container header -> (type, count)
+    def header(self, offset: int) -> tuple[int, int]:
+        value: int = self._u32(offset)
+        if self.endian == "<":
+            return value & 0xFF, value >> 8
+        return value >> 24, value & 0xFFFFFF
+
+    def node_type(self, offset: int) -> int:
+        return self.header(offset)[0]
+
+    def _read_string_offsets(self, offset: int) -> tuple:
+        count: int = self.header(offset)[1]
+        return tuple(offset + rel for rel in struct.unpack_from(f"{self.endian}{count + 1}I", self._data, offset + 4))
+
+    def _raw_string(self, offsets: tuple, index: int) -> bytes:
+        return self._data[offsets[index]:offsets[index + 1] - 1]
+
+    def key(self, index: int) -> str:
+        if (key := self._keys.get(index)) is None:
+            key = self._keys[index] = self._raw_string(self._key_offsets, index).decode("utf-8")
+        return key
+
+    @property
+    def key_count(self) -> int:
+        return max(len(self._key_offsets) - 1, 0)
+
+    # the key table is sorted so this is just a binary search
+    def key_id(self, key: str) -> int:
+        if (id := self._key_ids.get(key)) is not None:
+            return id
+        raw: bytes = key.encode("utf-8")
+        id = -1
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid: int = (lo + hi) // 2
+            if (current := self._raw_string(self._key_offsets, mid)) == raw:
+                id = mid
+                break
+            if current < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        self._key_ids[key] = id
+        return id
+
+    def string(self, index: int) -> str:
+        if (string := self._strings.get(index)) is None:
+            string = self._strings[index] = self._raw_string(self._string_offsets, index).decode("utf-8")
+        return string
+
+    @property
+    def string_count(self) -> int:
+        return max(len(self._string_offsets) - 1, 0)
+
+    # same as key_id, the string table is only sorted if oead wrote it though (strings BymlSplicer adds are appended at
+    # the end) so strings that were added that way might not be found
+    def string_id(self, string: str) -> int:
+        if (id := self._string_ids.get(string)) is not None:
+            return id
+        raw: bytes = string.encode("utf-8")
+        id = -1
+        lo, hi = 0, self.string_count
+        while lo < hi:
+            mid: int = (lo + hi) // 2
+            if (current := self._raw_string(self._string_offsets, mid)) == raw:
+                id = mid
+                break
+            if current < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        self._string_ids[string] = id
+        return id
+
+    # (key, type, value) for every entry of a dictionary node, value is the raw u32 (an offset for containers)
+    def dict_entries(self, offset: int) -> Iterator[tuple[str, int, int]]:
+        count: int = self.header(offset)[1]
+        for word, value in struct.iter_unpack(f"{self.endian}II", self._data[offset + 4:offset + 4 + count * 8]):
+            if self.endian == "<":
+                yield self.key(word & 0xFFFFFF), word >> 24, value
+            else:
+                yield self.key(word >> 8), word & 0xFF, value
+
+    # (type, value) for every entry of an array node
+    def array_entries(self, offset: int) -> List[tuple[int, int]]:
+        count: int = self.header(offset)[1]
+        types: bytes = self._data[offset + 4:offset + 4 + count]
+        values_offset: int = offset + 4 + ((count + 3) & ~3)
+        return list(zip(types, struct.unpack_from(f"{self.endian}{count}I", self._data, values_offset)))
+
+    # dictionary entries are sorted by key so a single key can be found without reading the rest
+    def dict_find(self, offset: int, key: str) -> tuple[int, int] | None:
+        if (key_id := self.key_id(key)) == -1:
+            return None
+        lo, hi = 0, self.header(offset)[1]
+        while lo < hi:
+            mid: int = (lo + hi) // 2
+            word, value = struct.unpack_from(f"{self.endian}II", self._data, offset + 4 + mid * 8)
+            entry_key, entry_type = (word & 0xFFFFFF, word >> 24) if self.endian == "<" else (word >> 8, word & 0xFF)
+            if entry_key == key_id:
+                return entry_type, value
+            if entry_key < key_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    # decodes a single value (and everything under it for containers)
+    def decode(self, type: int, value: int) -> Any:
+        if type == BYML_DICTIONARY:
+            try:
+                return oead.byml.Dictionary({key: self.decode(t, v) for key, t, v in self.dict_entries(value)})
+            except ValueError: # something in there that's easier to leave to oead
+                return self.materialize(value)
+        if type == BYML_ARRAY:
+            try:
+                return oead.byml.Array([self.decode(t, v) for t, v in self.array_entries(value)])
+            except ValueError:
+                return self.materialize(value)
+        if type in CONTAINER_TYPES:
+            return self.materialize(value)
+        if type == BYML_STRING:
+            return self.string(value)
+        if type == BYML_BOOL:
+            return value != 0
+        if type == BYML_S32:
+            return oead.S32(value - (1 << 32) if value & 0x80000000 else value)
+        if type == BYML_U32:
+            return oead.U32(value)
+        if type == BYML_F32:
+            return oead.F32(struct.unpack(f"{self.endian}f", struct.pack(f"{self.endian}I", value))[0])
+        if type == BYML_S64:
+            return oead.S64(struct.unpack_from(f"{self.endian}q", self._data, value)[0])
+        if type == BYML_U64:
+            return oead.U64(struct.unpack_from(f"{self.endian}Q", self._data, value)[0])
+        if type == BYML_F64:
+            return oead.F64(struct.unpack_from(f"{self.endian}d", self._data, value)[0])
+        if type == BYML_BINARY:
+            size: int = self._u32(value)
+            return oead.Bytes(self._data[value + 4:value + 4 + size])
+        if type == BYML_NULL:
+            return None
+        raise ValueError(f"Unsupported BYML node type 0x{type:02x}")
+
+    # parses the container at offset (and everything under it) with oead by pointing the root of a copy of the
+    # document at it, the key and string tables stay the same so nothing else needs to be touched
+    def materialize(self, offset: int) -> Any:
+        with self._lock, Tracer.get().span("materialize", "byml", offset=offset):
+            if self._scratch is None:
+                self._scratch = bytearray(self._data)
+            struct.pack_into(f"{self.endian}I", self._scratch, 12, offset)
+            return oead.byml.from_binary(bytes(self._scratch))
+
+    def root(self) -> Any:
+        return self.materialize(self.root_offset)
+
+    # the root as a lazy proxy (or the decoded value if the root isn't a dictionary or array)
+    def lazy_root(self) -> Any:
+        if (type := self.root_type) == BYML_DICTIONARY:
+            return LazyDict(self, self.root_offset)
+        if type == BYML_ARRAY:
+            return LazyArray(self, self.root_offset)
+        return self.root()
+
+# containers with fewer entries than this are decoded here, bigger ones are left to oead (which is faster once there's
+# enough to parse to make up for it having to read the string tables every time)
+LAZY_DECODE_LIMIT: int = 64
+
+def to_oead(value: Any) -> Any:
+    return value.to_oead() if isinstance(value, LazyNode) else value
+
+# Stand-ins for oead.byml.Dictionary/Array that read straight from a BymlReader and only decode what gets accessed
+# Child containers are handed out as proxies too so only the path down to whatever is read gets looked at
+# The first write to a node promotes it: its entries are copied into a plain dict/list (child containers stay proxies)
+# so a write only ever costs the size of the node that was written to, not the whole subtree
+# Untouched proxies still point into the original buffer which is what lets BymlSplicer reuse their encoded bytes
+# Reads give back oead values (or proxies for containers), to_oead() puts the whole tree back together
+class LazyNode:
+    _oead_type: type = object
+    _type: int = BYML_NULL
+
+    def __init__(self, reader: BymlReader, offset: int):
+        self._reader: BymlReader = reader
+        self._offset: int = offset
+        self._items: Any = None # dict/list once promoted
+        self._children: Dict[Any, Any] = {} # containers handed out while lazy (so changes to them aren't lost)
+        self._decoded: Dict[int, tuple[Any, int, int]] = {} # id -> (container, type, value) of hash dictionaries decoded here
+
+    @property
+    def reader(self) -> BymlReader:
+        return self._reader
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def is_lazy(self) -> bool:
+        return self._items is None
+
+    # whether this or anything under it is different from what's in the buffer
+    # a promoted node is compared entry by entry so one that was changed back (undo) counts as clean again
+    @property
+    def is_dirty(self) -> bool:
+        if self._items is not None:
+            return not self._is_unchanged()
+        return any(child.is_dirty if isinstance(child, LazyNode) else self._decoded_entry(child) is None
+                   for child in self._children.values())
+
+    # (type, value) of a hash dictionary that was decoded from this node and still matches the buffer, None otherwise
+    # they're plain oead containers so writes to them can't be seen, comparing against a fresh decode is the only way
+    def _decoded_entry(self, value: Any) -> tuple[int, int] | None:
+        if (entry := self._decoded.get(id(value))) is None or entry[0] is not value:
+            return None
+        if value != self._reader.decode(entry[1], entry[2]):
+            return None
+        return entry[1], entry[2]
+
+    def _is_original(self, item: Any, type: int, value: int) -> bool:
+        if isinstance(item, LazyNode):
+            return item._reader is self._reader and item._type == type and item._offset == value and not item.is_dirty
+        if type in CONTAINER_TYPES and self._decoded.get(id(item), (None,))[0] is item:
+            return self._decoded_entry(item) == (type, value)
+        original: Any = self._reader.decode(type, value)
+        return item.__class__ is original.__class__ and item == original
+
+    def _is_unchanged(self) -> bool:
+        original: Dict[Any, tuple[int, int]] = {key: (type, value) for key, type, value in self._entries()}
+        pairs: List[tuple[Any, Any]] = self._pairs()
+        if len(pairs) != len(original):
+            return False
+        return all(key in original and self._is_original(item, *original[key]) for key, item in pairs)
+
+    def _child_value(self, key: Any, type: int, value: int) -> Any:
+        if (child := self._children.get(key)) is not None:
+            return child
+        if type == BYML_DICTIONARY:
+            child = LazyDict(self._reader, value)
+        elif type == BYML_ARRAY:
+            child = LazyArray(self._reader, value)
+        elif type in CONTAINER_TYPES: # hash dictionaries aren't proxied, they're decoded and kept around instead
+            child = self._reader.decode(type, value)
+            self._decoded[id(child)] = (child, type, value)
+        else:
+            return self._reader.decode(type, value)
+        self._children[key] = child
+        return child
+
+    def _clean_value(self, type: int, value: int) -> Any:
+        if type in (BYML_DICTIONARY, BYML_ARRAY) and self._reader.header(value)[1] > LAZY_DECODE_LIMIT:
+            return self._reader.materialize(value)
+        return self._reader.decode(type, value)
+
+    # (key, type, value) straight from the reader
+    def _entries(self) -> List[tuple[Any, int, int]]:
+        pass
+
+    # (key, value) of a promoted node
+    def _pairs(self) -> List[tuple[Any, Any]]:
+        pass
+
+    def _build(self, values: List[tuple[Any, Any]]) -> Any:
+        pass
+
+    def promote(self) -> Any:
+        if self._items is None:
+            self._items = self._load_items()
+            self._children = {}
+        return self._items
+
+    def _load_items(self) -> Any:
+        pass
+
+    # the whole subtree as a new oead container
+    def to_oead(self) -> Any:
+        if self._items is not None:
+            return self._build([(key, to_oead(value)) for key, value in self._pairs()])
+        if not self.is_dirty:
+            return self._clean_value(self._reader.node_type(self._offset), self._offset)
+        return self._build([(key, to_oead(self._children[key]) if key in self._children else self._clean_value(type, value))
+                            for key, type, value in self._entries()])
+
+    def __eq__(self, other: Any) -> bool:
+        return self.to_oead() == to_oead(other)
+
+    def __ne__(self, other: Any) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        return repr(self.to_oead())
+
+    # anything else the oead container has (append, pop, clear, ...) is assumed to be a write
+    # other lookups (hasattr checks and such) shouldn't promote anything
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or not hasattr(self._oead_type, name):
+            raise AttributeError(name)
+        return getattr(self.promote(), name)
+
+class LazyDict(LazyNode):
+    _oead_type: type = oead.byml.Dictionary
+    _type: int = BYML_DICTIONARY
+
+    def _entries(self) -> List[tuple[Any, int, int]]:
+        return list(self._reader.dict_entries(self._offset))
+
+    def _pairs(self) -> List[tuple[Any, Any]]:
+        return list(self._items.items())
+
+    def _build(self, values: List[tuple[Any, Any]]) -> oead.byml.Dictionary:
+        return oead.byml.Dictionary(dict(values))
+
+    def _load_items(self) -> Dict[str, Any]:
+        return {key: self._child_value(key, type, value) for key, type, value in self._reader.dict_entries(self._offset)}
+
+    def __getitem__(self, key: str) -> Any:
+        if self._items is not None:
+            return self._items[key]
+        if (entry := self._reader.dict_find(self._offset, key)) is None:
+            raise KeyError(key)
+        return self._child_value(key, *entry)
+
+    def __contains__(self, key: str) -> bool:
+        if self._items is not None:
+            return key in self._items
+        return self._reader.dict_find(self._offset, key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        if self._items is not None:
+            return iter(list(self._items))
+        return iter([key for key, type, value in self._reader.dict_entries(self._offset)])
+
+    def __len__(self) -> int:
+        if self._items is not None:
+            return len(self._items)
+        return self._reader.header(self._offset)[1]
+
+    def keys(self) -> List[str]:
+        return list(self)
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self]
+
+    def items(self) -> List[tuple[str, Any]]:
+        return [(key, self[key]) for key in self]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.promote()[key] = to_oead(value)
+
+    def __delitem__(self, key: str) -> None:
+        del self.promote()[key]
+
+class LazyArray(LazyNode):
+    _oead_type: type = oead.byml.Array
+    _type: int = BYML_ARRAY
+
+    def _entries(self) -> List[tuple[Any, int, int]]:
+        return [(i, type, value) for i, (type, value) in enumerate(self._reader.array_entries(self._offset))]
+
+    def _pairs(self) -> List[tuple[Any, Any]]:
+        return list(enumerate(self._items))
+
+    def _build(self, values: List[tuple[Any, Any]]) -> oead.byml.Array:
+        return oead.byml.Array([value for key, value in values])
+
+    def _load_items(self) -> List[Any]:
+        return [self._child_value(i, type, value) for i, (type, value) in enumerate(self._reader.array_entries(self._offset))]
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if self._items is not None:
+            return self._items[index]
+        entries: List[tuple[int, int]] = self._reader.array_entries(self._offset)
+        if isinstance(index, slice):
+            return [self._child_value(i, *entries[i]) for i in range(*index.indices(len(entries)))]
+        if index < 0:
+            index += len(entries)
+        if not 0 <= index < len(entries):
+            raise IndexError(index)
+        return self._child_value(index, *entries[index])
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._items is not None:
+            return iter(list(self._items))
+        return iter([self._child_value(i, type, value) for i, (type, value) in enumerate(self._reader.array_entries(self._offset))])
+
+    def __len__(self) -> int:
+        if self._items is not None:
+            return len(self._items)
+        return self._reader.header(self._offset)[1]
+
+    def __contains__(self, value: Any) -> bool:
+        return any(item == value for item in self)
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        self.promote()[index] = to_oead(value)
+
+    def __delitem__(self, index: int) -> None:
+        del self.promote()[index]
+
+    # proxies are copied so the same node doesn't end up in two places
+    def append(self, value: Any) -> None:
+        self.promote().append(to_oead(value))
+
+    def insert(self, index: int, value: Any) -> None:
+        self.promote().insert(index, to_oead(value))
+
+    def extend(self, values: Any) -> None:
+        self.promote().extend(to_oead(value) for value in values)
+
+# parses data lazily if possible, falls back to a normal parse for anything the reader doesn't handle
+def from_binary_lazy(data: bytes) -> Any:
+    try:
+        return BymlReader(data).lazy_root()
+    except (ValueError, struct.error):
+        return oead.byml.from_binary(data)
+
+# Writes a lazily loaded document back out on top of its original buffer: untouched nodes stay where they are, nodes
+# that were written to are appended to the end and the entries pointing to them are updated in place (unless the
+# container holding them is shared, in which case it gets appended too)
+# New strings go into a copy of the string table that's also appended, existing strings keep their index so the reused
+# nodes stay valid. The key table has to stay sorted so new keys get a temporary id past the end of it, at the end a new
+# sorted key table is appended and every dictionary that's still reachable gets its key ids remapped (and re-sorted)
+# Anything this doesn't encode (hash dictionaries that were changed, binary data) is left to oead
+# Replaced nodes are never reclaimed so once the appended part gets too big the whole file is rewritten instead
+class BymlSplicer:
+    VERIFY: bool = False # parse the output and compare it to a full serialization (slow, for testing)
+    MAX_GROWTH: float = 0.5 # appended size relative to the original past which the whole file is rewritten
+
+    def __init__(self, root: LazyNode):
+        self.root: LazyNode = root
+        self.reader: BymlReader = root.reader
+        self.endian: str = self.reader.endian
+        self._out: bytearray = bytearray(self.reader.data)
+        self._new_strings: Dict[str, int] = {}
+        self._new_keys: Dict[str, int] = {}
+        self._words: np.ndarray | None = None
+
+    def _align(self, alignment: int) -> None:
+        self._out.extend(bytes(-len(self._out) % alignment))
+
+    # new keys are numbered after the existing ones until the key table is rebuilt (see _remap_keys)
+    def _key(self, key: str) -> int:
+        if (id := self.reader.key_id(key)) != -1:
+            return id
+        if (id := self._new_keys.get(key)) is None:
+            id = self._new_keys[key] = self.reader.key_count + len(self._new_keys)
+        return id
+
+    def _string(self, string: str) -> int:
+        if (id := self.reader.string_id(string)) != -1:
+            return id
+        if (id := self._new_strings.get(string)) is None:
+            id = self._new_strings[string] = self.reader.string_count + len(self._new_strings)
+        return id
+
+    def _long(self, format: str, value: Any) -> int:
+        self._align(8)
+        offset: int = len(self._out)
+        self._out.extend(struct.pack(f"{self.endian}{format}", value))
+        return offset
+
+    def _header(self, type: int, count: int) -> bytes:
+        return struct.pack(f"{self.endian}I", type | count << 8 if self.endian == "<" else type << 24 | count)
+
+    # encoded (key id, type, value) entries, sorted by key
+    def _write_dict(self, entries: List[tuple[int, int, int]]) -> int:
+        entries.sort()
+        self._align(4)
+        offset: int = len(self._out)
+        self._out.extend(self._header(BYML_DICTIONARY, len(entries)))
+        for key, type, value in entries:
+            word: int = key | type << 24 if self.endian == "<" else key << 8 | type
+            self._out.extend(struct.pack(f"{self.endian}II", word, value))
+        return offset
+
+    def _write_array(self, entries: List[tuple[int, int]]) -> int:
+        self._align(4)
+        offset: int = len(self._out)
+        self._out.extend(self._header(BYML_ARRAY, len(entries)))
+        self._out.extend(bytes(type for type, value in entries))
+        self._align(4)
+        self._out.extend(struct.pack(f"{self.endian}{len(entries)}I", *[value for type, value in entries]))
+        return offset
+
+    # oead only writes identical containers once, so a node can only be changed in place if nothing else points to it
+    # every reference to a node is an aligned u32 so counting those can only overestimate how many there are
+    def _is_shared(self, offset: int) -> bool:
+        if self._words is None:
+            self._words = np.frombuffer(self.reader.data, dtype=f"{self.endian}u4", count=len(self.reader.data) // 4)
+        return np.count_nonzero(self._words == offset) > 1
+
+    # exclusive is whether the node and all of its parents are only referenced once
+    def _node(self, node: LazyNode, exclusive: bool = False) -> tuple[int, int]:
+        type: int = node._type
+        if node.reader is not self.reader:
+            return self._value(node.to_oead())
+        if not node.is_dirty:
+            return type, node.offset
+        exclusive = exclusive and not self._is_shared(node.offset)
+        if node.is_lazy:
+            # the node itself is the same, only some of its children changed
+            changed: List[tuple[Any, int, int]] = [(key, *self._value(child, exclusive, node)) for key, child in node._children.items()
+                                                    if (child.is_dirty if isinstance(child, LazyNode) else node._decoded_entry(child) is None)]
+            count: int = node.reader.header(node.offset)[1]
+            indices: Dict[Any, int] = {}
+            if type == BYML_DICTIONARY:
+                indices = {key: i for i, (key, child_type, value) in enumerate(node._entries())}
+            if exclusive: # so its entries can just be overwritten
+                for key, child_type, value in changed:
+                    if type == BYML_DICTIONARY:
+                        struct.pack_into(f"{self.endian}I", self._out, node.offset + 8 + 8 * indices[key], value)
+                    else:
+                        struct.pack_into(f"{self.endian}I", self._out, node.offset + 4 + ((count + 3) & ~3) + 4 * key, value)
+                return type, node.offset
+            entries: List[tuple[Any, int, int]] = node._entries()
+            for key, child_type, value in changed:
+                i: int = indices[key] if type == BYML_DICTIONARY else key
+                entries[i] = (key, child_type, value)
+        else:
+            entries = [(key, *self._value(value, exclusive, node)) for key, value in node._pairs()]
+        if type == BYML_DICTIONARY:
+            return type, self._write_dict([(self._key(key), child_type, value) for key, child_type, value in entries])
+        return type, self._write_array([(child_type, value) for key, child_type, value in entries])
+
+    # (type, value) for a single value, containers are written out (which makes value their offset)
+    # parent is the node value came from, hash dictionaries it decoded are reused as is if they weren't changed
+    def _value(self, value: Any, exclusive: bool = False, parent: LazyNode | None = None) -> tuple[int, int]:
+        if isinstance(value, LazyNode):
+            if value._items is None and not value._children and value._reader is self.reader: # untouched
+                return value._type, value._offset
+            return self._node(value, exclusive)
+        if parent is not None and parent.reader is self.reader and (entry := parent._decoded_entry(value)) is not None:
+            return entry
+        if isinstance(value, (oead.byml.Hash32, oead.byml.Hash64)):
+            raise ValueError("Hash dictionaries are not supported")
+        if isinstance(value, bool):
+            return BYML_BOOL, int(value)
+        if isinstance(value, str):
+            return BYML_STRING, self._string(value)
+        if value is None:
+            return BYML_NULL, 0
+        if isinstance(value, oead.S32):
+            return BYML_S32, value.v & 0xFFFFFFFF
+        if isinstance(value, oead.U32):
+            return BYML_U32, value.v
+        if isinstance(value, oead.F32):
+            return BYML_F32, struct.unpack(f"{self.endian}I", struct.pack(f"{self.endian}f", value.v))[0]
+        if isinstance(value, oead.S64):
+            return BYML_S64, self._long("q", value.v)
+        if isinstance(value, oead.U64):
+            return BYML_U64, self._long("Q", value.v)
+        if isinstance(value, oead.F64):
+            return BYML_F64, self._long("d", value.v)
+        if isinstance(value, (oead.byml.Dictionary, dict)):
+            return BYML_DICTIONARY, self._write_dict([(self._key(key), *self._value(value[key])) for key in value])
+        if isinstance(value, (oead.byml.Array, list)):
+            return BYML_ARRAY, self._write_array([self._value(item) for item in value])
+        raise ValueError(f"Unsupported value type {type(value).__name__}")
+
+    def _write_string_table(self) -> int:
+        old: tuple = self.reader._string_offsets
+        old_count: int = self.reader.string_count
+        old_strings: bytes = self.reader.data[old[0]:old[-1]] if old_count else b""
+        new_strings: List[bytes] = [string.encode("utf-8") + b"\0" for string in self._new_strings]
+        count: int = old_count + len(new_strings)
+        offsets: List[int] = [4 + 4 * (count + 1) + offset - old[0] for offset in old[:old_count]]
+        position: int = 4 + 4 * (count + 1) + len(old_strings)
+        for string in new_strings:
+            offsets.append(position)
+            position += len(string)
+        offsets.append(position)
+        self._align(4)
+        offset: int = len(self._out)
+        self._out.extend(self._header(BYML_STRING_TABLE, count))
+        self._out.extend(struct.pack(f"{self.endian}{count + 1}I", *offsets))
+        self._out.extend(old_strings)
+        self._out.extend(b"".join(new_strings))
+        self._align(4)
+        return offset
+
+    # sorted old and new keys, returns the offset of the table and the final id of every (temporary) key id
+    def _write_key_table(self) -> tuple[int, List[int]]:
+        keys: List[bytes] = [self.reader._raw_string(self.reader._key_offsets, i) for i in range(self.reader.key_count)]
+        keys.extend(key.encode("utf-8") for key in self._new_keys)
+        order: List[int] = sorted(range(len(keys)), key=keys.__getitem__)
+        ids: List[int] = [0] * len(keys)
+        for id, i in enumerate(order):
+            ids[i] = id
+        offsets: List[int] = []
+        position: int = 4 + 4 * (len(keys) + 1)
+        for i in order:
+            offsets.append(position)
+            position += len(keys[i]) + 1
+        offsets.append(position)
+        self._align(4)
+        offset: int = len(self._out)
+        self._out.extend(self._header(BYML_STRING_TABLE, len(keys)))
+        self._out.extend(struct.pack(f"{self.endian}{len(keys) + 1}I", *offsets))
+        self._out.extend(b"".join(keys[i] + b"\0" for i in order))
+        self._align(4)
+        return offset, ids
+
+    # rewrites the key ids of every dictionary reachable from the root, each node is only visited once since shared
+    # nodes are the same bytes no matter how many times they're referenced
+    # old keys keep their order relative to each other but the new ones can end up anywhere so entries get re-sorted
+    def _remap_keys(self, type: int, offset: int, ids: List[int]) -> None:
+        seen: Set[int] = set()
+        stack: List[tuple[int, int]] = [(type, offset)]
+        while stack:
+            type, offset = stack.pop()
+            if type not in CONTAINER_TYPES or offset in seen:
+                continue
+            seen.add(offset)
+            if type not in (BYML_DICTIONARY, BYML_ARRAY):
+                raise ValueError("Hash dictionaries are not supported")
+            header: int = struct.unpack_from(f"{self.endian}I", self._out, offset)[0]
+            count: int = header >> 8 if self.endian == "<" else header & 0xFFFFFF
+            if type == BYML_ARRAY:
+                types: bytes = bytes(self._out[offset + 4:offset + 4 + count])
+                values: tuple = struct.unpack_from(f"{self.endian}{count}I", self._out, offset + 4 + ((count + 3) & ~3))
+                stack.extend(zip(types, values))
+                continue
+            words: tuple = struct.unpack_from(f"{self.endian}{count * 2}I", self._out, offset + 4)
+            entries: List[tuple[int, int, int]] = []
+            for i in range(0, count * 2, 2):
+                word, value = words[i], words[i + 1]
+                key, entry_type = (word & 0xFFFFFF, word >> 24) if self.endian == "<" else (word >> 8, word & 0xFF)
+                entries.append((ids[key], entry_type, value))
+                stack.append((entry_type, value))
+            entries.sort()
+            packed: List[int] = []
+            for key, entry_type, value in entries:
+                packed.append(key | entry_type << 24 if self.endian == "<" else key << 8 | entry_type)
+                packed.append(value)
+            struct.pack_into(f"{self.endian}{count * 2}I", self._out, offset + 4, *packed)
+
+    def write(self) -> bytes:
+        original: int = len(self._out)
+        type, root = self._value(self.root, True)
+        if self._new_keys:
+            key_table, ids = self._write_key_table()
+            self._remap_keys(type, root, ids)
+            struct.pack_into(f"{self.endian}I", self._out, 4, key_table)
+        if self._new_strings:
+            struct.pack_into(f"{self.endian}I", self._out, 8, self._write_string_table())
+        struct.pack_into(f"{self.endian}I", self._out, 12, root)
+        if len(self._out) - original > BymlSplicer.MAX_GROWTH * original:
+            raise ValueError("Too much has changed")
+        return bytes(self._out)
+
+# serializes a lazily loaded document, reusing as much of the original buffer as possible
+def to_binary_lazy(root: LazyNode, big_endian: bool = False, version: int = 7) -> bytes:
+    reader: BymlReader = root.reader
+    if (reader.endian == ">") == big_endian and reader.version == version and root.offset == reader.root_offset:
+        if not root.is_dirty:
+            return reader.data
+        try:
+            with Tracer.get().span("splice", "byml"):
+                data: bytes = BymlSplicer(root).write()
+        except ValueError:
+            pass # just write the whole thing
+        else:
+            if not BymlSplicer.VERIFY:
+                return data
+            full: bytes = oead.byml.to_binary(root.to_oead(), big_endian, version)
+            if oead.byml.from_binary(data) == oead.byml.from_binary(full):
+                return data
+            print("Spliced BYML did not match the full serialization, writing the full version instead")
+            return full
+    return oead.byml.to_binary(root.to_oead(), big_endian, version)
@@ -0,0 +1,282 @@
+from res import ResourceSystem
+from scan import PackScanner
+from utils import *
+
+import oead
+
+import argparse
+import bisect
+import os
+import sqlite3
+from typing import Any, Dict, List, Set
+
+GLOBAL_ACTORCATALOG_INSTANCE = None
+
+# Searchable index of every actor (RSDB rows, tags, compendium category and components) stored as SQLite in the cache
+# directory so it can be searched without loading anything else (the UI uses it for autocomplete)
+# Building it needs the App to be initialized, searching only needs the database
+class ActorCatalog:
+    DB_NAME: str = ".catalog.sqlite"
+    SCHEMA_VERSION: int = 1
+
+    # row values from these tables end up in the fields table
+    FIELD_TABLES: List[str] = ["ActorInfo", "GameActorInfo", "PouchActorInfo"]
+
+    @classmethod
+    def get(cls) -> "ActorCatalog":
+        global GLOBAL_ACTORCATALOG_INSTANCE
+        if GLOBAL_ACTORCATALOG_INSTANCE is None:
+            raise ValueError("ActorCatalog has not yet been initialized")
+        return GLOBAL_ACTORCATALOG_INSTANCE
+
+    def __init__(self, project_path: str, romfs_path: str):
+        self.path: str = ActorCatalog.db_path(project_path, romfs_path)
+        self._db: sqlite3.Connection | None = None
+        self._names: List[str] = [] # sorted by lowercase name for prefix search
+        self._lower_names: List[str] = []
+        self._grams: Dict[str, List[Set[str]]] = {}
+        global GLOBAL_ACTORCATALOG_INSTANCE
+        GLOBAL_ACTORCATALOG_INSTANCE = self
+
+    @staticmethod
+    def db_path(project_path: str, romfs_path: str) -> str:
+        return os.path.join(ResourceSystem.cache_dir(project_path, romfs_path), ActorCatalog.DB_NAME)
+
+    # the connection is only opened once it's needed so just creating the App doesn't create the file
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False) # the UI searches from its callback thread
+            self._create_tables()
+            self._load_names()
+        return self._db
+
+    @property
+    def names(self) -> List[str]:
+        if self._db is None:
+            self.db
+        return self._names
+
+    @property
+    def exists(self) -> bool:
+        return self._db is not None or os.path.exists(self.path)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _create_tables(self) -> None:
+        db: sqlite3.Connection = self._db
+        if db.execute("PRAGMA user_version").fetchone()[0] != ActorCatalog.SCHEMA_VERSION:
+            db.executescript("""
+                DROP TABLE IF EXISTS actors; DROP TABLE IF EXISTS tags; DROP TABLE IF EXISTS components; DROP TABLE IF EXISTS fields;
+            """)
+        db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS actors (name TEXT PRIMARY KEY, compendium TEXT NOT NULL DEFAULT '',
+                                               pack_mtime INTEGER NOT NULL DEFAULT 0, pack_size INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS tags (actor TEXT NOT NULL, tag TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS components (actor TEXT NOT NULL, component TEXT NOT NULL, ref TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS fields (actor TEXT NOT NULL, tbl TEXT NOT NULL, key TEXT NOT NULL, value);
+            CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, actor);
+            CREATE INDEX IF NOT EXISTS tags_actor ON tags (actor);
+            CREATE INDEX IF NOT EXISTS components_component ON components (component, actor);
+            CREATE INDEX IF NOT EXISTS components_actor ON components (actor);
+            CREATE INDEX IF NOT EXISTS fields_key ON fields (tbl, key, value);
+            CREATE INDEX IF NOT EXISTS fields_actor ON fields (actor);
+            PRAGMA user_version = {ActorCatalog.SCHEMA_VERSION};
+        """)
+
+    def _load_names(self) -> None:
+        self._names = sorted((row[0] for row in self._db.execute("SELECT name FROM actors")), key=str.lower)
+        self._lower_names = [name.lower() for name in self._names]
+        self._grams: Dict[str, List[Set[str]]] = {name: [self._bigrams(part) for part in lower.split("_") if part]
+                                                 for name, lower in zip(self._names, self._lower_names)}
+
+    @staticmethod
+    def _value(value: Any) -> Any:
+        if isinstance(value, (str, bool)):
+            return value
+        if isinstance(value, (oead.S32, oead.U32, oead.S64, oead.U64)):
+            return int(value)
+        if isinstance(value, (oead.F32, oead.F64)):
+            return float(value)
+        return None # containers aren't searchable
+
+    # rebuilds everything from the loaded managers, component lists are only reread for packs that changed
+    def build(self, full: bool = False) -> None:
+        # imported here so searching doesn't need any of the game data loaded
+        from compendium import CompendiumMgr
+        from res import ResourceSystem
+        from rsdb import RSDBMgr
+        sys: ResourceSystem = ResourceSystem.get()
+        rsdb_mgr: RSDBMgr = RSDBMgr.get()
+        db: sqlite3.Connection = self.db
+        scanner: PackScanner = PackScanner()
+        packs: Dict[str, str] = scanner.pack_paths()
+        tables = rsdb_mgr.resource_tables
+        names: Set[str] = set(packs) | set(rsdb_mgr.tagtable.actors)
+        for table in ActorCatalog.FIELD_TABLES:
+            names.update(tables[table].row_ids())
+        categories: Dict[str, str] = CompendiumMgr.get().category_map()
+        with sys.tracer.span("ActorCatalog.build", "index", actors=len(names)), db:
+            old: Dict[str, tuple[int, int]] = {} if full else {
+                row[0]: (row[1], row[2]) for row in db.execute("SELECT name, pack_mtime, pack_size FROM actors")
+            }
+            stats: Dict[str, tuple[int, int]] = {name: tuple(scanner.stat(path)) for name, path in packs.items()}
+            stale: Dict[str, str] = {name: path for name, path in packs.items() if stats[name] != old.get(name)}
+            for name in [name for name in old if name not in packs]:
+                db.execute("DELETE FROM components WHERE actor = ?", (name,))
+            db.execute("DELETE FROM actors")
+            db.execute("DELETE FROM tags")
+            db.execute("DELETE FROM fields")
+            if full:
+                db.execute("DELETE FROM components")
+            # stale packs only get their stats once their components have been read so one that couldn't be gets read again
+            # next time
+            db.executemany("INSERT INTO actors VALUES (?, ?, ?, ?)", (
+                (name, categories.get(name, ""), *(stats[name] if name in packs and name not in stale else (0, 0))) for name in names
+            ))
+            db.executemany("INSERT INTO tags VALUES (?, ?)", (
+                (actor, tag) for actor in rsdb_mgr.tagtable.actors for tag in rsdb_mgr.tagtable.get_actor_tags(actor)
+            ))
+            for table in ActorCatalog.FIELD_TABLES:
+                db.executemany("INSERT INTO fields VALUES (?, ?, ?, ?)", (
+                    (row["__RowId"], table, key, value) for row in tables[table]._table if "__RowId" in row
+                    for key in row if key != "__RowId" and (value := self._value(row[key])) is not None
+                ))
+            if sys.is_log:
+                sys.log(f"Reading components of {len(stale)} actor packs")
+            for name, path, sarc in scanner.scan(stale):
+                db.execute("DELETE FROM components WHERE actor = ?", (name,))
+                db.execute("UPDATE actors SET pack_mtime = ?, pack_size = ? WHERE name = ?", (*stats[name], name))
+                file = sarc.get_file(f"Actor/{name}.engine__actor__ActorParam.bgyml")
+                if file is None:
+                    continue
+                try:
+                    param: oead.byml.Dictionary = parse_byml(bytes(file.data))
+                except BYML_ERRORS:
+                    continue
+                if "Components" in param:
+                    db.executemany("INSERT INTO components VALUES (?, ?, ?)", (
+                        (name, component, ref) for component in param["Components"] if isinstance(ref := param["Components"][component], str)
+                    ))
+        self._load_names()
+
+    # instant prefix completion (case insensitive)
+    def complete(self, prefix: str, limit: int = 20) -> List[str]:
+        names: List[str] = self.names
+        prefix = prefix.lower()
+        start: int = bisect.bisect_left(self._lower_names, prefix)
+        results: List[str] = []
+        for i in range(start, min(start + limit, len(names))):
+            if not self._lower_names[i].startswith(prefix):
+                break
+            results.append(names[i])
+        return results
+
+    # names matching all the given filters, filters are combined with AND (fields is {"Table.Key" : value})
+    def filter(self, category: str = "", tags: List[str] = [], components: List[str] = [], fields: Dict[str, Any] = {}) -> List[str]:
+        query: List[str] = ["SELECT name FROM actors WHERE 1"]
+        args: List[Any] = []
+        if category:
+            query.append("AND compendium = ?")
+            args.append(category)
+        for tag in tags:
+            query.append("AND name IN (SELECT actor FROM tags WHERE tag = ?)")
+            args.append(tag)
+        for component in components:
+            query.append("AND name IN (SELECT actor FROM components WHERE component = ?)")
+            args.append(component)
+        for field, value in fields.items():
+            table, key = field.split(".", 1)
+            query.append("AND name IN (SELECT actor FROM fields WHERE tbl = ? AND key = ? AND value = ?)")
+            args += [table, key, value]
+        return [row[0] for row in self.db.execute(" ".join(query), args)]
+
+    # mode is prefix, substring or fuzzy (matches the letters in order, falls back to similarity for typos)
+    def search(self, query: str = "", mode: str = "fuzzy", limit: int = 50, **filters: Any) -> List[str]:
+        names: List[str] = self.filter(**filters) if filters else self.names
+        if not query:
+            return sorted(names, key=str.lower)[:limit]
+        query = query.lower()
+        if mode == "prefix":
+            if not filters:
+                return self.complete(query, limit)
+            return sorted((name for name in names if name.lower().startswith(query)), key=str.lower)[:limit]
+        if mode == "substring":
+            return sorted((name for name in names if query in name.lower()), key=lambda name: (name.lower().find(query), name.lower()))[:limit]
+        scored: List[tuple[int, str]] = []
+        for name in names:
+            if (score := self._subsequence_score(query, name.lower())) >= 0:
+                scored.append((score, name))
+        results: List[str] = [name for score, name in sorted(scored)[:limit]]
+        if len(results) < limit:
+            # typos, each word of the query is compared against each part of the name (Enemy_Bokoblin_Junior) by the
+            # letter pairs they share
+            words: List[Set[str]] = [self._bigrams(word) for word in query.replace("_", " ").split()]
+            similar: List[tuple[float, str]] = []
+            found: Set[str] = set(results)
+            for name in names:
+                if name in found or (parts := self._grams.get(name)) is None:
+                    continue
+                score: float = sum(max(2 * len(word & part) / (len(word) + len(part)) for part in parts) for word in words) / len(words)
+                if score >= 0.5:
+                    similar.append((-score, name))
+            results += [name for score, name in sorted(similar)[:limit - len(results)]]
+        return results
+
+    @staticmethod
+    def _bigrams(word: str) -> Set[str]:
+        return {word[i:i + 2] for i in range(len(word) - 1)} or {word}
+
+    # -1 if the query letters don't appear in order, otherwise lower is better (tighter match, earlier start)
+    @staticmethod
+    def _subsequence_score(query: str, name: str) -> int:
+        if query in name:
+            return name.find(query)
+        position: int = -1
+        start: int = -1
+        for c in query:
+            position = name.find(c, position + 1)
+            if position == -1:
+                return -1
+            if start == -1:
+                start = position
+        return 1000 + (position - start) * 10 + start
+
+    def info(self, name: str) -> Dict[str, Any] | None:
+        row = self.db.execute("SELECT name, compendium FROM actors WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        info: Dict[str, Any] = {"Name" : row[0], "Compendium" : row[1]}
+        info["Tags"] = [r[0] for r in self.db.execute("SELECT tag FROM tags WHERE actor = ? ORDER BY tag", (name,))]
+        info["Components"] = {r[0]: r[1] for r in self.db.execute("SELECT component, ref FROM components WHERE actor = ?", (name,))}
+        for table, key, value in self.db.execute("SELECT tbl, key, value FROM fields WHERE actor = ?", (name,)):
+            info.setdefault(table, {})[key] = value
+        return info
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the actor catalog of a project")
+    parser.add_argument("project", help="Project directory")
+    parser.add_argument("query", nargs="?", default="", help="Actor name to search for")
+    parser.add_argument("--romfs", required=True, help="romfs directory (the catalog is stored per romfs + project)")
+    parser.add_argument("--build", action="store_true", help="(Re)build the catalog first")
+    parser.add_argument("--mode", default="fuzzy", choices=["prefix", "substring", "fuzzy"])
+    parser.add_argument("--tag", action="append", default=[], help="Only actors with this tag (can be repeated)")
+    parser.add_argument("--component", action="append", default=[], help="Only actors with this component (can be repeated)")
+    parser.add_argument("--category", default="", help="Only actors in this compendium category")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    catalog: ActorCatalog
+    if args.build:
+        from app import App
+        catalog = App(args.project, args.romfs, False).catalog
+        catalog.build()
+    else:
+        catalog = ActorCatalog(args.project, args.romfs)
+    filters: Dict[str, Any] = {key: value for key, value in (("category", args.category), ("tags", args.tag),
+                                                             ("components", args.component)) if value}
+    for name in catalog.search(args.query, args.mode, args.limit, **filters):
+        print(name)
@@ -1,8 +1,11 @@
+from journal import ChangeJournal, Edit, MISSING, snapshot
 from res import ResourceSystem
 from utils import *
 
 import oead
 
+from typing import Dict
+
 GLOBAL_COMPENDIUMMGR_INSTANCE = None
 
 class CompendiumMgr:
@@ -15,21 +18,16 @@ class CompendiumMgr:
 
     def __init__(self):
         sys: ResourceSystem = ResourceSystem.get()
-        self.animals: oead.byml.Dictionary = oead.byml.from_binary(
+        self.animals: oead.byml.Dictionary = parse_byml_lazy(
             sys.load_archive_file(sys.resident_common, "Game/PictureBookInfo/Animal.game__ui__PictureBookInfo.bgyml"))
-        self.enemies: oead.byml.Dictionary = oead.byml.from_binary(
+        self.enemies: oead.byml.Dictionary = parse_byml_lazy(
             sys.load_archive_file(sys.resident_common, "Game/PictureBookInfo/Enemy.game__ui__PictureBookInfo.bgyml"))
-        self.materials: oead.byml.Dictionary = oead.byml.from_binary(
+        self.materials: oead.byml.Dictionary = parse_byml_lazy(
             sys.load_archive_file(sys.resident_common, "Game/PictureBookInfo/Material.game__ui__PictureBookInfo.bgyml"))
-        self.treasure: oead.byml.Dictionary = oead.byml.from_binary(
+        self.treasure: oead.byml.Dictionary = parse_byml_lazy(
             sys.load_archive_file(sys.resident_common, "Game/PictureBookInfo/Treasure.game__ui__PictureBookInfo.bgyml"))
-        self.weapons: oead.byml.Dictionary = oead.byml.from_binary(
+        self.weapons: oead.byml.Dictionary = parse_byml_lazy(
             sys.load_archive_file(sys.resident_common, "Game/PictureBookInfo/Weapon.game__ui__PictureBookInfo.bgyml"))
-        self.animals_is_changed = False
-        self.enemies_is_changed = False
-        self.materials_is_changed = False
-        self.treasure_is_changed = False
-        self.weapons_is_changed = False
         global GLOBAL_COMPENDIUMMGR_INSTANCE
         GLOBAL_COMPENDIUMMGR_INSTANCE = self
 
@@ -69,6 +67,15 @@ class CompendiumMgr:
                 return "Weapon"
         return ""
     
+    # actor -> category for every entry, for when looking them up one by one would be too slow
+    def category_map(self) -> Dict[str, str]:
+        categories: Dict[str, str] = {}
+        for category, data in (("Animal", self.animals), ("Enemy", self.enemies), ("Material", self.materials),
+                               ("Treasure", self.treasure), ("Weapon", self.weapons)):
+            for entry in data["PictureBookParamArray"]:
+                categories.setdefault(entry["ActorNameShort"], category)
+        return categories
+
     def get_compendium_data(self, actor: str) -> oead.byml.Dictionary | None:
         for entry in self.animals["PictureBookParamArray"]:
             if entry["ActorNameShort"] == actor:
@@ -95,41 +102,87 @@ class CompendiumMgr:
         else:
             data = copy_dict(data)
         data["ActorNameShort"] = new
+        entries: oead.byml.Array
         match category:
             case "Animal":
-                self.animals["PictureBookParamArray"].append(data)
-                self.animals_is_changed = True
+                entries = self.animals["PictureBookParamArray"]
             case "Enemy":
-                self.enemies["PictureBookParamArray"].append(data)
-                self.enemies_is_changed = True
+                entries = self.enemies["PictureBookParamArray"]
             case "Material":
-                self.materials["PictureBookParamArray"].append(data)
-                self.materials_is_changed = True
+                entries = self.materials["PictureBookParamArray"]
             case "Treasure":
-                self.treasure["PictureBookParamArray"].append(data)
-                self.treasure_is_changed = True
+                entries = self.treasure["PictureBookParamArray"]
             case "Weapon":
-                self.weapons["PictureBookParamArray"].append(data)
-                self.weapons_is_changed = True
+                entries = self.weapons["PictureBookParamArray"]
             case _:
                 return False
+        entries.append(data)
+        added: oead.byml.Dictionary = snapshot(data)
+        ChangeJournal.get().record(Edit(f"Compendium/{category}", new, "PictureBookParamArray", MISSING, added,
+                                        lambda: entries.pop(), lambda: entries.append(snapshot(added))))
         return True
     
     def save(self) -> None:
         sys: ResourceSystem = ResourceSystem.get()
         if self.animals_is_changed:
             sys.save_archive_file("Game/PictureBookInfo/Animal.game__ui__PictureBookInfo.bgyml",
-                                      oead.byml.to_binary(self.animals, False, 7), ResourceSystem.ARCHIVE_RESIDENT)
+                                      serialize_byml(self.animals), ResourceSystem.ARCHIVE_RESIDENT)
+            self.animals_is_changed = False
         if self.enemies_is_changed:
             sys.save_archive_file("Game/PictureBookInfo/Enemy.game__ui__PictureBookInfo.bgyml",
-                                      oead.byml.to_binary(self.enemies, False, 7), ResourceSystem.ARCHIVE_RESIDENT)
+                                      serialize_byml(self.enemies), ResourceSystem.ARCHIVE_RESIDENT)
+            self.enemies_is_changed = False
         if self.materials_is_changed:
             sys.save_archive_file("Game/PictureBookInfo/Material.game__ui__PictureBookInfo.bgyml",
-                                      oead.byml.to_binary(self.materials, False, 7), ResourceSystem.ARCHIVE_RESIDENT)
+                                      serialize_byml(self.materials), ResourceSystem.ARCHIVE_RESIDENT)
+            self.materials_is_changed = False
         if self.treasure_is_changed:
             sys.save_archive_file("Game/PictureBookInfo/Treasure.game__ui__PictureBookInfo.bgyml",
-                                      oead.byml.to_binary(self.treasure, False, 7), ResourceSystem.ARCHIVE_RESIDENT)
+                                      serialize_byml(self.treasure), ResourceSystem.ARCHIVE_RESIDENT)
+            self.treasure_is_changed = False
         if self.weapons_is_changed:
             sys.save_archive_file("Game/PictureBookInfo/Weapon.game__ui__PictureBookInfo.bgyml",
-                                      oead.byml.to_binary(self.weapons, False, 7), ResourceSystem.ARCHIVE_RESIDENT)
-        sys.save_archive(sys.resident_common)
\ No newline at end of file
+                                      serialize_byml(self.weapons), ResourceSystem.ARCHIVE_RESIDENT)
+            self.weapons_is_changed = False
+        sys.save_archive(sys.resident_common)
+
+    # dirty flags are kept in the ChangeJournal
+    @property
+    def animals_is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed("Compendium/Animal")
+
+    @animals_is_changed.setter
+    def animals_is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed("Compendium/Animal", state)
+
+    @property
+    def enemies_is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed("Compendium/Enemy")
+
+    @enemies_is_changed.setter
+    def enemies_is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed("Compendium/Enemy", state)
+
+    @property
+    def materials_is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed("Compendium/Material")
+
+    @materials_is_changed.setter
+    def materials_is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed("Compendium/Material", state)
+
+    @property
+    def treasure_is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed("Compendium/Treasure")
+
+    @treasure_is_changed.setter
+    def treasure_is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed("Compendium/Treasure", state)
+
+    @property
+    def weapons_is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed("Compendium/Weapon")
+
+    @weapons_is_changed.setter
+    def weapons_is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed("Compendium/Weapon", state)
\ No newline at end of file
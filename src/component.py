@@ -1,6 +1,8 @@
+from edit import SharedEdit
 from logic import LogicMgr
 from res import ResourceSystem
 from rsdb import RSDBMgr
+from strpool import StringPool
 from typedparam import TypedParam
 from utils import *
 
@@ -58,7 +60,7 @@ class BgymlComponent(ComponentBase):
         component.actor = actor
         component._type = type
         if ref_path:
-            component._param = TypedParam(oead.byml.from_binary(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
+            component._param = TypedParam(parse_byml(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
         else:
             component._param = TypedParam.load_default(cls.EXT_MAP[component._type])
         return component
@@ -66,7 +68,7 @@ class BgymlComponent(ComponentBase):
     def save(self) -> str | None:
         if self._needs_save:
             sys: ResourceSystem = ResourceSystem.get()
-            sys.save_archive_file(self.ref_path[1:], oead.byml.to_binary(self._param, False, 7), ResourceSystem.ARCHIVE_CURRENT)
+            sys.save_archive_file(self.ref_path[1:], serialize_byml(self._param), ResourceSystem.ARCHIVE_CURRENT)
             self._needs_save = False
             return self.ref_path
         return None
@@ -148,17 +150,17 @@ class ArmorComponent(BgymlComponent):
         component.actor = actor
         component._type = type
         if ref_path:
-            component._param = TypedParam(oead.byml.from_binary(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
+            component._param = TypedParam(parse_byml(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
         else:
             component._param = TypedParam.load_default(cls.EXT_MAP[component._type])
         rsdb_mgr: RSDBMgr = RSDBMgr.get()
         component._enhancement_material_info = rsdb_mgr.enhancementmaterialinfo.find_row(component.row_id)
         return component
     
-    def copy(self, old: str, new: str) -> None:
+    def copy(self, old: str, new: str, edits: List[SharedEdit] | None = None) -> None:
         if self._enhancement_material_info is not None:
             rsdb_mgr: RSDBMgr = RSDBMgr.get()
-            rsdb_mgr.enhancementmaterialinfo.copy_row_to(old, new)
+            SharedEdit("rsdb", "copy_row_to", (old, new), "enhancementmaterialinfo").run(edits)
             self._enhancement_material_info = rsdb_mgr.enhancementmaterialinfo.find_row(new)
 
     @property
@@ -208,7 +210,6 @@ class ArmorComponent(BgymlComponent):
         if self._enhancement_material_info is None:
             self._enhancement_material_info = rsdb_mgr.enhancementmaterialinfo.add_row_by_id(self.row_id)
         self._enhancement_material_info["Price"] = price
-        rsdb_mgr.enhancementmaterialinfo._is_changed = True
 
     def add_effect(self, effect: str, level: oead.S32 | None = None) -> None:
         self._param["ArmorEffect"].append(to_dict({
@@ -231,7 +232,6 @@ class ArmorComponent(BgymlComponent):
         self._enhancement_material_info["Items"].append(to_dict({
             "Actor" : material, "Number" : count
         }))
-        rsdb_mgr.enhancementmaterialinfo._is_changed = True
 
 class ASInfoComponent(BgymlComponent):
     def __init__(self):
@@ -282,7 +282,7 @@ class AttachmentComponent(BgymlComponent):
         component.actor = actor
         component._type = type
         if ref_path:
-            component._param = TypedParam(oead.byml.from_binary(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
+            component._param = TypedParam(parse_byml(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
         else:
             component._param = TypedParam.load_default(cls.EXT_MAP[component._type])
         rsdb_mgr: RSDBMgr = RSDBMgr.get()
@@ -308,9 +308,9 @@ class AttachmentComponent(BgymlComponent):
         self._attachment_info["AttachmentShieldBashDamage"] = self._param["ShieldBashDamage"]
         # the other ones are from other components and I'm too lazy to sync those
 
-    def copy(self, old: str, new: str) -> None:
+    def copy(self, old: str, new: str, edits: List[SharedEdit] | None = None) -> None:
         rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo.copy_row_to(old, new)
+        SharedEdit("rsdb", "copy_row_to", (old, new), "attachmentactorinfo").run(edits)
         self._attachment_info = rsdb_mgr.attachmentactorinfo.find_row(new)
 
     @property
@@ -335,8 +335,6 @@ class AttachmentComponent(BgymlComponent):
         self._param["CommonName"] = name
         self._attachment_info["AttachmentCommonName"] = name
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
 
     @property
     def damage(self) -> oead.S32:
@@ -347,8 +345,6 @@ class AttachmentComponent(BgymlComponent):
         self._param["AdditionalDamage"] = dmg
         self._attachment_info["AttachmentAdditionalDamage"] = dmg
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
     
     @property
     def shield_base_damage(self) -> oead.S32:
@@ -359,8 +355,6 @@ class AttachmentComponent(BgymlComponent):
         self._param["ShieldBashDamage"] = dmg
         self._attachment_info["AttachmentShieldBashDamage"] = dmg
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
     
     @property
     def arrow_dmg_rate(self) -> oead.F32:
@@ -371,8 +365,6 @@ class AttachmentComponent(BgymlComponent):
         self._param["AdditionalDamageRateArrow"] = dmg
         self._attachment_info["AttachmentMulValueArrow"] = dmg
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
 
     @property
     def subtypes(self) -> List[str]:
@@ -388,16 +380,12 @@ class AttachmentComponent(BgymlComponent):
                 self._param["AdditionalSubType"].append(subtype)
         self._attachment_info["AttachmentAdditionalSubType"] = ",".join(self._param["AdditionalSubType"])
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
 
     def update_subtypes(self, subtypes: List[str]) -> None:
         subtypes = [t for t in subtypes if isinstance(t, str)]
         self._param["AdditionalSubType"] = to_array(subtypes)
         self._attachment_info["AttachmentAdditionalSubType"] = ",".join(self._param["AdditionalSubType"])
         self._needs_save = True
-        rsdb_mgr: RSDBMgr = RSDBMgr.get()
-        rsdb_mgr.attachmentactorinfo._is_changed = True
 
 # Some blackboards are done through BSA and I can't be bothered to do all that 😭
 class BlackboardComponent(BgymlComponent):
@@ -488,15 +476,15 @@ class LifeComponent(BgymlComponent):
         component.actor = actor
         component._type = type
         if ref_path:
-            component._param = TypedParam(oead.byml.from_binary(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
+            component._param = TypedParam(parse_byml(sys.load_file(ref_path)), cls.EXT_MAP[component._type]).data
         else:
             component._param = copy_dict(TypedParam.load_default(cls.EXT_MAP[component._type]))
         if component._param["DamageParameters"]:
-            component._damage_param = oead.byml.from_binary(sys.load_file(component._param["DamageParameters"]))
+            component._damage_param = parse_byml(sys.load_file(component._param["DamageParameters"]))
         if component._param["HealParameters"]:
-            component._heal_param = oead.byml.from_binary(sys.load_file(component._param["HealParameters"]))
+            component._heal_param = parse_byml(sys.load_file(component._param["HealParameters"]))
         if component._param["LifeParameters"]:
-            component._life_param = oead.byml.from_binary(sys.load_file(component._param["LifeParameters"]))
+            component._life_param = parse_byml(sys.load_file(component._param["LifeParameters"]))
         return component
     
     @property
@@ -531,8 +519,8 @@ class LifeComponent(BgymlComponent):
             if self._edited_life:
                 self._param["LifeParameters"] = self.life_param_path
                 sys.save_archive_file(f"Life/LifeParameters/{self.actor}.game__life__LifeParameters.bgyml",
-                                      oead.byml.to_binary(self._life_param, False, 7), ResourceSystem.ARCHIVE_CURRENT)
-            sys.save_archive_file(self.ref_path[1:], oead.byml.to_binary(self._param, False, 7), ResourceSystem.ARCHIVE_CURRENT)
+                                      serialize_byml(self._life_param), ResourceSystem.ARCHIVE_CURRENT)
+            sys.save_archive_file(self.ref_path[1:], serialize_byml(self._param), ResourceSystem.ARCHIVE_CURRENT)
             self._needs_save = False
             self._edited_life = False
             return self.ref_path
@@ -817,6 +805,8 @@ class ComponentFactory:
         self._factories[name] = callback
     
     def create(self, name: str, ref_path: str, actor: str) -> ComponentBase:
+        pool: StringPool = StringPool.get()
+        name, ref_path, actor = pool.intern(name, "Component"), pool.intern(ref_path, "Component"), pool.intern(actor, "Component")
         if name not in ComponentBase.EXT_MAP:
             print(f"Unknown component reference type: {name}")
             return ComponentBase()
@@ -0,0 +1,438 @@
+# Keeps one App loaded and serves requests from other processes (editor plugins, build scripts) over a local socket so
+# they don't each have to load everything again, run from the repo root:
+#   python src/daemon.py --romfs path/to/romfs --project path/to/project [--socket path | --port N]
+# The Unix socket is only accessible to the current user, TCP connections (for platforms without Unix sockets) have to
+# start with the token the daemon writes to a file only the current user can read (see TOKEN_NAME)
+# Protocol is JSON-RPC 2.0 with one message per line, DaemonClient below does the client side
+# Queries run concurrently on the connection threads, anything that changes the App goes through a single queue so
+# edits are applied one at a time in the order they came in (and never while a query is reading)
+
+from actor import Actor
+from app import App
+from instrument import Tracer
+from res import ResourceSystem
+from rsdb import RSDBMgr, ResourceTable, SQL_TYPES, TableColumn, TagTable, sql_type
+from utils import *
+
+import oead
+import numpy as np
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+SOCKET_NAME: str = ".actortool.sock"
+TOKEN_NAME: str = ".actortool.token"
+
+# JSON-RPC error codes
+PARSE_ERROR: int = -32700
+INVALID_REQUEST: int = -32600
+METHOD_NOT_FOUND: int = -32601
+INVALID_PARAMS: int = -32602
+SERVER_ERROR: int = -32000
+
+# oead values -> plain JSON values
+def to_json(value: Any) -> Any:
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if hasattr(value, "v"):
+        return value.v
+    if isinstance(value, oead.byml.Array):
+        return [to_json(item) for item in value]
+    if isinstance(value, (oead.byml.Dictionary, oead.byml.Hash32, oead.byml.Hash64)) or hasattr(value, "keys"):
+        return {str(key): to_json(value[key]) for key in value.keys()}
+    if isinstance(value, (bytes, oead.Bytes)):
+        return bytes(value).hex()
+    return str(value)
+
+# JSON value -> oead value, like is the value currently there (if any) so the type stays the same
+def from_json(value: Any, like: Any = None) -> Any:
+    if like is not None and (t := sql_type(like)) != "Byml" and not isinstance(value, (dict, list)):
+        return SQL_TYPES[t][2](value)
+    if isinstance(value, dict):
+        return to_dict({key: from_json(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return to_array([from_json(item) for item in value])
+    if isinstance(value, bool) or isinstance(value, str):
+        return value
+    return RSDBMgr._infer_sql_value(value)
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code: int = code
+
+# Any number of readers or a single writer, waiting writers block new readers so a steady stream of queries can't
+# hold off an edit forever
+class ReadWriteLock:
+    def __init__(self):
+        self._cond: threading.Condition = threading.Condition()
+        self._readers: int = 0
+        self._writing: bool = False
+        self._waiting: int = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writing and self._waiting == 0)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting += 1
+            self._cond.wait_for(lambda: not self._writing and self._readers == 0)
+            self._waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+class ActorToolDaemon:
+    def __init__(self, app: App):
+        self.app: App = app
+        self.lock: ReadWriteLock = ReadWriteLock()
+        self._writes: queue.Queue = queue.Queue() # (method, params, future), None stops the writer thread
+        self._writer: threading.Thread = threading.Thread(target=self._run_writes, name="DaemonWriter", daemon=True)
+        self.server: socketserver.BaseServer | None = None
+        self.requests: int = 0
+        self.started: float = time.time()
+        # method -> (function, changes the App state)
+        self.methods: Dict[str, tuple[Callable[..., Any], bool]] = {
+            "ping" : (lambda: "pong", False),
+            "status" : (self.status, False),
+            "get_row" : (self.get_row, False),
+            "query" : (self.query, False),
+            "tags" : (self.tags, False),
+            "actors_with_tags" : (self.actors_with_tags, False),
+            "get_flag" : (self.get_flag, False),
+            "search" : (self.search, False),
+            "clone_actor" : (self.clone_actor, True),
+            "set_fields" : (self.set_fields, True),
+            "set_tags" : (self.set_tags, True),
+            "save" : (self.save, True),
+            "undo" : (self.undo, True),
+            "redo" : (self.redo, True)
+        }
+        self._writer.start()
+
+    def _run_writes(self) -> None:
+        while (item := self._writes.get()) is not None:
+            method, params, future = item
+            try:
+                with self.lock.write():
+                    future.set_result(method(**params))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def call(self, name: str, params: Dict[str, Any]) -> Any:
+        if name not in self.methods:
+            raise RPCError(METHOD_NOT_FOUND, f"Unknown method: {name}")
+        method, is_write = self.methods[name]
+        self.requests += 1
+        with Tracer.get().span(f"daemon.{name}", "daemon"):
+            if is_write:
+                future: Future = Future()
+                self._writes.put((method, params, future))
+                return future.result()
+            with self.lock.read():
+                return method(**params)
+
+    # one JSON-RPC request (already decoded) -> response, None for notifications
+    # anything that isn't a valid request object always gets an error back, even without an id
+    def handle(self, request: Any) -> Dict[str, Any] | None:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self.invalid_request()
+        id: Any = request.get("id")
+        try:
+            params: Any = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            result: Any = self.call(request["method"], params)
+            response: Dict[str, Any] = {"jsonrpc" : "2.0", "id" : id, "result" : result}
+        except RPCError as e:
+            response = {"jsonrpc" : "2.0", "id" : id, "error" : {"code" : e.code, "message" : str(e)}}
+        except (TypeError, KeyError, ValueError) as e:
+            response = {"jsonrpc" : "2.0", "id" : id, "error" : {"code" : INVALID_PARAMS, "message" : f"{type(e).__name__}: {e}"}}
+        except Exception as e:
+            response = {"jsonrpc" : "2.0", "id" : id, "error" : {"code" : SERVER_ERROR, "message" : f"{type(e).__name__}: {e}"}}
+        return response if "id" in request else None
+
+    @staticmethod
+    def invalid_request() -> Dict[str, Any]:
+        return {"jsonrpc" : "2.0", "id" : None, "error" : {"code" : INVALID_REQUEST, "message" : "Invalid request"}}
+
+    def handle_line(self, line: bytes) -> bytes | None:
+        try:
+            request: Any = json.loads(line)
+        except ValueError as e:
+            return json.dumps({"jsonrpc" : "2.0", "id" : None, "error" : {"code" : PARSE_ERROR, "message" : str(e)}}).encode() + b"\n"
+        if isinstance(request, list): # batch
+            if not request:
+                return json.dumps(self.invalid_request()).encode() + b"\n"
+            responses: List[Dict[str, Any]] = [response for item in request if (response := self.handle(item)) is not None]
+            return json.dumps(responses).encode() + b"\n" if responses else None
+        response: Dict[str, Any] | None = self.handle(request)
+        return json.dumps(response).encode() + b"\n" if response is not None else None
+
+    # token_path is where the token TCP clients have to send first gets written (only used with a port)
+    def serve(self, address: str | int, token_path: str = "") -> None:
+        daemon: ActorToolDaemon = self
+        token: bytes | None = None
+        if isinstance(address, int):
+            if not token_path:
+                raise ValueError("Serving over TCP needs a token file")
+            token = write_token(token_path)
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                if token is not None and not hmac.compare_digest(self.rfile.readline().strip(), token):
+                    return
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    if (response := daemon.handle_line(line)) is not None:
+                        self.wfile.write(response)
+                        self.wfile.flush()
+        if isinstance(address, int):
+            self.server = socketserver.ThreadingTCPServer(("127.0.0.1", address), Handler)
+        else:
+            if os.path.exists(address):
+                if is_listening(address):
+                    raise OSError(f"Another daemon is already listening on {address}")
+                os.remove(address) # left over from a daemon that didn't shut down cleanly
+            umask: int = os.umask(0o177) # so the socket is created 0600
+            try:
+                self.server = socketserver.ThreadingUnixStreamServer(address, Handler)
+            finally:
+                os.umask(umask)
+        self.server.daemon_threads = True
+        if self.app.sys._is_log:
+            self.app.sys.log(f"Listening on {address}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if isinstance(address, str) and os.path.exists(address):
+                os.remove(address)
+
+    def shutdown(self) -> None:
+        self._writes.put(None)
+        if self.server is not None:
+            self.server.shutdown()
+
+    def _table(self, table: str) -> ResourceTable:
+        if (resource_table := self.app.rsdb_mgr.resource_tables.get(table)) is None:
+            raise RPCError(INVALID_PARAMS, f"Unknown table: {table}")
+        return resource_table
+
+    # --- queries ---
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "romfs" : self.app.sys.romfs_path,
+            "project" : self.app.sys.project_path,
+            "changed" : self.app.journal.changed_targets,
+            "edits" : self.app.journal.summary(),
+            "requests" : self.requests,
+            "uptime" : time.time() - self.started
+        }
+
+    def get_row(self, table: str, row: str) -> Dict[str, Any] | None:
+        resource_table: ResourceTable = self._table(table)
+        if (i := resource_table.find_index(row)) == -1:
+            return None
+        return to_json(self._row(resource_table, i))
+
+    # rows where every key in where has that value, columns limits the keys returned
+    def query(self, table: str, where: Dict[str, Any] = {}, columns: List[str] = [], limit: int = 0) -> List[Dict[str, Any]]:
+        resource_table: ResourceTable = self._table(table)
+        mask: np.ndarray = np.ones(len(resource_table.rows), dtype=np.bool_)
+        for key, value in where.items():
+            column: TableColumn = resource_table.column(key)
+            mask &= column.present & (column.values == (value if column.type != "String" else str(value)))
+        rows: List[Dict[str, Any]] = []
+        for i in np.flatnonzero(mask).tolist():
+            row: Dict[str, Any] = to_json(self._row(resource_table, i))
+            rows.append({key: row[key] for key in columns if key in row} if columns else row)
+            if limit and len(rows) == limit:
+                break
+        return rows
+
+    @staticmethod
+    def _row(table: ResourceTable, i: int) -> Any:
+        if table.is_compact and isinstance(entry := table.rows._rows[i], int):
+            return table.rows._dict(entry) # without converting the row for good
+        return table.rows[i]
+
+    def tags(self, actor: str) -> List[str]:
+        return list(self.app.rsdb_mgr.tagtable.get_actor_tags(actor))
+
+    # actors with every one of the tags (or any of them)
+    def actors_with_tags(self, tags: List[str], any_tag: bool = False) -> List[str]:
+        wanted: set = set(tags)
+        check: Callable[[set], bool] = (lambda actor_tags: not wanted.isdisjoint(actor_tags)) if any_tag else wanted.issubset
+        tag_table: TagTable = self.app.rsdb_mgr.tagtable
+        return sorted(actor for actor, actor_tags in tag_table._actors.items() if check(set(actor_tags)))
+
+    def get_flag(self, datatype: str, name: str = "", hash: int | None = None) -> Dict[str, Any] | None:
+        flag_hash: int = int(self.app.gmd_mgr.hash(name)) if hash is None else hash
+        if (i := self.app.gmd_mgr.columns(datatype).find(flag_hash)) == -1:
+            return None
+        return to_json(self.app.gmd_mgr._list["Data"][datatype][i])
+
+    def search(self, query: str = "", mode: str = "fuzzy", limit: int = 50, **filters: Any) -> List[str]:
+        return self.app.catalog.search(query, mode, limit, **filters)
+
+    # --- edits ---
+
+    # copies the actor and writes its pack, the shared tables are only written on save
+    def clone_actor(self, name: str, base: str) -> Dict[str, Any]:
+        actor: Actor = Actor.copy(name, base)
+        actor.save()
+        return {"name" : name, "pack" : actor._pack.path if actor._pack is not None else None}
+
+    # values are converted to the type already in the row, null deletes the key
+    def set_fields(self, table: str, row: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        if (target := self._table(table).find_row(row)) is None:
+            raise RPCError(INVALID_PARAMS, f"{table} has no row {row}")
+        for key, value in fields.items():
+            if value is None:
+                if key in target:
+                    del target[key]
+            else:
+                target[key] = from_json(value, target[key] if key in target else None)
+        resource_table: ResourceTable = self._table(table)
+        return to_json(self._row(resource_table, resource_table.find_index(row)))
+
+    def set_tags(self, actor: str, tags: List[str]) -> List[str]:
+        tag_table: TagTable = self.app.rsdb_mgr.tagtable
+        if actor not in tag_table.actors:
+            tag_table.add_actor(actor)
+        tag_table.actor_set_tags(actor, tags)
+        return list(tag_table.get_actor_tags(actor))
+
+    # the undo history is dropped once it's saved (unless keep_history) so it doesn't grow for as long as the daemon runs
+    def save(self, snapshot: bool = True, keep_history: bool = False) -> List[str]:
+        changed: List[str] = self.app.journal.changed_targets
+        self.app.save()
+        if not keep_history:
+            self.app.journal.clear_history()
+        if snapshot:
+            self.app.snapshot()
+        return changed
+
+    def undo(self) -> str | None:
+        return repr(edit) if (edit := self.app.undo()) is not None else None
+
+    def redo(self) -> str | None:
+        return repr(edit) if (edit := self.app.redo()) is not None else None
+
+def is_listening(address: str) -> bool:
+    probe: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return True
+
+# a new random token every time the daemon starts, the file is replaced rather than rewritten so it can't be left with
+# someone else's permissions
+def write_token(path: str) -> bytes:
+    token: str = secrets.token_hex(32)
+    if os.path.exists(path):
+        os.remove(path)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+        f.write(token)
+    return token.encode()
+
+class DaemonError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code: int = code
+
+# Client side, keeps the connection open between calls
+#   client = DaemonClient(os.path.join(ResourceSystem.cache_dir(project, romfs), SOCKET_NAME))
+#   client = DaemonClient(port, token_path=os.path.join(ResourceSystem.cache_dir(project, romfs), TOKEN_NAME))
+#   client.call("set_fields", table="ActorInfo", row="Enemy_Bokoblin_Junior", fields={"CalcRadius" : 2.5})
+class DaemonClient:
+    def __init__(self, address: str | int, timeout: float | None = None, token_path: str = ""):
+        self.address: str | int = address
+        self._socket: socket.socket
+        if isinstance(address, int):
+            self._socket = socket.create_connection(("127.0.0.1", address), timeout)
+            with open(token_path, "rb") as f:
+                self._socket.sendall(f.read().strip() + b"\n")
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(address)
+        self._file = self._socket.makefile("rb")
+        self._id: int = 0
+
+    def call(self, method: str, **params: Any) -> Any:
+        self._id += 1
+        self._socket.sendall(json.dumps({"jsonrpc" : "2.0", "id" : self._id, "method" : method, "params" : params}).encode() + b"\n")
+        response: Dict[str, Any] = json.loads(self._file.readline())
+        if "error" in response:
+            raise DaemonError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Keeps the romfs + project loaded and serves requests over a local socket")
+    parser.add_argument("--romfs", required=True, help="Path to the romfs dump")
+    parser.add_argument("--project", required=True, help="Path to the project directory")
+    parser.add_argument("--socket", default="", help=f"Unix socket path (defaults to {SOCKET_NAME} in the project's cache directory)")
+    parser.add_argument("--port", type=int, default=0, help=f"Listen on this localhost TCP port instead of a Unix socket (clients authenticate with the token in {TOKEN_NAME} in the cache directory)")
+    parser.add_argument("--log", action="store_true", help="Enable ResourceSystem logging")
+    args = parser.parse_args()
+
+    cache_dir: str = ResourceSystem.cache_dir(args.project, args.romfs)
+    address: str | int = args.port if args.port else (args.socket or os.path.join(cache_dir, SOCKET_NAME))
+    if isinstance(address, str) and os.path.exists(address) and is_listening(address): # before spending the time loading
+        print(f"Another daemon is already listening on {address}")
+        return 1
+    app: App = App.open(args.project, args.romfs, args.log)
+    daemon: ActorToolDaemon = ActorToolDaemon(app)
+    try:
+        daemon.serve(address, os.path.join(cache_dir, TOKEN_NAME))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(e)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
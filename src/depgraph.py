@@ -0,0 +1,239 @@
+from res import ResourceSystem
+from scan import PackScanner
+from utils import *
+
+import oead
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+GLOBAL_DEPGRAPH_INSTANCE = None
+
+# Graph of which files every actor pulls in (ActorParam -> components -> $parent chains, life/damage params,
+# GameParameterTable entries, AS, etc.) so the whole set can be loaded in one go instead of one file at a time
+# Built by scanning every pack once (build()) and stored in the cache directory (see ResourceSystem.cache_dir)
+# Paths are stored the way Archive/ResourceSystem use them internally (no Work/ or ?, .bgyml instead of .gyml)
+class DependencyGraph:
+    INDEX_NAME: str = ".depgraph.json"
+    INDEX_VERSION: int = 1
+
+    @classmethod
+    def get(cls) -> "DependencyGraph":
+        global GLOBAL_DEPGRAPH_INSTANCE
+        if GLOBAL_DEPGRAPH_INSTANCE is None:
+            raise ValueError("DependencyGraph has not yet been initialized")
+        return GLOBAL_DEPGRAPH_INSTANCE
+
+    def __init__(self):
+        self.sys: ResourceSystem = ResourceSystem.get()
+        self.clear()
+        self.load()
+        global GLOBAL_DEPGRAPH_INSTANCE
+        GLOBAL_DEPGRAPH_INSTANCE = self
+
+    def clear(self) -> None:
+        self._files: List[str] = [] # every path is stored once and referred to by index
+        self._file_ids: Dict[str, int] = {}
+        self._packs: Dict[str, List[int]] = {} # actor -> [mtime, size] of the pack when it was scanned
+        self._local: Dict[str, List[int]] = {} # actor -> files used from inside its own pack
+        self._closure: Dict[str, List[int]] = {} # actor -> every file used from outside its pack
+        self._edges: Dict[int, List[int]] = {} # shared file -> files it references directly
+        self._dependents: Dict[int, List[str]] | None = None
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.sys.cache_path, DependencyGraph.INDEX_NAME)
+
+    @property
+    def is_built(self) -> bool:
+        return len(self._packs) != 0
+
+    def _file_id(self, path: str) -> int:
+        if (id := self._file_ids.get(path)) is None:
+            id = self._file_ids[path] = len(self._files)
+            self._files.append(path)
+        return id
+
+    # strings that look like file references (Work/Component/..., ?GameParameter/..., etc.)
+    @staticmethod
+    def is_ref(value: str) -> bool:
+        if value.startswith("Work/"):
+            return True
+        return value[:1] in ("?", "/") and "/" in value[1:] and "." in value
+
+    @staticmethod
+    def find_refs(node: Any, refs: List[str] | None = None) -> List[str]:
+        if refs is None:
+            refs = []
+        if isinstance(node, str):
+            if DependencyGraph.is_ref(node):
+                refs.append(node)
+        elif isinstance(node, oead.byml.Dictionary):
+            for key in node:
+                DependencyGraph.find_refs(node[key], refs)
+        elif isinstance(node, oead.byml.Array):
+            for value in node:
+                DependencyGraph.find_refs(value, refs)
+        return refs
+
+    # anything that isn't in the actor's own pack, same lookup order as ResourceSystem.load_file
+    def _load_shared(self, path: str) -> bytes | None:
+        for archive in (self.sys.resident_common, self.sys.bootup):
+            if archive is not None and (data := archive.get_file(path)) is not None:
+                return data
+        if os.path.exists(full_path := self.sys.resolve_path(path)):
+            return self.sys._read_file(full_path)
+        return None
+
+    # adds a shared file and everything it references to the graph, each file is only ever loaded once
+    def _expand(self, path: str) -> None:
+        stack: List[str] = [path]
+        while stack:
+            path = stack.pop()
+            if (id := self._file_id(path)) in self._edges:
+                continue
+            self._edges[id] = []
+            if not path.endswith(".bgyml") or (data := self._load_shared(path)) is None:
+                continue
+            try:
+                refs: List[str] = self.find_refs(parse_byml(data))
+            except BYML_ERRORS:
+                continue
+            for ref in refs:
+                self._edges[id].append(self._file_id(ref := self.sys.resolve_path(ref, False)))
+                stack.append(ref)
+
+    def _add_actor(self, name: str, sarc: oead.Sarc) -> None:
+        files: Dict[str, memoryview] = {f.name: f.data for f in sarc.get_files()}
+        local: Set[int] = set()
+        direct: Set[int] = set()
+        queue: List[str] = []
+        if (actor_param := f"Actor/{name}.engine__actor__ActorParam.bgyml") in files:
+            queue.append(actor_param)
+        while queue:
+            path: str = queue.pop()
+            if path in files:
+                if (id := self._file_id(path)) in local:
+                    continue
+                local.add(id)
+                if path.endswith(".bgyml"):
+                    try:
+                        queue.extend(self.sys.resolve_path(ref, False) for ref in self.find_refs(parse_byml(bytes(files[path]))))
+                    except BYML_ERRORS:
+                        pass
+            else:
+                self._expand(path)
+                direct.add(self._file_id(path))
+        closure: Set[int] = set()
+        stack: List[int] = list(direct)
+        while stack:
+            if (id := stack.pop()) in closure:
+                continue
+            closure.add(id)
+            stack.extend(self._edges.get(id, []))
+        self._local[name] = sorted(local)
+        self._closure[name] = sorted(closure)
+
+    # only rescans the actors whose pack was added or changed since the last build (same check as ReferenceIndex)
+    # shared files are only looked at again on a full build, returns the number of actors that were scanned
+    def refresh(self, full: bool = False) -> int:
+        if full:
+            self.clear()
+        scanner: PackScanner = PackScanner()
+        paths: Dict[str, str] = scanner.pack_paths()
+        for name in [name for name in self._packs if name not in paths]:
+            self._drop_actor(name)
+        stale: Dict[str, str] = {name: path for name, path in paths.items()
+                                 if name not in self._packs or self._packs[name] != scanner.stat(path)}
+        if stale:
+            if self.sys.is_log:
+                self.sys.log(f"Building dependency graph for {len(stale)} actors")
+            with self.sys.tracer.span("DependencyGraph.build", "index", actors=len(stale)):
+                for name, path, sarc in scanner.scan(stale):
+                    self._packs[name] = scanner.stat(path)
+                    self._add_actor(name, sarc)
+        self._dependents = None
+        self.save()
+        return len(stale)
+
+    def build(self) -> None:
+        self.refresh(True)
+
+    def _drop_actor(self, name: str) -> None:
+        self._packs.pop(name, None)
+        self._local.pop(name, None)
+        self._closure.pop(name, None)
+        self._dependents = None
+
+    def save(self) -> None:
+        Path(self.index_path).write_text(json.dumps({
+            "Version" : DependencyGraph.INDEX_VERSION,
+            "RomfsPath" : self.sys.romfs_path,
+            "Files" : self._files,
+            "Packs" : self._packs,
+            "Local" : self._local,
+            "Closure" : self._closure,
+            "Edges" : {str(id): refs for id, refs in self._edges.items() if refs}
+        }, separators=(",", ":")))
+
+    def load(self) -> bool:
+        try:
+            index: Dict[str, Any] = json.loads(Path(self.index_path).read_text())
+        except (OSError, ValueError):
+            return False
+        # an index built against a different romfs dump is useless
+        if index.get("Version") != DependencyGraph.INDEX_VERSION or index.get("RomfsPath") != self.sys.romfs_path:
+            return False
+        self.clear()
+        self._files = index["Files"]
+        self._file_ids = {path: id for id, path in enumerate(self._files)}
+        self._packs = index["Packs"]
+        self._local = index["Local"]
+        self._closure = index["Closure"]
+        self._edges = {int(id): refs for id, refs in index["Edges"].items()}
+        return True
+
+    # every shared file the actor needs (not including its own pack)
+    def closure(self, actor: str) -> List[str]:
+        return [self._files[id] for id in self._closure.get(actor, [])]
+
+    def local_files(self, actor: str) -> List[str]:
+        return [self._files[id] for id in self._local.get(actor, [])]
+
+    def references(self, path: str) -> List[str]:
+        if (id := self._file_ids.get(self.sys.resolve_path(path, False))) is None:
+            return []
+        return [self._files[ref] for ref in self._edges.get(id, [])]
+
+    # actors that use this file either directly or through another file
+    def dependents(self, path: str) -> List[str]:
+        if self._dependents is None:
+            self._dependents = {}
+            for actor in self._closure:
+                for id in self._closure[actor] + self._local[actor]:
+                    self._dependents.setdefault(id, []).append(actor)
+        if (id := self._file_ids.get(self.sys.resolve_path(path, False))) is None:
+            return []
+        return sorted(self._dependents.get(id, []))
+
+    # whether the pack that would be loaded now is the one the actor was scanned from
+    def is_current(self, actor: str) -> bool:
+        if actor not in self._packs:
+            return False
+        try:
+            return PackScanner.stat(self.sys.resolve_path(f"Pack/Actor/{actor}.pack.zs")) == self._packs[actor]
+        except OSError:
+            return False
+
+    # loads the actor's pack and everything it depends on in one batch
+    # actors whose pack changed since the graph was built are dropped (until the next refresh) instead of prefetching
+    # a file set that might not match anymore
+    def prefetch(self, actor: str) -> int:
+        if actor not in self._closure:
+            return 0
+        if not self.is_current(actor):
+            self._drop_actor(actor)
+            return 0
+        return self.sys.prefetch([f"Pack/Actor/{actor}.pack.zs"] + self.closure(actor))
@@ -0,0 +1,42 @@
+from compendium import CompendiumMgr
+from gmd import GameDataMgr
+from rsdb import RSDBMgr
+
+from typing import Any, List
+
+# An edit to one of the shared managers (RSDB, GameData, Compendium) stored as a method call so it can be replayed later
+# This is what lets actor packs get built in worker processes - the worker records what it did to its own copy of the
+# tables and the main process replays it against the real ones
+class SharedEdit:
+    def __init__(self, mgr: str, method: str, args: tuple = (), table: str = ""):
+        self.mgr: str = mgr
+        self.method: str = method
+        self.args: tuple = args
+        self.table: str = table # for RSDB this is the property name of the table (e.g. actorinfo or tagtable)
+        self.result: Any = None # what run() returned, replaying it somewhere else should give the same thing
+
+    def target(self) -> Any:
+        match self.mgr:
+            case "rsdb":
+                rsdb_mgr: RSDBMgr = RSDBMgr.get()
+                return getattr(rsdb_mgr, self.table) if self.table else rsdb_mgr
+            case "gmd":
+                return GameDataMgr.get()
+            case "compendium":
+                return CompendiumMgr.get()
+            case _:
+                raise ValueError(f"Unknown manager: {self.mgr}")
+
+    def apply(self) -> Any:
+        return getattr(self.target(), self.method)(*self.args)
+
+    # applies the edit and records it if a list is provided
+    def run(self, edits: List["SharedEdit"] | None = None) -> Any:
+        if edits is not None:
+            edits.append(self)
+        self.result = self.apply()
+        return self.result
+
+    def __repr__(self) -> str:
+        target: str = f"{self.mgr}.{self.table}" if self.table else self.mgr
+        return f"{target}.{self.method}{self.args}"
@@ -1,13 +1,17 @@
+from journal import ChangeJournal, Edit, MISSING, NUMBER_TYPES, snapshot
 from res import ResourceSystem
+from rsdb import NUMPY_TYPES, sql_type
+from strpool import StringPool, pooled
 from utils import *
 from zstd import ZstdContext
 
 import mmh3
+import numpy as np
 import oead
 
 import math
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Set
 
 GAMEDATA_TYPES = [
     "Bool", "BoolArray", "Int", "IntArray", "Float", "FloatArray", "Enum", "EnumArray", "Vector2", "Vector2Array", "Vector3", "Vector3Array",
@@ -23,8 +27,393 @@ RESET_TYPES = [
 
 MAP_COLUMNS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
 
+# lookup tables for the ResetTypeValue/ExtraByte codecs
+RESET_TYPE_BITS: Dict[str, int] = {t : 1 << i for i, t in enumerate(RESET_TYPES)}
+RESET_TYPE_MASK: int = (1 << len(RESET_TYPES)) - 1
+# reset types of every possible value (ignoring unknown bits)
+RESET_TYPE_LISTS: List[tuple[str, ...]] = [tuple(t for t, bit in RESET_TYPE_BITS.items() if value & bit) for value in range(RESET_TYPE_MASK + 1)]
+# ExtraByte 1-80 -> A1-J8, 0 (or anything else) means no map unit
+MAP_UNITS: List[str] = [f"{column}{row}" for row in range(1, 9) for column in MAP_COLUMNS]
+MAP_UNIT_BYTES: Dict[str, int] = {unit : i + 1 for i, unit in enumerate(MAP_UNITS)}
+MAP_UNIT_TABLE: np.ndarray = np.array([None] + MAP_UNITS, dtype=object)
+
+# keys of Vector2/Vector3 values
+VECTOR_KEYS: Dict[int, tuple[str, ...]] = {2 : ("x", "y"), 3 : ("x", "y", "z")}
+
 GLOBAL_GAMEDATAMGR_INSTANCE = None
 
+# bytes a flag takes up in the save file given its array size (1 for non-arrays) and, for binary flags, the size of each
+# value (the DefaultValue), works the same on numpy arrays of sizes
+def flag_data_size(datatype: str, n: Any, binary_size: Any = 0) -> Any:
+    size: Any = 8
+    if "Array" in datatype:
+        size += 4
+    if datatype in ["Bool", "Int", "UInt", "Float", "Enum"]:
+        pass
+    elif datatype == "BoolArray":
+        size += (np.maximum((n + 7) // 8, 4) + 3) // 4 * 4
+    elif datatype in ["IntArray", "FloatArray", "UIntArray", "EnumArray"]:
+        size += n * 4
+    elif "Vector2" in datatype:
+        size += n * 8
+    elif "Vector3" in datatype:
+        size += n * 12
+    elif "WString16" in datatype:
+        size += n * 32
+    elif "WString32" in datatype:
+        size += n * 64
+    elif "WString64" in datatype:
+        size += n * 128
+    elif "String16" in datatype:
+        size += n * 16
+    elif "String32" in datatype:
+        size += n * 32
+    elif "String64" in datatype:
+        size += n * 64
+    elif "Int64" in datatype or "UInt64" in datatype:
+        size += n * 8
+    elif datatype == "Bool64bitKey":
+        pass
+    elif "Binary" in datatype:
+        size += n * 4
+        size += n * binary_size
+    elif datatype in ["Struct", "BoolExp"]:
+        pass
+    else:
+        raise ValueError(f"Invalid Type: {datatype}")
+    return size
+
+# Typed column store for the flags of one datatype
+# Scalar keys (Hash, SaveFileIndex, ResetTypeValue, ExtraByte, ArraySize, ...) get a numpy column each along with a mask
+# of which flags have them. DefaultValue is stored depending on what it is:
+#   scalars: one value per flag
+#   vectors: a (flags, 2 or 3) float32 array
+#   arrays: the elements of every flag in one flat array, flag i's are defaults[default_offsets[i]:default_offsets[i + 1]]
+#   (struct members are stored as (hash, value) pairs and vectors as rows like above)
+# Anything that doesn't fit (enum value lists, values of a different type than the rest, ...) is kept per flag in
+# _extra so to_array() gives back exactly what went in
+class FlagColumns:
+    def __init__(self, datatype: str, data: oead.byml.Array):
+        self.datatype: str = datatype
+        self.count: int = len(data)
+        self._types: Dict[str, str] = {} # key -> NUMPY_TYPES key
+        self.values: Dict[str, np.ndarray] = {}
+        self.present: Dict[str, np.ndarray] = {}
+        self._extra: Dict[int, Dict[str, Any]] = {}
+        self.default_kind: str = "" # scalar, vector or array, empty if every DefaultValue is in _extra
+        self.default_type: str = "" # NUMPY_TYPES key, Vector or Member
+        self.default_width: int = 1
+        self.default_present: np.ndarray = np.zeros(self.count, dtype=np.bool_)
+        self.defaults: np.ndarray = np.zeros(0)
+        self.default_offsets: np.ndarray | None = None
+        self._element_class: type | None = None # for scalar elements, checking the class is enough
+        for flag in data:
+            if "DefaultValue" in flag and self._classify(flag["DefaultValue"]):
+                break
+        self._classes: Dict[str, type] = {} # key -> class of the values that go in its column
+        self._skipped: Set[str] = set() # keys that only ever go in _extra
+        self._keys: List[str] = [] # iterating over an oead dictionary is slow so the keys of the first flag are tried first
+        columns: Dict[str, List[Any]] = {}
+        defaults: List[Any] = []
+        offsets: List[int] = [0]
+        for i, flag in enumerate(data):
+            values, default, extra = self._split(flag, True)
+            for key, value in values.items():
+                if (column := columns.get(key)) is None:
+                    column = columns[key] = [None] * self.count
+                column[i] = value
+            if default is not None:
+                defaults.extend(default)
+                self.default_present[i] = True
+            elif self.default_kind and self.default_kind != "array":
+                defaults.append(self._placeholder())
+            if self.default_kind == "array":
+                offsets.append(len(defaults))
+            if extra:
+                self._extra[i] = extra
+        for key, t in self._types.items():
+            dtype: Any = NUMPY_TYPES[t][0]
+            self.present[key] = np.fromiter((value is not None for value in columns[key]), dtype=np.bool_, count=self.count)
+            if dtype is object:
+                self.values[key] = np.array(columns[key], dtype=object)
+            else:
+                self.values[key] = np.array([0 if value is None else value for value in columns[key]], dtype=dtype)
+        if self.default_kind:
+            dtype = {"Vector" : np.float32, "Member" : np.uint32, "" : object}.get(self.default_type) or NUMPY_TYPES[self.default_type][0]
+            self.defaults = np.array(defaults, dtype=dtype)
+            if self.default_width > 1:
+                self.defaults = self.defaults.reshape(-1, self.default_width)
+        if self.default_kind == "array":
+            self.default_offsets = np.array(offsets, dtype=np.int64)
+
+    # (column values, encoded DefaultValue or None if it doesn't fit, everything else) for a flag
+    # learn adds columns for keys that haven't been seen yet, otherwise those end up with everything else
+    def _split(self, flag: oead.byml.Dictionary, learn: bool = False) -> tuple[Dict[str, Any], List[Any] | None, Dict[str, Any]]:
+        items: List[tuple[str, Any]]
+        try:
+            if len(flag) != len(self._keys):
+                raise KeyError()
+            items = [(key, flag[key]) for key in self._keys]
+        except KeyError:
+            items = [(key, flag[key]) for key in flag]
+            self._keys = self._keys or [key for key, value in items]
+        values: Dict[str, Any] = {}
+        default: List[Any] | None = None
+        extra: Dict[str, Any] = {}
+        for key, value in items:
+            if key == "DefaultValue":
+                if (default := self._encode_default(value)) is None:
+                    extra[key] = snapshot(value)
+                continue
+            if (cls := self._classes.get(key)) is None and learn and key not in self._skipped:
+                if (t := sql_type(value)) in NUMPY_TYPES:
+                    self._types[key] = t
+                    cls = self._classes[key] = type(value)
+                else:
+                    self._skipped.add(key)
+            if type(value) is cls:
+                values[key] = value.v if cls in NUMBER_TYPES else pooled(value, "GameData") if cls is str else value
+            else:
+                extra[key] = snapshot(value)
+        return values, default, extra
+
+    # decides how DefaultValue is stored based on the first one, arrays are undecided until there's a non-empty one
+    def _classify(self, value: Any) -> bool:
+        if isinstance(value, oead.byml.Array):
+            self.default_kind = "array"
+            if len(value) == 0:
+                return False
+            value = value[0]
+        elif self.default_kind == "array":
+            return False
+        if (element := self._element_type(value)) is None:
+            return True # only empty arrays (if it's arrays) go in the columns then
+        self.default_kind = self.default_kind or ("vector" if element[0] == "Vector" else "scalar")
+        self.default_type, self.default_width = element
+        if self.default_type in NUMPY_TYPES:
+            self._element_class = type(value)
+        return True
+
+    @staticmethod
+    def _element_type(value: Any) -> tuple[str, int] | None:
+        if isinstance(value, oead.byml.Dictionary):
+            if len(value) in VECTOR_KEYS and all(k in value and isinstance(value[k], oead.F32) for k in VECTOR_KEYS[len(value)]):
+                return "Vector", len(value)
+            if len(value) == 2 and isinstance(value.get("Hash"), oead.U32) and isinstance(value.get("Value"), oead.U32):
+                return "Member", 2
+            return None
+        if (t := sql_type(value)) in NUMPY_TYPES:
+            return t, 1
+        return None
+
+    def _fits(self, value: Any) -> bool:
+        if self._element_class is not None:
+            return type(value) is self._element_class
+        return self._element_type(value) == (self.default_type, self.default_width)
+
+    def _encode(self, value: Any) -> Any:
+        if self._element_class in NUMBER_TYPES:
+            return value.v
+        if self.default_type == "Vector":
+            return [value[k].v for k in VECTOR_KEYS[self.default_width]]
+        if self.default_type == "Member":
+            return [value["Hash"].v, value["Value"].v]
+        if self.default_type == "String":
+            return pooled(value, "GameData")
+        return value.v if hasattr(value, "v") else value
+
+    def _decode(self, value: Any) -> Any:
+        if self.default_type == "Vector":
+            return to_dict({k: oead.F32(float(v)) for k, v in zip(VECTOR_KEYS[self.default_width], value)})
+        if self.default_type == "Member":
+            return to_dict({"Hash" : oead.U32(int(value[0])), "Value" : oead.U32(int(value[1]))})
+        return NUMPY_TYPES[self.default_type][1](value)
+
+    def _placeholder(self) -> Any:
+        if self.default_width > 1:
+            return [0] * self.default_width
+        return "" if self.default_type == "String" else 0
+
+    def _encode_default(self, value: Any) -> List[Any] | None:
+        if self.default_kind == "array":
+            if not isinstance(value, oead.byml.Array) or not all(self._fits(item) for item in value):
+                return None
+            return [self._encode(item) for item in value]
+        if self.default_kind == "" or not self._fits(value):
+            return None
+        return [self._encode(value)]
+
+    def _zero(self, key: str) -> Any:
+        return "" if self._types[key] == "String" else 0
+
+    # writes a split flag into row i (which has to exist already)
+    def _write(self, i: int, values: Dict[str, Any], default: List[Any] | None, extra: Dict[str, Any]) -> None:
+        for key in self._types:
+            self.values[key][i] = values.get(key, self._zero(key))
+            self.present[key][i] = key in values
+        if extra:
+            self._extra[i] = extra
+        else:
+            self._extra.pop(i, None)
+        self.default_present[i] = default is not None
+        if self.default_kind == "array":
+            start, end = int(self.default_offsets[i]), int(self.default_offsets[i + 1])
+            encoded: np.ndarray = np.array(default or [], dtype=self.defaults.dtype).reshape((-1,) + self.defaults.shape[1:])
+            self.defaults = np.concatenate([self.defaults[:start], encoded, self.defaults[end:]])
+            self.default_offsets[i + 1:] += len(encoded) - (end - start)
+        elif self.default_kind:
+            self.defaults[i] = default[0] if default is not None else self._placeholder()
+
+    # keeping the columns up to date with edits is a lot cheaper than building them again
+    def extend(self, flags: List[oead.byml.Dictionary]) -> None:
+        start: int = self.count
+        n: int = len(flags)
+        for key in self._types:
+            self.values[key] = np.concatenate([self.values[key], np.full(n, self._zero(key), dtype=self.values[key].dtype)])
+            self.present[key] = np.concatenate([self.present[key], np.zeros(n, dtype=np.bool_)])
+        self.default_present = np.concatenate([self.default_present, np.zeros(n, dtype=np.bool_)])
+        if self.default_kind == "array":
+            self.default_offsets = np.concatenate([self.default_offsets, np.full(n, self.default_offsets[-1])])
+        elif self.default_kind:
+            placeholders: np.ndarray = np.array([self._placeholder()] * n, dtype=self.defaults.dtype)
+            self.defaults = np.concatenate([self.defaults, placeholders.reshape((-1,) + self.defaults.shape[1:])])
+        self.count += n
+        for i, flag in enumerate(flags):
+            self._write(start + i, *self._split(flag))
+
+    def append(self, flag: oead.byml.Dictionary) -> None:
+        self.extend([flag])
+
+    def __setitem__(self, i: int, flag: oead.byml.Dictionary) -> None:
+        self._write(i, *self._split(flag))
+
+    def pop(self, i: int = -1) -> None:
+        if i < 0:
+            i += self.count
+        for key in self._types:
+            self.values[key] = np.delete(self.values[key], i)
+            self.present[key] = np.delete(self.present[key], i)
+        self.default_present = np.delete(self.default_present, i)
+        if self.default_kind == "array":
+            start, end = int(self.default_offsets[i]), int(self.default_offsets[i + 1])
+            self.defaults = np.concatenate([self.defaults[:start], self.defaults[end:]])
+            self.default_offsets = np.delete(self.default_offsets, i + 1)
+            self.default_offsets[i + 1:] -= end - start
+        elif self.default_kind:
+            self.defaults = np.delete(self.defaults, i, axis=0)
+        self._extra = {j - (j > i): extra for j, extra in self._extra.items() if j != i}
+        self.count -= 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def hashes(self) -> np.ndarray:
+        return self.values["Hash"] if "Hash" in self.values else np.zeros(self.count, dtype=np.uint32)
+
+    # index of the flag with this hash or -1
+    def find(self, hash: int | oead.U32) -> int:
+        indices: np.ndarray = np.flatnonzero(self.hashes == int(hash))
+        return int(indices[0]) if len(indices) else -1
+
+    # mask of the flags whose key is value (only looks at the column, values of another type are in _extra)
+    def equals(self, key: str, value: Any) -> np.ndarray:
+        if key not in self._types:
+            return np.zeros(self.count, dtype=np.bool_)
+        return self.present[key] & (self.values[key] == (value.v if hasattr(value, "v") else value))
+
+    # mask of the flags matching every condition given, reset types have to all be set
+    def select(self, save_file_index: int | None = None, reset_types: str | List[str] | None = None, map_unit: str | None = None,
+               **values: Any) -> np.ndarray:
+        mask: np.ndarray = np.ones(self.count, dtype=np.bool_)
+        if save_file_index is not None:
+            mask &= self.equals("SaveFileIndex", save_file_index)
+        if reset_types:
+            bits: int = int(GameDataMgr.reset_type_value(*([reset_types] if isinstance(reset_types, str) else reset_types)))
+            if "ResetTypeValue" not in self._types:
+                return np.zeros(self.count, dtype=np.bool_)
+            mask &= self.present["ResetTypeValue"] & (self.values["ResetTypeValue"] & bits == bits)
+        if map_unit is not None:
+            mask &= self.equals("ExtraByte", GameDataMgr.extra_byte(map_unit))
+        for key, value in values.items():
+            mask &= self.equals(key, value)
+        return mask
+
+    # (flags, len(RESET_TYPES)) mask of which reset types each flag has
+    def reset_type_flags(self) -> np.ndarray:
+        values, present = self.int_column("ResetTypeValue")
+        return GameDataMgr.reset_type_flags(values) & present[:, None]
+
+    # map unit of every flag, None for flags without one
+    def map_units(self) -> np.ndarray:
+        values, present = self.int_column("ExtraByte")
+        return GameDataMgr.get_map_units(np.where(present, values, 0))
+
+    # int value of key for every flag, including values in _extra, present says which flags have it
+    def int_column(self, key: str) -> tuple[np.ndarray, np.ndarray]:
+        values: np.ndarray = np.zeros(self.count, dtype=np.int64)
+        present: np.ndarray = np.zeros(self.count, dtype=np.bool_)
+        if key == "DefaultValue":
+            if self.default_kind == "scalar" and self.default_type in NUMPY_TYPES and self.default_type not in ("String", "Bool"):
+                values[:] = self.defaults
+                present[:] = self.default_present
+        elif key in self._types and self._types[key] not in ("String", "Bool"):
+            values[:] = self.values[key]
+            present[:] = self.present[key]
+        for i, extra in self._extra.items():
+            if key in extra and sql_type(extra[key]) in NUMPY_TYPES and sql_type(extra[key]) != "String":
+                values[i] = int(extra[key])
+                present[i] = True
+        return values, present
+
+    # ArraySize if there is one, otherwise Size, otherwise the length of DefaultValue
+    def array_sizes(self) -> np.ndarray:
+        sizes: np.ndarray = np.full(self.count, -1, dtype=np.int64)
+        if self.default_kind == "array":
+            sizes[self.default_present] = np.diff(self.default_offsets)[self.default_present]
+        for i, extra in self._extra.items():
+            if isinstance(extra.get("DefaultValue"), oead.byml.Array):
+                sizes[i] = len(extra["DefaultValue"])
+        for key in ("Size", "ArraySize"):
+            values, present = self.int_column(key)
+            sizes[present] = values[present]
+        if len(missing := np.flatnonzero(sizes < 0)):
+            raise ValueError(f"Could not determine array size for {self.datatype} - {'0x%08x' % int(self.hashes[missing[0]])}")
+        return sizes
+
+    # vectorized get_data_size
+    def data_sizes(self) -> np.ndarray:
+        n: np.ndarray = self.array_sizes() if "Array" in self.datatype else np.ones(self.count, dtype=np.int64)
+        binary_size: Any = 0
+        if "Binary" in self.datatype:
+            binary_size, present = self.int_column("DefaultValue")
+            if not present.all():
+                raise ValueError(f"Missing binary size for {self.datatype} - {'0x%08x' % int(self.hashes[np.flatnonzero(~present)[0]])}")
+        sizes: Any = flag_data_size(self.datatype, n, binary_size)
+        return sizes if isinstance(sizes, np.ndarray) else np.full(self.count, sizes, dtype=np.int64)
+
+    def save_file_indices(self) -> np.ndarray:
+        values, present = self.int_column("SaveFileIndex")
+        if not present.all():
+            raise KeyError("SaveFileIndex")
+        return values
+
+    def _default(self, i: int) -> Any:
+        if self.default_kind == "array":
+            return to_array([self._decode(value) for value in self.defaults[self.default_offsets[i]:self.default_offsets[i + 1]]])
+        return self._decode(self.defaults[i])
+
+    def flag(self, i: int) -> oead.byml.Dictionary:
+        values: Dict[str, Any] = {key: NUMPY_TYPES[t][1](self.values[key][i]) for key, t in self._types.items() if self.present[key][i]}
+        if self.default_present[i]:
+            values["DefaultValue"] = self._default(i)
+        for key, value in self._extra.get(i, {}).items():
+            values[key] = snapshot(value)
+        return to_dict(values)
+
+    def to_array(self) -> oead.byml.Array:
+        return to_array([self.flag(i) for i in range(self.count)])
+
 class FlagHandle:
     def __init__(self, name: str, datatype: str, copy_name: str, parent: str = "", members: List[tuple[str, str]] = []):
         self.name: str = name
@@ -37,7 +426,18 @@ class FlagHandle:
         else:
             self.members = []
 
+    # name of the flag being copied
+    @property
+    def copy_name(self) -> str:
+        return f"{self.parent}.{self.flag_to_copy}" if self.parent else self.flag_to_copy
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.parent}.{self.name}" if self.parent else self.name
+
 class GameDataMgr:
+    TARGET: str = "GameData"
+
     @classmethod
     def get(cls) -> "GameDataMgr":
         global GLOBAL_GAMEDATAMGR_INSTANCE
@@ -47,14 +447,49 @@ class GameDataMgr:
 
     def __init__(self):
         self.sys: ResourceSystem = ResourceSystem.get()
-        self._list: oead.byml.Dictionary = oead.byml.from_binary(
+        self._list: oead.byml.Dictionary = parse_byml(
             self.sys.load_file(f"GameData/GameDataList.Product.{100 if self.sys.version == 100 else 110}.byml.zs"))
-        hashes: oead.byml.Dictionary = oead.byml.from_binary(Path("res/hashes.byml").read_bytes())
-        self.hash_map: Dict[int, str] = {int(k): hashes[k] for k in hashes}
-        self._is_changed: bool = False
+        hashes: oead.byml.Dictionary = parse_byml(Path("res/hashes.byml").read_bytes())
+        pool: StringPool = StringPool.get()
+        self.hash_map: Dict[int, str] = {int(k): pool.intern(hashes[k], "GameData") for k in hashes}
+        self._columns: Dict[str, FlagColumns] = {}
+        self._columns_revision: int = -1
         global GLOBAL_GAMEDATAMGR_INSTANCE
         GLOBAL_GAMEDATAMGR_INSTANCE = self
 
+    @property
+    def _is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed(GameDataMgr.TARGET)
+
+    @_is_changed.setter
+    def _is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed(GameDataMgr.TARGET, state)
+
+    def _flag_name(self, hash: int | oead.U32) -> str:
+        name: str | None = self.try_reverse_hash(hash)
+        return name if name is not None else "0x%08x" % int(hash)
+
+    # records appending value to array (either a flag list or a struct's member list)
+    def _record_append(self, array: oead.byml.Array, row: str, field: str, datatype: str = "",
+                       update: Callable[[FlagColumns], None] | None = None) -> None:
+        new: oead.byml.Dictionary = snapshot(array[len(array) - 1])
+        ChangeJournal.get().record(Edit(GameDataMgr.TARGET, row, field, MISSING, new,
+                                        lambda: array.pop(), lambda: array.append(snapshot(new))))
+        self._flags_changed(datatype or field, update)
+
+    # keeps the cached columns of datatype in sync after GameDataMgr made a single change to it (update applies the same
+    # change to the columns, without one they're just dropped), any other change to the game data (undo/redo, edits that
+    # weren't made through here) drops all of them
+    def _flags_changed(self, datatype: str, update: Callable[[FlagColumns], None] | None = None) -> None:
+        revision: int = ChangeJournal.get().revision(GameDataMgr.TARGET)
+        if revision != self._columns_revision + 1:
+            self._columns.clear()
+        elif update is not None and datatype in self._columns:
+            update(self._columns[datatype])
+        else:
+            self._columns.pop(datatype, None)
+        self._columns_revision = revision
+
     @staticmethod
     def hash(string: str) -> oead.U32:
         return oead.U32(mmh3.hash(string, signed=False))
@@ -67,49 +502,56 @@ class GameDataMgr:
     
     def add_string(self, string: str) -> None:
         if (mm_hash := self.hash(string)) not in self.hash_map:
-            self.hash_map[mm_hash] = string
+            self.hash_map[mm_hash] = StringPool.get().intern(string, "GameData")
 
     @staticmethod
     def reset_type_value(*types: str) -> oead.S32:
         value: int = 0
         for t in types:
-            if t in RESET_TYPES:
-                value |= (2 ** RESET_TYPES.index(t))
+            value |= RESET_TYPE_BITS.get(t, 0)
         return oead.S32(value)
     
     @staticmethod
     def get_reset_types(value: int | oead.S32) -> List[str]:
-        value = int(value)
-        types: List[str] = []
-        for i in range(len(RESET_TYPES)):
-            if value & (2 ** i):
-                types.append(RESET_TYPES[i])
-        return types
+        return list(RESET_TYPE_LISTS[int(value) & RESET_TYPE_MASK])
     
     @staticmethod
     def extra_byte(map_unit: str) -> oead.S32:
         # needs to be A1 - J8
-        if len(map_unit) != 2:
-            return oead.S32(0) # invalid
-        if map_unit[0] not in MAP_COLUMNS:
-            return oead.S32(0)
-        if not map_unit[1].isdigit() or int(map_unit[1]) not in range(9):
-            return oead.S32(0)
-        return oead.S32(MAP_COLUMNS.index(map_unit[0]) + 10 * (int(map_unit[1]) - 1) + 1)
+        return oead.S32(MAP_UNIT_BYTES.get(map_unit, 0))
     
     @staticmethod
     def get_map_unit(extra_byte: int | oead.S32) -> str | None:
-        extra_byte = int(extra_byte)
-        if extra_byte > 80 or extra_byte < 1:
-            return None
-        return MAP_COLUMNS[(extra_byte - 1) % 10] + str(int(((extra_byte - 1) - (extra_byte - 1) % 10) / 10 + 1))
+        return MAP_UNIT_TABLE[extra_byte] if 0 < (extra_byte := int(extra_byte)) <= len(MAP_UNITS) else None
+
+    # column versions of the above for working with every flag at once (see FlagColumns)
+    @staticmethod
+    def reset_type_values(types: Iterable[Iterable[str]]) -> np.ndarray:
+        return np.fromiter((sum(RESET_TYPE_BITS.get(t, 0) for t in set(flag_types)) for flag_types in types), dtype=np.int32)
+
+    # (flags, len(RESET_TYPES)) mask, column i is whether RESET_TYPES[i] is set
+    @staticmethod
+    def reset_type_flags(values: np.ndarray) -> np.ndarray:
+        return (np.asarray(values, dtype=np.int64)[:, None] >> np.arange(len(RESET_TYPES))) & 1 == 1
+
+    @staticmethod
+    def get_reset_types_column(values: np.ndarray) -> List[List[str]]:
+        return [list(RESET_TYPE_LISTS[value]) for value in (np.asarray(values, dtype=np.int64) & RESET_TYPE_MASK).tolist()]
+
+    @staticmethod
+    def extra_bytes(map_units: Iterable[str]) -> np.ndarray:
+        return np.fromiter((MAP_UNIT_BYTES.get(unit, 0) for unit in map_units), dtype=np.int32)
+
+    # object array of map units, None for flags without one
+    @staticmethod
+    def get_map_units(extra_bytes: np.ndarray) -> np.ndarray:
+        extra_bytes = np.asarray(extra_bytes, dtype=np.int64)
+        return MAP_UNIT_TABLE[np.where((extra_bytes > 0) & (extra_bytes <= len(MAP_UNITS)), extra_bytes, 0)]
     
     @staticmethod
     def get_data_size(datatype: str, entry: oead.byml.Dictionary) -> int:
-        size: int = 8
         n: int
         if "Array" in datatype:
-            size += 4
             if "ArraySize" in entry:
                 n = int(entry["ArraySize"])
             elif "Size" in entry:
@@ -120,72 +562,54 @@ class GameDataMgr:
                 raise ValueError(f"Could not determine array size for {datatype} - {'0x%08x' % int(entry['Hash'])}")
         else:
             n = 1
-        if datatype in ["Bool", "Int", "UInt", "Float", "Enum"]:
-            pass
-        elif datatype == "BoolArray":
-            size += math.ceil((4 if math.ceil(n / 8) < 4 else math.ceil(n / 8)) / 4) * 4
-        elif datatype in ["IntArray", "FloatArray", "UIntArray", "EnumArray"]:
-            size += n * 4
-        elif "Vector2" in datatype:
-            size += n * 8
-        elif "Vector3" in datatype:
-            size += n * 12
-        elif "WString16" in datatype:
-            size += n * 32
-        elif "WString32" in datatype:
-            size += n * 64
-        elif "WString64" in datatype:
-            size += n * 128
-        elif "String16" in datatype:
-            size += n * 16
-        elif "String32" in datatype:
-            size += n * 32
-        elif "String64" in datatype:
-            size += n * 64
-        elif "Int64" in datatype or "UInt64" in datatype:
-            size += n * 8
-        elif datatype == "Bool64bitKey":
-            pass
-        elif "Binary" in datatype:
-            size += n * 4
-            size += n * int(entry["DefaultValue"])
-        elif datatype in ["Struct", "BoolExp"]:
-            pass
-        else:
-            raise ValueError(f"Invalid Type: {datatype}")
-        return size
+        return int(flag_data_size(datatype, n, int(entry["DefaultValue"]) if "Binary" in datatype else 0))
+
+    # typed columns for the flags of datatype, built on first use and kept until the flags change (see _flags_changed)
+    def columns(self, datatype: str) -> FlagColumns:
+        if (revision := ChangeJournal.get().revision(GameDataMgr.TARGET)) != self._columns_revision:
+            self._columns.clear()
+            self._columns_revision = revision
+        if (columns := self._columns.get(datatype)) is None:
+            columns = self._columns[datatype] = FlagColumns(datatype, self._list["Data"][datatype] if datatype in self._list["Data"] else oead.byml.Array())
+        return columns
+
+    # hashes of the flags of datatype that match the conditions (see FlagColumns.select)
+    def query_flags(self, datatype: str, **conditions: Any) -> np.ndarray:
+        columns: FlagColumns = self.columns(datatype)
+        return columns.hashes[columns.select(**conditions)]
 
     def calc_save_file_size(self) -> tuple[List[int], List[int], int, int]:
-        sizes: List[int] = [0x20 + 8 * 34 for i in range(7)]
-        offsets: List[int] = [0x20 + 8 * 34 for i in range(7)]
+        sizes: np.ndarray = np.full(7, 0x20 + 8 * 34, dtype=np.int64)
+        offsets: np.ndarray = np.full(7, 0x20 + 8 * 34, dtype=np.int64)
         size: int = 0x20 + 8 * 34
         offset: int = 0x20 + 8 * 34
         has_key: bool = False
-        has_keys: List[bool] = [False for i in range(7)]
+        has_keys: np.ndarray = np.zeros(7, dtype=np.bool_)
         for datatype in GAMEDATA_TYPES:
-            if datatype in ["Struct", "BoolExp"]:
+            if datatype in ["Struct", "BoolExp"] or datatype not in self._list["Data"]:
+                continue
+            columns: FlagColumns = self.columns(datatype)
+            if len(columns) == 0:
                 continue
-            if datatype in self._list["Data"]:
-                for entry in self._list["Data"][datatype]:
-                    if datatype == "Bool64bitKey":
-                        has_key = True
-                    else:
-                        offset += 8
-                    size += (s := self.get_data_size(datatype, entry))
-                    if (i := int(entry["SaveFileIndex"])) != -1:
-                        if datatype == "Bool64bitKey":
-                            has_keys[i] = True
-                        else:
-                            offsets[i] += 8
-                        sizes[i] += s
-        sizes = [sizes[i] + 8 if has_keys[i] else sizes[i] for i in range(7)]
+            data_sizes: np.ndarray = columns.data_sizes()
+            indices: np.ndarray = columns.save_file_indices()
+            saved: np.ndarray = indices != -1
+            size += int(data_sizes.sum())
+            np.add.at(sizes, indices[saved], data_sizes[saved])
+            if datatype == "Bool64bitKey":
+                has_key = True
+                has_keys[indices[saved]] = True
+            else:
+                offset += 8 * len(columns)
+                np.add.at(offsets, indices[saved], 8)
+        sizes[has_keys] += 8
         if has_key:
             size += 8
         for i in range(7):
             if self._list["MetaData"]["SaveDirectory"][i] == "":
                 sizes[i] = 0
                 offsets[i] = 0
-        return sizes, offsets, size, offset
+        return [int(s) for s in sizes], [int(o) for o in offsets], size, offset
     
     def update_metadata(self) -> None:
         sizes, offsets, size, offset = self.calc_save_file_size()
@@ -199,13 +623,15 @@ class GameDataMgr:
             "SaveTypeHash": self._list["MetaData"]["SaveTypeHash"]
         }
 
+    # the flag list is kept fully parsed since the columns read all of it anyway so this is always a full write (oead
+    # writes it faster than BymlSplicer could go through it)
     def save(self) -> None:
         if not self._is_changed:
             return
         self.update_metadata()
         sys:ResourceSystem = ResourceSystem.get()
         sys.save_file(f"GameData/GameDataList.Product.{100 if self.sys.version == 100 else 110}.byml.zs",
-                      oead.byml.to_binary(self._list, False, 7), ZstdContext.DICT_TYPE_DEFAULT) # vanilla file is big endian but who cares
+                      serialize_byml(self._list), ZstdContext.DICT_TYPE_DEFAULT) # vanilla file is big endian but who cares
         self._is_changed = False
     
     def add_flag(self, flag: oead.byml.Dictionary, datatype: str, overwrite: bool = True) -> bool:
@@ -213,27 +639,41 @@ class GameDataMgr:
             return False
         if datatype not in self._list["Data"]:
             self._list["Data"][datatype] = oead.byml.Array()
-            self._list["Data"][datatype].append(flag)
-            return True
-        for i, f in enumerate(self._list["Data"][datatype]):
+        flags: oead.byml.Array = self._list["Data"][datatype]
+        for i, f in enumerate(flags):
             if int(f["Hash"]) == int(flag["Hash"]):
                 if overwrite:
-                    self._list["Data"][datatype][i] = flag
+                    old: oead.byml.Dictionary = copy_dict(f)
+                    flags[i] = flag
+                    new: oead.byml.Dictionary = snapshot(flag)
+                    def undo() -> None:
+                        flags[i] = snapshot(old)
+                    def redo() -> None:
+                        flags[i] = snapshot(new)
+                    ChangeJournal.get().record(Edit(GameDataMgr.TARGET, self._flag_name(flag["Hash"]), datatype, old, new, undo, redo))
+                    self._flags_changed(datatype, lambda columns: columns.__setitem__(i, flag))
                     return True
                 else:
                     return False
-        self._list["Data"][datatype].append(flag)
-        self._is_changed = True
+        flags.append(flag)
+        self._record_append(flags, self._flag_name(flag["Hash"]), datatype, update=lambda columns: columns.append(flag))
         return True
     
     def delete_flag(self, hash: int | oead.U32, datatype: str) -> bool:
         if datatype not in self._list["Data"]:
             return False
         hash = int(hash)
-        for i, f in enumerate(self._list["Data"][datatype]):
+        flags: oead.byml.Array = self._list["Data"][datatype]
+        for i, f in enumerate(flags):
             if hash == int(f["Hash"]):
-                self._list["Data"][datatype].pop(i)
-                self._is_changed = True
+                old: oead.byml.Dictionary = copy_dict(f)
+                flags.pop(i)
+                def undo() -> None:
+                    flags.insert(i, snapshot(old))
+                def redo() -> None:
+                    flags.pop(i)
+                ChangeJournal.get().record(Edit(GameDataMgr.TARGET, self._flag_name(hash), datatype, old, MISSING, undo, redo))
+                self._flags_changed(datatype, lambda columns: columns.pop(i))
                 return True
         return False
     
@@ -272,6 +712,8 @@ class GameDataMgr:
         for member in struct["DefaultValue"]:
             if int(member["Value"]) == int(flag["Hash"]) and overwrite:
                 member["Hash"] = oead.U32(member_hash)
+                self._is_changed = True
+                self._flags_changed("Struct")
                 return self.add_flag(flag, datatype, overwrite)
             else:
                 return False
@@ -352,6 +794,7 @@ class GameDataMgr:
                     print(f"Flag {handle.name} already exists in parent struct")
                     return False
             parent["DefaultValue"].append(to_dict({"Hash" : name_hash, "Value" : self.hash(full_name)}))
+            self._record_append(parent["DefaultValue"], handle.parent, "DefaultValue", "Struct")
         else:
             full_name = handle.name
         new_flag["Hash"] = self.hash(full_name)
@@ -362,7 +805,121 @@ class GameDataMgr:
                 if mem_flag is None:
                     print(f"Could not find flag {copy_name}.{member[0]} to copy")
                     return False
+                mem_flag = copy_dict(mem_flag) # don't overwrite the hash of the flag being copied
                 mem_flag["Hash"] = mem_hash = self.hash(f"{full_name}.{member[0]}")
                 self.add_flag(mem_flag, member[1])
                 new_flag["DefaultValue"].append(to_dict({"Hash" : self.hash(member[0]), "Value" : mem_hash}))
-        return self.add_flag(new_flag, handle.datatype)
\ No newline at end of file
+        return self.add_flag(new_flag, handle.datatype)
+
+    # add_flag_handle for a lot of handles at once (e.g. the flag presets of every new actor), grouped by actor
+    # (handle.name), returns whether each actor's flags were added
+    # flags are looked up by hash through the flag columns instead of scanning the lists for every flag and everything
+    # is appended in one go per list, an actor's flags are only added if all of them can be (a flag or struct member
+    # that already exists counts as a conflict)
+    def add_flag_handles(self, handles: List[FlagHandle]) -> Dict[str, bool]:
+        actors: Dict[str, List[FlagHandle]] = {}
+        names: Set[str] = set()
+        for handle in handles:
+            actors.setdefault(handle.name, []).append(handle)
+            names.update((handle.copy_name, handle.full_name, handle.name, handle.parent))
+            for member, datatype in handle.members:
+                names.update((f"{handle.copy_name}.{member}", f"{handle.full_name}.{member}", member))
+        hashes: Dict[str, int] = {name: mmh3.hash(name, signed=False) for name in names}
+
+        indices: Dict[str, Dict[int, int]] = {} # datatype -> flag hash -> index in the list
+        added: Dict[str, Dict[int, oead.byml.Dictionary]] = {} # datatype -> flag hash -> new flag
+        members: Dict[int, Set[int]] = {} # parent struct hash -> member hashes
+        new_members: Dict[int, List[oead.byml.Dictionary]] = {} # parent struct hash -> new members
+        def index(datatype: str) -> Dict[int, int]:
+            if datatype not in indices:
+                indices[datatype] = dict(zip(self.columns(datatype).hashes.tolist(), range(len(self.columns(datatype)))))
+            return indices[datatype]
+        def find(hash: int, datatype: str) -> oead.byml.Dictionary | None:
+            if (i := index(datatype).get(hash)) is not None:
+                return self._list["Data"][datatype][i]
+            return added.get(datatype, {}).get(hash)
+
+        results: Dict[str, bool] = {}
+        for actor, actor_handles in actors.items():
+            flags: List[tuple[str, oead.byml.Dictionary]] = []
+            parent_members: List[tuple[int, oead.byml.Dictionary]] = []
+            error: str = ""
+            for handle in actor_handles:
+                if (flag := find(hashes[handle.copy_name], handle.datatype)) is None:
+                    error = f"Original flag {handle.copy_name} did not exist"
+                    break
+                if handle.parent != "":
+                    if (parent := find(parent_hash := hashes[handle.parent], "Struct")) is None:
+                        error = f"Could not find parent struct {handle.parent}"
+                        break
+                    if parent_hash not in members:
+                        members[parent_hash] = {int(member["Hash"]) for member in parent["DefaultValue"]}
+                    if hashes[handle.name] in members[parent_hash] or any(
+                            hash == parent_hash and int(member["Hash"]) == hashes[handle.name] for hash, member in parent_members):
+                        error = f"Flag {handle.name} already exists in parent struct"
+                        break
+                    parent_members.append((parent_hash, to_dict({"Hash" : oead.U32(hashes[handle.name]), "Value" : oead.U32(hashes[handle.full_name])})))
+                new_flag: oead.byml.Dictionary = copy_dict(flag)
+                new_flag["Hash"] = oead.U32(hashes[handle.full_name])
+                flags.append((handle.datatype, new_flag))
+                if handle.datatype == "Struct":
+                    self.clear_struct(new_flag)
+                    for member, datatype in handle.members:
+                        if (mem_flag := find(hashes[f"{handle.copy_name}.{member}"], datatype)) is None:
+                            error = f"Could not find flag {handle.copy_name}.{member} to copy"
+                            break
+                        mem_flag = copy_dict(mem_flag)
+                        mem_flag["Hash"] = mem_hash = oead.U32(hashes[f"{handle.full_name}.{member}"])
+                        flags.append((datatype, mem_flag))
+                        new_flag["DefaultValue"].append(to_dict({"Hash" : oead.U32(hashes[member]), "Value" : mem_hash}))
+                    if error:
+                        break
+            seen: Set[tuple[str, int]] = set()
+            for datatype, flag in flags:
+                if error:
+                    break
+                if (key := (datatype, int(flag["Hash"]))) in seen or find(key[1], datatype) is not None:
+                    error = f"Flag {self._flag_name(key[1])} already exists"
+                seen.add(key)
+            if error:
+                print(f"Failed to add flags for {actor}: {error}")
+                results[actor] = False
+                continue
+            for datatype, flag in flags:
+                added.setdefault(datatype, {})[int(flag["Hash"])] = flag
+            for parent_hash, member in parent_members:
+                members[parent_hash].add(int(member["Hash"]))
+                new_members.setdefault(parent_hash, []).append(member)
+            results[actor] = True
+
+        # parent structs that are new themselves get their members before they're added
+        for parent_hash, new in new_members.items():
+            if (i := index("Struct").get(parent_hash)) is None:
+                added["Struct"][parent_hash]["DefaultValue"].extend(new)
+                continue
+            parent = self._list["Data"]["Struct"][i]
+            self._record_extend(parent["DefaultValue"], new, self._flag_name(parent_hash), "DefaultValue", "Struct",
+                                lambda columns, i=i, parent=parent: columns.__setitem__(i, parent))
+        for datatype, new in added.items():
+            if datatype not in self._list["Data"]:
+                self._list["Data"][datatype] = oead.byml.Array()
+            self._record_extend(self._list["Data"][datatype], list(new.values()), "", datatype, datatype,
+                                lambda columns, new=new: columns.extend(list(new.values())))
+        return results
+
+    # appends every value to array as a single edit
+    def _record_extend(self, array: oead.byml.Array, values: List[oead.byml.Dictionary], row: str, field: str, datatype: str,
+                       update: Callable[[FlagColumns], None] | None = None) -> None:
+        for value in values:
+            array.append(value)
+        new: List[oead.byml.Dictionary] = [snapshot(value) for value in values]
+        def undo() -> None:
+            for value in new:
+                array.pop()
+        def redo() -> None:
+            for value in new:
+                array.append(snapshot(value))
+        if not row:
+            row = self._flag_name(values[0]["Hash"]) if len(values) == 1 else f"{len(values)} flags"
+        ChangeJournal.get().record(Edit(GameDataMgr.TARGET, row, field, MISSING, new, undo, redo))
+        self._flags_changed(datatype, update)
\ No newline at end of file
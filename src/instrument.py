@@ -0,0 +1,259 @@
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+GLOBAL_TRACER_INSTANCE = None
+
+# A timed region, byte counts and whatever else is useful go in args (args are inherited by nested spans so things like
+# the actor being built show up on every span underneath it)
+class Span:
+    __slots__ = ("_tracer", "name", "category", "args", "start", "duration", "depth")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self._tracer: Tracer = tracer
+        self.name: str = name
+        self.category: str = category
+        self.args: Dict[str, Any] = args
+        self.start: float = 0.0
+        self.duration: float = 0.0
+        self.depth: int = 0
+
+    # for when the byte count is only known after the work is done
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+    def __enter__(self) -> "Span":
+        stack: List[Span] = self._tracer._stack()
+        if stack:
+            self.args = {**{k: v for k, v in stack[-1].args.items() if k not in Tracer.PER_SPAN_ARGS}, **self.args}
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.duration = time.perf_counter() - self.start
+        self._tracer._stack().pop()
+        self._tracer._emit(self)
+
+# Stand-in for Span when tracing is off so the instrumented code doesn't need to check
+class NullSpan:
+    def set(self, **args: Any) -> None:
+        pass
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+NULL_SPAN = NullSpan()
+
+# Collects spans and writes them out as either JSON lines (one event per line, written as they happen) or a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev, written on flush/exit)
+# Can also be turned on with the ACTORTOOL_TRACE (trace file path, .json for Chrome format) and ACTORTOOL_PROFILE
+# (directory to dump profiles to) environment variables
+class Tracer:
+    FORMAT_JSONL: str = "jsonl"
+    FORMAT_CHROME: str = "chrome"
+
+    # args that describe a single span rather than everything under it
+    PER_SPAN_ARGS: tuple = ("bytes", "path", "out_bytes")
+
+    @classmethod
+    def get(cls) -> "Tracer":
+        global GLOBAL_TRACER_INSTANCE
+        if GLOBAL_TRACER_INSTANCE is None:
+            GLOBAL_TRACER_INSTANCE = cls()
+            GLOBAL_TRACER_INSTANCE.start(os.environ.get("ACTORTOOL_TRACE", ""), profile_dir=os.environ.get("ACTORTOOL_PROFILE", ""))
+        return GLOBAL_TRACER_INSTANCE
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.path: str = ""
+        self.format: str = Tracer.FORMAT_JSONL
+        self.profile_dir: str = ""
+        self.profiler: str = "cprofile"
+        self.events: List[Dict[str, Any]] = []
+        self._file = None
+        self._local: threading.local = threading.local()
+        self._lock: threading.Lock = threading.Lock()
+        self._origin: float = time.perf_counter()
+        self._profile_count: int = 0
+        self._profiling: bool = False
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        atexit.register(self.stop)
+
+    # path can be empty to only collect events in memory (for summary())
+    def start(self, path: str = "", format: str = "", profile_dir: str = "", profiler: str = "cprofile") -> None:
+        self.stop()
+        self.path = path
+        self.format = format if format else (Tracer.FORMAT_CHROME if path.endswith(".json") else Tracer.FORMAT_JSONL)
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.enabled = path != "" or profile_dir != ""
+        self.events = []
+        if path and self.format == Tracer.FORMAT_JSONL:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a")
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.enabled = False
+
+    # for child processes, keeps collecting events but stops writing to the parent's trace file
+    def detach(self) -> None:
+        self._file = None
+        self._listeners = []
+        self.path = ""
+        self.events = []
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    # callback gets every event as it happens (from any thread) even if tracing is off, e.g. for progress reporting
+    # anything it raises comes out of the span that just ended (used to cancel background work)
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._listeners = [listener for listener in self._listeners if listener is not callback]
+
+    def span(self, name: str, category: str = "", **args: Any) -> Span | NullSpan:
+        if not self.enabled and not self._listeners:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    # zero length event, used for log messages
+    def instant(self, name: str, category: str = "", **args: Any) -> None:
+        if not self.enabled and not self._listeners:
+            return
+        stack: List[Span] = self._stack()
+        self._write({
+            "name" : name, "cat" : category, "ph" : "i", "ts" : self._ts(time.perf_counter()), "pid" : os.getpid(),
+            "tid" : threading.get_ident(), "depth" : len(stack),
+            "args" : {**{k: v for k, v in (stack[-1].args if stack else {}).items() if k not in Tracer.PER_SPAN_ARGS}, **args}
+        })
+
+    def _ts(self, t: float) -> float:
+        return round((t - self._origin) * 1000000, 3) # microseconds
+
+    def _emit(self, span: Span) -> None:
+        self._write({
+            "name" : span.name, "cat" : span.category, "ph" : "X", "ts" : self._ts(span.start), "dur" : round(span.duration * 1000000, 3),
+            "pid" : os.getpid(), "tid" : threading.get_ident(), "depth" : span.depth, "args" : span.args
+        })
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        for listener in self._listeners:
+            listener(event)
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events.append(event)
+            if self._file is not None:
+                self._file.write(json.dumps(event, default=str) + "\n")
+
+    # adds events collected somewhere else (e.g. a worker process)
+    def merge(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            self._write(event)
+
+    # removes and returns the collected events, used by worker processes to send their events back
+    def drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+        elif self.path and self.format == Tracer.FORMAT_CHROME and self.events:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents" : self.events, "displayTimeUnit" : "ms"}, f, default=str)
+
+    # total time + bytes per span name, optionally split by an arg (e.g. by="actor" for time per actor)
+    def summary(self, by: str = "") -> Dict[str, Dict[str, Dict[str, float]]]:
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for event in self.events:
+            if event["ph"] != "X":
+                continue
+            group: str = str(event["args"].get(by, "")) if by else ""
+            entry: Dict[str, float] = result.setdefault(group, {}).setdefault(event["name"], {"count" : 0, "seconds" : 0.0, "bytes" : 0})
+            entry["count"] += 1
+            entry["seconds"] += event["dur"] / 1000000
+            entry["bytes"] += event["args"].get("bytes", 0)
+        return result
+
+    # runs a profiler over the block if a profile directory is set, nested profiles are ignored since only one
+    # profiler can be active at a time
+    def profile(self, name: str) -> "Profile":
+        return Profile(self, name)
+
+class Profile:
+    def __init__(self, tracer: Tracer, name: str):
+        self._tracer: Tracer = tracer
+        self._name: str = name
+        self._profiler: Any = None
+
+    def __enter__(self) -> "Profile":
+        tracer: Tracer = self._tracer
+        if not tracer.profile_dir or tracer._profiling:
+            return self
+        tracer._profiling = True
+        if tracer.profiler == "pyinstrument":
+            try:
+                import pyinstrument
+                self._profiler = pyinstrument.Profiler()
+            except ImportError:
+                print("pyinstrument is not installed, falling back to cProfile")
+                tracer.profiler = "cprofile"
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+        if tracer.profiler == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._profiler is None:
+            return
+        tracer: Tracer = self._tracer
+        tracer._profiling = False
+        tracer._profile_count += 1
+        os.makedirs(tracer.profile_dir, exist_ok=True)
+        name: str = "".join(c if c.isalnum() or c in "._-" else "_" for c in self._name)
+        path: str = os.path.join(tracer.profile_dir, f"{os.getpid()}_{tracer._profile_count:04}_{name}")
+        if tracer.profiler == "pyinstrument":
+            self._profiler.stop()
+            with open(path + ".html", "w") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(path + ".prof") # snakeviz/pstats can read these
+
+# decorator version of Tracer.span
+def traced(name: str, category: str = "") -> Callable:
+    def decorator(func: Callable) -> Callable:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with Tracer.get().span(name, category):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
@@ -0,0 +1,324 @@
+from utils import *
+
+import oead
+
+from typing import Any, Callable, Dict, Iterator, List, Set
+
+GLOBAL_CHANGEJOURNAL_INSTANCE = None
+
+# placeholder for "this key didn't exist before/after the edit"
+MISSING = object()
+
+# A single recorded change, target is the file/table (e.g. RSDB/ActorInfo), row is the row/flag/entry and field is the key
+class Edit:
+    def __init__(self, target: str, row: str, field: str, old: Any, new: Any, undo: Callable[[], None], redo: Callable[[], None]):
+        self.target: str = target
+        self.row: str = row
+        self.field: str = field
+        self.old: Any = old
+        self.new: Any = new
+        self._undo: Callable[[], None] = undo
+        self._redo: Callable[[], None] = redo
+
+    def __repr__(self) -> str:
+        old: str = "<none>" if self.old is MISSING else repr(self.old)
+        new: str = "<none>" if self.new is MISSING else repr(self.new)
+        return f"{self.target}[{self.row}].{self.field}: {old} -> {new}"
+
+# Central record of every edit made through the managers, also keeps track of which files need to be saved
+class ChangeJournal:
+    @classmethod
+    def get(cls) -> "ChangeJournal":
+        global GLOBAL_CHANGEJOURNAL_INSTANCE
+        if GLOBAL_CHANGEJOURNAL_INSTANCE is None:
+            raise ValueError("ChangeJournal has not yet been initialized")
+        return GLOBAL_CHANGEJOURNAL_INSTANCE
+
+    # past this many edits the oldest ones are dropped, every edit keeps copies of what it changed so long running
+    # processes (the daemon, the GUI worker) would otherwise keep growing
+    MAX_HISTORY: int = 1000
+
+    def __init__(self, max_history: int = MAX_HISTORY):
+        self.max_history: int = max_history
+        self._dropped: int = 0 # edits dropped off the start of the history so far
+        self._history: List[Edit] = []
+        self._redo_stack: List[Edit] = []
+        self._dirty: Set[str] = set()
+        self._revisions: Dict[str, int] = {} # bumped on every change to the target, for anything caching data derived from it
+        global GLOBAL_CHANGEJOURNAL_INSTANCE
+        GLOBAL_CHANGEJOURNAL_INSTANCE = self
+
+    # the undo/redo history is made of closures so it can't be kept in a session snapshot, only what's been changed is
+    def __getstate__(self) -> Dict[str, Any]:
+        return {**self.__dict__, "_history" : [], "_redo_stack" : []}
+
+    def record(self, edit: Edit) -> None:
+        self._history.append(edit)
+        self._redo_stack.clear()
+        self._changed(edit.target)
+        if len(self._history) > self.max_history:
+            self.trim(self.max_history)
+
+    def _changed(self, target: str) -> None:
+        self._dirty.add(target)
+        self._revisions[target] = self._revisions.get(target, 0) + 1
+
+    # for changes that can't be recorded as an edit (they can't be undone either)
+    def touch(self, target: str) -> None:
+        self._changed(target)
+
+    def revision(self, target: str) -> int:
+        return self._revisions.get(target, 0)
+
+    # sum of the revisions of every target starting with prefix
+    def total_revision(self, prefix: str = "") -> int:
+        return sum(revision for target, revision in self._revisions.items() if target.startswith(prefix))
+
+    def is_changed(self, target: str) -> bool:
+        return target in self._dirty
+
+    def mark_saved(self, target: str) -> None:
+        self._dirty.discard(target)
+
+    # backs the old _is_changed style flags
+    def set_changed(self, target: str, state: bool) -> None:
+        if state:
+            self.touch(target)
+        else:
+            self.mark_saved(target)
+
+    def undo(self) -> Edit | None:
+        if not self._history:
+            return None
+        edit: Edit = self._history.pop()
+        edit._undo()
+        self._redo_stack.append(edit)
+        self._changed(edit.target)
+        return edit
+
+    def redo(self) -> Edit | None:
+        if not self._redo_stack:
+            return None
+        edit: Edit = self._redo_stack.pop()
+        edit._redo()
+        self._history.append(edit)
+        self._changed(edit.target)
+        return edit
+
+    # number of edits recorded so far (including dropped ones), for rewind()
+    @property
+    def position(self) -> int:
+        return self._dropped + len(self._history)
+
+    # undoes everything recorded after position without keeping it around to be redone
+    # raises ValueError (without undoing anything) if some of those edits have already been dropped by trim()
+    def rewind(self, position: int) -> List[Edit]:
+        if position < self._dropped:
+            raise ValueError(f"Cannot rewind to {position}, the history only goes back to {self._dropped}")
+        undone: List[Edit] = []
+        while self.position > position and self._history:
+            undone.append(self.undo())
+            self._redo_stack.pop()
+        return undone
+
+    # drops all but the newest keep edits, what's been changed is still tracked
+    def trim(self, keep: int = 0) -> None:
+        if (count := len(self._history) - keep) > 0:
+            del self._history[:count]
+            self._dropped += count
+
+    # drops the undo/redo history but keeps track of what's changed
+    def clear_history(self) -> None:
+        self.trim(0)
+        self._redo_stack.clear()
+
+    def edits(self, target: str = "") -> List[Edit]:
+        if target:
+            return [edit for edit in self._history if edit.target == target]
+        return list(self._history)
+
+    # edit count per target
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for edit in self._history:
+            counts[edit.target] = counts.get(edit.target, 0) + 1
+        return counts
+
+    @property
+    def changed_targets(self) -> List[str]:
+        return sorted(self._dirty)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._history)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo_stack)
+
+NUMBER_TYPES = (oead.S32, oead.U32, oead.F32, oead.S64, oead.U64, oead.F64)
+
+# copies containers (and oead numbers, which are references into their container) so the recorded value doesn't change
+# along with the original
+def snapshot(value: Any) -> Any:
+    if isinstance(value, TrackedDict) or isinstance(value, TrackedArray):
+        value = value.raw
+    elif isinstance(value, LazyNode):
+        value = value.to_oead()
+    if isinstance(value, oead.byml.Dictionary):
+        return copy_dict(value)
+    if isinstance(value, oead.byml.Array):
+        return copy_array(value)
+    if isinstance(value, NUMBER_TYPES):
+        return type(value)(value.v)
+    return value
+
+def unwrap(value: Any) -> Any:
+    if isinstance(value, TrackedDict) or isinstance(value, TrackedArray):
+        return value.raw
+    return value
+
+def track(value: Any, target: str, row: str, path: str) -> Any:
+    if isinstance(value, oead.byml.Dictionary):
+        return TrackedDict(value, target, row, path)
+    if isinstance(value, oead.byml.Array):
+        return TrackedArray(value, target, row, path)
+    return value
+
+# Wrappers around oead containers that record every write to the journal
+# Reads go straight through to the underlying container, nested containers get wrapped on access
+class TrackedDict:
+    __slots__ = ("_data", "_target", "_row", "_path")
+
+    def __init__(self, data: oead.byml.Dictionary, target: str, row: str, path: str = ""):
+        self._data: oead.byml.Dictionary = data
+        self._target: str = target
+        self._row: str = row
+        self._path: str = path
+
+    def _field(self, key: str) -> str:
+        return f"{self._path}.{key}" if self._path else str(key)
+
+    def __getitem__(self, key: str) -> Any:
+        return track(self._data[key], self._target, self._row, self._field(key))
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        data: oead.byml.Dictionary = self._data
+        value = unwrap(value)
+        old: Any = snapshot(data[key]) if key in data else MISSING
+        data[key] = value
+        new: Any = snapshot(value)
+        def undo() -> None:
+            if old is MISSING:
+                del data[key]
+            else:
+                data[key] = snapshot(old)
+        def redo() -> None:
+            data[key] = snapshot(new)
+        ChangeJournal.get().record(Edit(self._target, self._row, self._field(key), old, new, undo, redo))
+
+    def __delitem__(self, key: str) -> None:
+        data: oead.byml.Dictionary = self._data
+        old: Any = snapshot(data[key])
+        del data[key]
+        def undo() -> None:
+            data[key] = snapshot(old)
+        def redo() -> None:
+            del data[key]
+        ChangeJournal.get().record(Edit(self._target, self._row, self._field(key), old, MISSING, undo, redo))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: Any) -> bool:
+        return self._data == unwrap(other)
+
+    def keys(self) -> List[str]:
+        return list(self._data.keys())
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self._data]
+
+    def items(self) -> List[tuple[str, Any]]:
+        return [(key, self[key]) for key in self._data]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._data else default
+
+    @property
+    def raw(self) -> oead.byml.Dictionary:
+        return self._data
+
+class TrackedArray:
+    __slots__ = ("_data", "_target", "_row", "_path")
+
+    def __init__(self, data: oead.byml.Array, target: str, row: str, path: str = ""):
+        self._data: oead.byml.Array = data
+        self._target: str = target
+        self._row: str = row
+        self._path: str = path
+
+    def _field(self, index: int) -> str:
+        return f"{self._path}[{index}]"
+
+    def __getitem__(self, index: int) -> Any:
+        return track(self._data[index], self._target, self._row, self._field(index))
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        data: oead.byml.Array = self._data
+        value = unwrap(value)
+        old: Any = snapshot(data[index])
+        data[index] = value
+        new: Any = snapshot(value)
+        def undo() -> None:
+            data[index] = snapshot(old)
+        def redo() -> None:
+            data[index] = snapshot(new)
+        ChangeJournal.get().record(Edit(self._target, self._row, self._field(index), old, new, undo, redo))
+
+    def append(self, value: Any) -> None:
+        data: oead.byml.Array = self._data
+        value = unwrap(value)
+        data.append(value)
+        new: Any = snapshot(value)
+        def undo() -> None:
+            data.pop()
+        def redo() -> None:
+            data.append(snapshot(new))
+        ChangeJournal.get().record(Edit(self._target, self._row, self._field(len(data) - 1), MISSING, new, undo, redo))
+
+    def pop(self, index: int = -1) -> Any:
+        data: oead.byml.Array = self._data
+        if index < 0:
+            index += len(data)
+        old: Any = snapshot(data[index])
+        data.pop(index)
+        def undo() -> None:
+            data.insert(index, snapshot(old))
+        def redo() -> None:
+            data.pop(index)
+        ChangeJournal.get().record(Edit(self._target, self._row, self._field(index), old, MISSING, undo, redo))
+        return old
+
+    def __contains__(self, value: Any) -> bool:
+        return unwrap(value) in self._data
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self._data)):
+            yield self[i]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: Any) -> bool:
+        return self._data == unwrap(other)
+
+    @property
+    def raw(self) -> oead.byml.Array:
+        return self._data
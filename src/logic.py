@@ -1,16 +1,20 @@
+from byml import LazyDict
+from journal import ChangeJournal, Edit, MISSING, snapshot
 from res import ResourceSystem
 from utils import *
 from zstd import ZstdContext
 
 import oead
 
-from typing import Dict
+from typing import Any, Dict
 
 GLOBAL_LOGICMGR_INSTANCE = None
 
 # was this class even worth creating lol
 
 class LogicMgr:
+    TARGET: str = "Logic/NodeDefinition"
+
     VER_MAP: Dict[int, int] = {
         100 : 100,
         110 : 110,
@@ -27,24 +31,37 @@ class LogicMgr:
             raise ValueError("LogicMgr has not yet been initialized")
         return GLOBAL_LOGICMGR_INSTANCE
 
-    def __init__(self):
+    # lazy only decodes the nodes that are actually asked for and lets save splice changes into the original file (see
+    # byml.BymlSplicer) instead of writing the whole thing again
+    def __init__(self, lazy: bool = True):
         sys: ResourceSystem = ResourceSystem.get()
-        self._nodes: oead.byml.Dictionary = oead.byml.from_binary(sys.load_file(self.path))
-        self._is_changed: bool = False
+        data: bytes = sys.load_file(self.path)
+        self._tree: oead.byml.Dictionary | LazyDict = parse_byml_lazy(data) if lazy else parse_byml(data)
+        if lazy and not isinstance(self._tree, LazyDict):
+            print(f"Could not read {self.path} lazily, parsing the whole file")
+            self._tree = parse_byml(data)
         global GLOBAL_LOGICMGR_INSTANCE
         GLOBAL_LOGICMGR_INSTANCE = self
+
+    @property
+    def _is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed(LogicMgr.TARGET)
+
+    @_is_changed.setter
+    def _is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed(LogicMgr.TARGET, state)
     
+    # whether the whole file has been parsed
+    @property
+    def is_loaded(self) -> bool:
+        return not isinstance(self._tree, LazyDict)
+
+    # the root's entries are sorted by name so a lazy tree doesn't need to look at every node
     def get_node(self, name: str) -> oead.byml.Dictionary | None:
-        for node in self._nodes:
-            if node == name:
-                return self._nodes[node]
-        return None
+        return self._tree[name] if name in self._tree else None
     
     def exists(self, name: str) -> bool:
-        for node in self._nodes:
-            if node == name:
-                return True
-        return False
+        return name in self._tree
     
     def copy_node(self, old: str, new: str) -> bool:
         if new == old:
@@ -55,14 +72,21 @@ class LogicMgr:
         if node is None:
             return False
         node = copy_dict(node)
-        self._nodes[new] = node
-        self._is_changed = True
+        nodes: oead.byml.Dictionary | LazyDict = self._tree
+        nodes[new] = node
+        added: oead.byml.Dictionary = snapshot(node)
+        def undo() -> None:
+            del nodes[new]
+        def redo() -> None:
+            nodes[new] = snapshot(added)
+        ChangeJournal.get().record(Edit(LogicMgr.TARGET, new, "", MISSING, added, undo, redo))
         return True
     
     def save(self) -> None:
         if self._is_changed:
             sys: ResourceSystem = ResourceSystem.get()
-            sys.save_file(self.path, oead.byml.to_binary(self._nodes, False, 7), ZstdContext.DICT_TYPE_DEFAULT)
+            sys.save_file(self.path, serialize_byml(self._tree), ZstdContext.DICT_TYPE_DEFAULT)
+            self._is_changed = False
 
     @property
     def path(self) -> str:
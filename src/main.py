@@ -1,7 +1,10 @@
 from actor import Actor
 from app import App
+from catalog import ActorCatalog
+from worker import AppWorker, Job
 
 import dearpygui.dearpygui as dpg
+import os
 import tkinter.filedialog
 
 def open_dir(sender, app_data, user_data):
@@ -10,40 +13,129 @@ def open_dir(sender, app_data, user_data):
     else:
         dpg.set_value("project", tkinter.filedialog.askdirectory())
 
+def get_catalog() -> ActorCatalog | None:
+    if (project := dpg.get_value("project")) == "" or (romfs := dpg.get_value("romfs")) == "":
+        return None
+    catalog: ActorCatalog | None
+    try:
+        catalog = ActorCatalog.get()
+    except ValueError:
+        catalog = None
+    if catalog is None or catalog.path != ActorCatalog.db_path(project, romfs):
+        catalog = ActorCatalog(project, romfs)
+    return catalog if catalog.exists else None
+
+def suggest(sender, app_data, user_data):
+    catalog: ActorCatalog | None = get_catalog()
+    if catalog is None or app_data == "":
+        dpg.configure_item("Suggestions", items=[])
+        return
+    # prefix matches first since that's usually what's wanted, fuzzy matches fill in the rest
+    results = catalog.complete(app_data, 8)
+    if len(results) < 8:
+        results += [name for name in catalog.search(app_data, "fuzzy", 8) if name not in results][:8 - len(results)]
+    dpg.configure_item("Suggestions", items=results)
+
+def pick_suggestion(sender, app_data, user_data):
+    dpg.set_value(user_data, app_data)
+
+# the App is loaded, edited and saved on the worker thread, the UI only shows the progress (see poll_job)
+active_job: Job | None = None
+
+def start_job(name: str, func) -> None:
+    global active_job
+    active_job = AppWorker.get().submit(name, dpg.get_value("project"), dpg.get_value("romfs"), func)
+    dpg.set_value("ProgressMessage", f"{name}...")
+    dpg.set_value("ProgressBar", 0.0)
+    dpg.configure_item("ProgressBar", overlay="")
+    dpg.configure_item("CancelButton", show=True)
+    dpg.configure_item("ProgressWindow", show=True)
+    for button in ("SaveButton", "IndexButton"):
+        dpg.configure_item(button, enabled=False)
+
+# called every frame
+def poll_job() -> None:
+    global active_job
+    if active_job is None:
+        return
+    if events := active_job.poll():
+        progress, message = events[-1]
+        dpg.set_value("ProgressBar", progress)
+        dpg.configure_item("ProgressBar", overlay=f"{progress * 100:.0f}%")
+        dpg.set_value("ProgressMessage", message)
+    if active_job.is_finished:
+        if active_job.status == Job.DONE and active_job.result:
+            dpg.set_value("ProgressMessage", active_job.result)
+        dpg.configure_item("CancelButton", show=False)
+        for button in ("SaveButton", "IndexButton"):
+            dpg.configure_item(button, enabled=True)
+        active_job = None
+
+def cancel_job(sender, app_data, user_data):
+    if active_job is not None:
+        active_job.cancel()
+        dpg.set_value("ProgressMessage", "Cancelling...")
+
+def build_catalog(sender, app_data, user_data):
+    if dpg.get_value("romfs") == "" or dpg.get_value("project") == "":
+        return
+    def run(job: Job, app: App) -> str:
+        job.phase(AppWorker.LOAD_PHASE, 1.0, "Indexing actors...")
+        app.catalog.build()
+        return f"Indexed {len(app.catalog.names)} actors"
+    start_job("Indexing", run)
+
 def save(sender, app_data, user_data):
     if dpg.get_value(user_data["romfs"]) == "" or dpg.get_value(user_data["project"]) == "":
         return
     if dpg.get_value(user_data["base"]) == "" or dpg.get_value(user_data["actor"]) == "":
         return
-    with dpg.window():
-        dpg.add_text(tag="Message", default_value="Saving...")
-    app = App(dpg.get_value(user_data["project"]), dpg.get_value(user_data["romfs"]))
-    actor = Actor.copy(dpg.get_value(user_data["actor"]), dpg.get_value(user_data["base"]))
-    actor.save()
-    app.save()
-    dpg.set_value("Message", "Finished saving")
+    name: str = dpg.get_value(user_data["actor"])
+    base: str = dpg.get_value(user_data["base"])
+    def run(job: Job, app: App) -> str:
+        job.phase(AppWorker.LOAD_PHASE, 0.5, f"Copying {base} to {name}")
+        actor = Actor.copy(name, base)
+        job.phase(0.5, 0.95, "Saving...")
+        job.cancellable = False # from here on files get written, stopping halfway would leave the project half saved
+        actor.save()
+        app.save()
+        app.journal.clear_history() # nothing in the UI can undo, the App stays loaded so this would only keep growing
+        job.phase(0.95, 1.0, "Writing session snapshot")
+        app.snapshot() # so the next start can skip loading everything again
+        return "Finished saving"
+    start_job("Saving", run)
 
 def init_dpg():
     dpg.create_context()
 
-    with dpg.window(tag="MainWindow", min_size=(800, 220)) as window:
+    with dpg.window(tag="MainWindow", min_size=(800, 340)) as window:
         dpg.add_button(label="Select romfs path", callback=open_dir, pos=(20, 20), width=160, height=20, user_data="romfs")
         romfs = dpg.add_text(tag="romfs", pos=(190, 20), default_value="")
         dpg.add_button(label="Select project path", callback=open_dir, pos=(20, 50), width=160, height=20, user_data="project")
         project = dpg.add_text(tag="project", pos=(190, 50), default_value="")
-        base = dpg.add_input_text(label="Base Actor Name", pos=(20, 80), width=550, height=20)
+        base = dpg.add_input_text(label="Base Actor Name", pos=(20, 80), width=550, height=20, callback=suggest)
         actor = dpg.add_input_text(label="New Actor Name", pos=(20, 110), width=550, height=20)
         dpg.add_button(label="Save",
+                       tag="SaveButton",
                        callback=save,
                        user_data={"romfs" : romfs, "project" : project, "base" : base, "actor" : actor},
                        pos=(20, 140))
+        dpg.add_button(label="Index actors (for search)", tag="IndexButton", callback=build_catalog, pos=(80, 140))
+        dpg.add_listbox(tag="Suggestions", items=[], num_items=8, width=550, pos=(20, 170), callback=pick_suggestion, user_data=base)
+
+    with dpg.window(tag="ProgressWindow", label="Progress", show=False, width=420, height=110, pos=(200, 100)):
+        dpg.add_text(tag="ProgressMessage", default_value="")
+        dpg.add_progress_bar(tag="ProgressBar", default_value=0.0, width=400)
+        dpg.add_button(tag="CancelButton", label="Cancel", callback=cancel_job)
 
-    dpg.create_viewport(title="Very Bad UI", min_width=800, min_height=220, width=900, height=220)
+    dpg.create_viewport(title="Very Bad UI", min_width=800, min_height=340, width=900, height=340)
     dpg.setup_dearpygui()
     dpg.set_primary_window(window, True)
 
 if __name__ == "__main__":
     init_dpg()
     dpg.show_viewport()
-    dpg.start_dearpygui()
+    while dpg.is_dearpygui_running():
+        poll_job()
+        dpg.render_dearpygui_frame()
     dpg.destroy_context()
\ No newline at end of file
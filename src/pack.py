@@ -1,6 +1,8 @@
 from archive import Archive
 from component import *
+from depgraph import DependencyGraph
 from res import ResourceSystem
+from strpool import StringPool
 from typedparam import TypedParam
 from utils import *
 from zstd import ZstdContext
@@ -31,6 +33,11 @@ class ActorPack():
             self._game_life_condition: str = ""
             self._components: List[ComponentBase] = []
             self._orig_refs: Dict[str, str] = {}
+            try:
+                # pulls in the pack and all the files it uses at once if the dependency graph has been built
+                DependencyGraph.get().prefetch(self._name)
+            except ValueError:
+                pass
             archive: Archive | None = sys.load_archive(f"Pack/Actor/{self._name}.pack.zs")
             if archive is None:
                 self._pack = Archive()
@@ -44,7 +51,7 @@ class ActorPack():
                 }
             else:
                 self._pack = archive
-                actor_param: TypedParam = TypedParam(oead.byml.from_binary(self.load_file(self.actor_param_path)), "engine__actor__ActorParam")
+                actor_param: TypedParam = TypedParam(parse_byml(self.load_file(self.actor_param_path)), "engine__actor__ActorParam")
                 self.parse_actor_param(actor_param.data)
         else:
             raise ValueError("Cannot initialize ActorPack with empty name")
@@ -60,9 +67,11 @@ class ActorPack():
         # Ex. ASComponent is dependent on ModelInfoComponent so if ASComponent exists but ModelInfoComponent doesn't, add it
         if "Components" in actor_param:
             factory: ComponentFactory = ComponentFactory.get()
+            pool: StringPool = StringPool.get()
             for component in actor_param["Components"]:
-                self._orig_refs[component] = actor_param["Components"][component]
-                if (ref := actor_param["Components"][component]) == "":
+                ref: str = pool.intern(actor_param["Components"][component], "Component")
+                self._orig_refs[pool.intern(component, "Component")] = ref
+                if ref == "":
                     continue
                 if component == "ActorNameRef":
                     self._name_ref = ref
@@ -79,7 +88,7 @@ class ActorPack():
                 if component == "GameLifeConditionRef":
                     self._game_life_condition = ref
                     continue
-                self._components.append(factory.create(component, actor_param["Components"][component], self._name))
+                self._components.append(factory.create(component, ref, self._name))
 
     def gen_actor_param(self) -> oead.byml.Dictionary:
         actor_param: oead.byml.Dictionary = to_dict({})
@@ -109,11 +118,21 @@ class ActorPack():
                     actor_param["Components"][component.name] = path
         return actor_param
 
-    def save(self) -> None:
+    # returns the uncompressed SARC or None if nothing changed
+    def serialize(self) -> bytes | None:
+        # components save into the current archive so make sure that's this pack
+        if (sys := ResourceSystem.get()).archive != self._pack:
+            sys.archive = self._pack
         if self.is_changed:
-            self._pack.update_file(self.actor_param_path, oead.byml.to_binary(self.gen_actor_param(), False, 7))
+            self._pack.update_file(self.actor_param_path, serialize_byml(self.gen_actor_param()))
+        with sys.tracer.span("serialize", "sarc", path=self._pack.path) as span:
+            data: bytes | None = self._pack.serialize()
+            span.set(bytes=len(data) if data is not None else 0)
+        return data
+
+    def save(self) -> None:
         sys: ResourceSystem = ResourceSystem.get()
-        sys.save_file(self._pack.path, self._pack.serialize(), ZstdContext.DICT_TYPE_PACK)
+        sys.save_file(self._pack.path, self.serialize(), ZstdContext.DICT_TYPE_PACK)
         return
         
     def load_file(self, filepath: str) -> bytes | None:
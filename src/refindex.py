@@ -0,0 +1,273 @@
+from res import ResourceSystem
+from rsdb import RSDBMgr
+from scan import PackScanner
+from utils import *
+
+import oead
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+GLOBAL_REFINDEX_INSTANCE = None
+
+# Reverse lookups for "what uses this": component file -> actors, $parent -> files that inherit from it and
+# RSDB row -> components that mention it
+# Everything is extracted per pack and stored in the cache directory along with the pack's mtime + size so refresh()
+# only has to rescan the packs that changed
+class ReferenceIndex:
+    INDEX_NAME: str = ".refindex.json"
+    INDEX_VERSION: int = 1
+
+    @classmethod
+    def get(cls) -> "ReferenceIndex":
+        global GLOBAL_REFINDEX_INSTANCE
+        if GLOBAL_REFINDEX_INSTANCE is None:
+            raise ValueError("ReferenceIndex has not yet been initialized")
+        return GLOBAL_REFINDEX_INSTANCE
+
+    def __init__(self):
+        self.sys: ResourceSystem = ResourceSystem.get()
+        self.clear()
+        self.load()
+        global GLOBAL_REFINDEX_INSTANCE
+        GLOBAL_REFINDEX_INSTANCE = self
+
+    def clear(self) -> None:
+        self._strings: List[str] = [] # every string is stored once and referred to by index
+        self._string_ids: Dict[str, int] = {}
+        # actor -> {"Pack" : [mtime, size], "Components" : {type : ref}, "Parents" : [[file, parent]], "Rows" : [[table, row, type]]}
+        self._actors: Dict[str, Dict[str, Any]] = {}
+        self._shared: Dict[int, List[int]] = {} # file outside of the actor packs -> [$parent or -1, mtime, size]
+        self._reset_lookups()
+
+    def _reset_lookups(self) -> None:
+        self._users: Dict[int, List[str]] | None = None
+        self._children: Dict[int, Set[int]] = {}
+        self._local_owners: Dict[int, List[str]] = {}
+        self._row_refs: Dict[tuple[int, int], List[tuple[str, int]]] = {}
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.sys.cache_path, ReferenceIndex.INDEX_NAME)
+
+    @property
+    def is_built(self) -> bool:
+        return len(self._actors) != 0
+
+    def _id(self, string: str) -> int:
+        if (id := self._string_ids.get(string)) is None:
+            id = self._string_ids[string] = len(self._strings)
+            self._strings.append(string)
+        return id
+
+    def _find(self, string: str) -> int:
+        return self._string_ids.get(string, -1)
+
+    @staticmethod
+    def find_strings(node: Any, strings: Set[str]) -> Set[str]:
+        if isinstance(node, str):
+            strings.add(node)
+        elif isinstance(node, oead.byml.Dictionary):
+            for key in node:
+                ReferenceIndex.find_strings(node[key], strings)
+        elif isinstance(node, oead.byml.Array):
+            for value in node:
+                ReferenceIndex.find_strings(value, strings)
+        return strings
+
+    # files in ResidentCommon/Bootup are considered changed when the archive changes
+    def _source(self, path: str) -> tuple[bytes | None, List[int]]:
+        for archive in (self.sys.resident_common, self.sys.bootup):
+            if archive is not None and archive.is_exist(path):
+                return archive.get_file(path), PackScanner.stat(self.sys.resolve_path(archive.path))
+        if os.path.exists(full_path := self.sys.resolve_path(path)):
+            return self.sys._read_file(full_path), PackScanner.stat(full_path)
+        return None, [0, 0]
+
+    def _source_stat(self, path: str) -> List[int]:
+        for archive in (self.sys.resident_common, self.sys.bootup):
+            if archive is not None and archive.is_exist(path):
+                return PackScanner.stat(self.sys.resolve_path(archive.path))
+        if os.path.exists(full_path := self.sys.resolve_path(path)):
+            return PackScanner.stat(full_path)
+        return [0, 0]
+
+    # follows the $parent chain of a file outside the actor packs
+    def _add_shared(self, path: str, parsed: Dict[int, Any]) -> None:
+        while (id := self._id(path)) not in self._shared:
+            data, stat = self._source(path)
+            self._shared[id] = [-1] + stat
+            if data is None:
+                return
+            try:
+                parsed[id] = param = parse_byml(data)
+            except BYML_ERRORS:
+                return
+            if not isinstance(param, oead.byml.Dictionary) or "$parent" not in param:
+                return
+            self._shared[id][0] = self._id(path := self.sys.resolve_path(param["$parent"], False))
+
+    def _load_shared(self, path: str, parsed: Dict[int, Any]) -> Any:
+        self._add_shared(path, parsed)
+        if (id := self._id(path)) not in parsed:
+            data, stat = self._source(path)
+            parsed[id] = parse_byml(data) if data is not None else None
+        return parsed[id]
+
+    def _scan_actor(self, name: str, sarc: oead.Sarc, row_ids: Dict[str, Set[str]], parsed: Dict[int, Any]) -> Dict[str, Any]:
+        files: Dict[str, memoryview] = {f.name: f.data for f in sarc.get_files()}
+        entry: Dict[str, Any] = {"Components" : {}, "Parents" : [], "Rows" : []}
+        if (actor_param := f"Actor/{name}.engine__actor__ActorParam.bgyml") not in files:
+            return entry
+        try:
+            param: oead.byml.Dictionary = parse_byml(bytes(files[actor_param]))
+        except BYML_ERRORS:
+            return entry
+        if "Components" not in param:
+            return entry
+        for component in param["Components"]:
+            if not isinstance(ref := param["Components"][component], str) or ref == "":
+                continue
+            entry["Components"][str(self._id(component))] = self._id(path := self.sys.resolve_path(ref, False))
+            data: Any = None
+            seen: Set[str] = set()
+            try:
+                while path in files and path not in seen:
+                    seen.add(path)
+                    local: oead.byml.Dictionary = parse_byml(bytes(files[path]))
+                    if data is None:
+                        data = local
+                    if "$parent" not in local:
+                        break
+                    entry["Parents"].append([self._id(path), self._id(parent := self.sys.resolve_path(local["$parent"], False))])
+                    path = parent
+                if path not in files:
+                    shared: Any = self._load_shared(path, parsed)
+                    if data is None:
+                        data = shared
+            except (*BYML_ERRORS, OSError, TypeError):
+                continue
+            if data is None:
+                continue
+            for string in self.find_strings(data, set()):
+                for table, ids in row_ids.items():
+                    if string in ids:
+                        entry["Rows"].append([self._id(table), self._id(string), self._id(component)])
+        return entry
+
+    @staticmethod
+    def _row_ids() -> Dict[str, Set[str]]:
+        try:
+            return {name: set(table.row_ids()) for name, table in RSDBMgr.get().resource_tables.items()}
+        except Exception: # RSDBMgr not loaded, the row lookups just won't be available
+            return {}
+
+    # rescans packs that were added/changed since the last refresh (or all of them if full) and drops removed ones
+    def refresh(self, full: bool = False) -> int:
+        if full:
+            self.clear()
+        scanner: PackScanner = PackScanner()
+        paths: Dict[str, str] = scanner.pack_paths()
+        for name in [name for name in self._actors if name not in paths]:
+            del self._actors[name]
+        # shared files that changed just get looked at again
+        changed: List[int] = [id for id, entry in self._shared.items() if entry[1:] != self._source_stat(self._strings[id])]
+        for id in changed:
+            del self._shared[id]
+        for id in changed:
+            self._add_shared(self._strings[id], {})
+        stale: Dict[str, str] = {name: path for name, path in paths.items()
+                                 if name not in self._actors or self._actors[name]["Pack"] != scanner.stat(path)}
+        if stale:
+            if self.sys.is_log:
+                self.sys.log(f"Indexing references for {len(stale)} actors")
+            row_ids: Dict[str, Set[str]] = self._row_ids()
+            parsed: Dict[int, Any] = {}
+            with self.sys.tracer.span("ReferenceIndex.refresh", "index", actors=len(stale)):
+                for name, path, sarc in scanner.scan(stale):
+                    self._actors[name] = self._scan_actor(name, sarc, row_ids, parsed)
+                    self._actors[name]["Pack"] = scanner.stat(path)
+        self._reset_lookups()
+        self.save()
+        return len(stale)
+
+    def build(self) -> None:
+        self.refresh(True)
+
+    def save(self) -> None:
+        Path(self.index_path).write_text(json.dumps({
+            "Version" : ReferenceIndex.INDEX_VERSION,
+            "RomfsPath" : self.sys.romfs_path,
+            "Strings" : self._strings,
+            "Actors" : self._actors,
+            "Shared" : {str(id): entry for id, entry in self._shared.items()}
+        }, separators=(",", ":")))
+
+    def load(self) -> bool:
+        try:
+            index: Dict[str, Any] = json.loads(Path(self.index_path).read_text())
+        except (OSError, ValueError):
+            return False
+        if index.get("Version") != ReferenceIndex.INDEX_VERSION or index.get("RomfsPath") != self.sys.romfs_path:
+            return False
+        self.clear()
+        self._strings = index["Strings"]
+        self._string_ids = {string: id for id, string in enumerate(self._strings)}
+        self._actors = index["Actors"]
+        self._shared = {int(id): entry for id, entry in index["Shared"].items()}
+        return True
+
+    # the reverse maps are only built the first time they're needed
+    def _build_lookups(self) -> None:
+        if self._users is not None:
+            return
+        self._users = {}
+        for id, entry in self._shared.items():
+            if entry[0] != -1:
+                self._children.setdefault(entry[0], set()).add(id)
+        for actor, entry in self._actors.items():
+            for ref in entry["Components"].values():
+                self._users.setdefault(ref, []).append(actor)
+            for child, parent in entry["Parents"]:
+                self._children.setdefault(parent, set()).add(child)
+                self._local_owners.setdefault(child, []).append(actor)
+            for table, row, component in entry["Rows"]:
+                self._row_refs.setdefault((table, row), []).append((actor, component))
+
+    # actors that use this file directly as a component
+    def users(self, path: str) -> List[str]:
+        self._build_lookups()
+        return sorted(self._users.get(self._find(self.sys.resolve_path(path, False)), []))
+
+    # files with this file as their $parent (recursive includes the children of those and so on)
+    def children(self, path: str, recursive: bool = False) -> List[str]:
+        self._build_lookups()
+        if (id := self._find(self.sys.resolve_path(path, False))) == -1:
+            return []
+        found: Set[int] = set()
+        stack: List[int] = [id]
+        while stack:
+            for child in self._children.get(stack.pop(), set()):
+                if child not in found:
+                    found.add(child)
+                    if recursive:
+                        stack.append(child)
+        return sorted(self._strings[child] for child in found)
+
+    # every actor that would be affected by changing this file (directly used or inherited from)
+    def affected_actors(self, path: str) -> List[str]:
+        self._build_lookups()
+        files: List[str] = [self.sys.resolve_path(path, False)] + self.children(path, True)
+        actors: Set[str] = set()
+        for file in files:
+            if (id := self._find(file)) != -1:
+                actors.update(self._users.get(id, []))
+                actors.update(self._local_owners.get(id, []))
+        return sorted(actors)
+
+    # (actor, component type) pairs of components that contain the row's id
+    def row_refs(self, table: str, row_id: str) -> List[tuple[str, str]]:
+        self._build_lookups()
+        return sorted((actor, self._strings[component]) for actor, component in self._row_refs.get((self._find(table), self._find(row_id)), []))
@@ -1,9 +1,18 @@
 from archive import Archive
+from instrument import Tracer
 import oead
 from zstd import ZstdContext
 
+import asyncio
+import hashlib
+import json
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Dict, Iterable, List
 
 GLOBAL_RESOURCESYSTEM_INSTANCE = None
 
@@ -13,6 +22,15 @@ class ResourceSystem:
     ARCHIVE_CURRENT = 0
     ARCHIVE_RESIDENT = 1
     ARCHIVE_BOOTUP = 2
+
+    # file in the cache directory that stores the hashes of the uncompressed data of every file saved to the project
+    MANIFEST_NAME = ".hashes.json"
+
+    # per-user directory (under this) for everything generated about a project
+    CACHE_NAME = "actortool"
+
+    # max number of paths remembered by resolve_path
+    RESOLVE_CACHE_SIZE = 65536
     
     @classmethod
     def get(cls) -> "ResourceSystem":
@@ -22,10 +40,23 @@ class ResourceSystem:
         return GLOBAL_RESOURCESYSTEM_INSTANCE
 
     def __init__(self, project_path: str, romfs_path: str = "", enable_logs: bool = True):
+        self.tracer: Tracer = Tracer.get()
         self._current_archive: Archive | None = None
+        self._prefetched: Dict[str, bytes] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_pid: int = 0
+        self.io_workers: int = os.cpu_count() or 1 # size of the thread pool, more helps when reads are slow (network drives)
         self._is_log: bool = enable_logs
+        self._resolved: OrderedDict[str, str] = OrderedDict() # local path -> full path, least recently used first
+        self._resolve_lock: threading.Lock = threading.Lock() # saves can run on the thread pool
+        self._resolve_hits: int = 0
+        self._resolve_misses: int = 0
+        self._resolve_invalidations: int = 0
+        self._resolve_generation: int = 0 # bumped whenever entries are dropped so a lookup that was already running doesn't put them back
+        self.read_files: Dict[str, List[int]] = {} # full path -> [mtime, size] of every file loaded from disk
         self.romfs_path = romfs_path
         self.project_path = project_path
+        self.load_manifest()
         try:
             self.init_zstd_ctx(self.romfs_path)
             self.is_init_ctx = True
@@ -43,29 +74,145 @@ class ResourceSystem:
         global GLOBAL_RESOURCESYSTEM_INSTANCE
         GLOBAL_RESOURCESYSTEM_INSTANCE = self
 
+    # messages also end up in the trace (if enabled) so they can be lined up with the timings
     def log(self, message: str) -> None:
-        print(message) # was gonna do more with this but never got around to it
+        self.tracer.instant("log", "log", message=message)
+        print(message)
 
     def init_zstd_ctx(self, romfs_path: str) -> None:
         self.ctx: ZstdContext = ZstdContext(os.path.join(romfs_path, "Pack/ZsDic.pack.zs"))
         
-    def resolve_path(self, path: str, full_path = True) -> str:
+    # (path without the prefix, same but with .bgyml, is absolute), only depends on the string so it's never invalidated
+    @staticmethod
+    @lru_cache(maxsize=RESOLVE_CACHE_SIZE)
+    def _local_path(path: str) -> tuple[str, str, bool]:
         if path.startswith("Work/"):
             path = path[5:]
         elif path.startswith("/") or path.startswith("?"):
             path = path[1:]
-        if not full_path or os.path.isabs(path):
-            return path.replace(".gyml", ".bgyml")
+        return path, path.replace(".gyml", ".bgyml"), os.path.isabs(path)
+
+    # the full path depends on whether the file exists in the project directory so those results are dropped whenever
+    # a file gets written there (see write_file) or the project changes
+    def resolve_path(self, path: str, full_path = True) -> str:
+        path, local_path, is_abs = ResourceSystem._local_path(path)
+        if not full_path or is_abs:
+            return local_path
+        with self._resolve_lock:
+            if (fixed_path := self._resolved.get(path)) is not None:
+                self._resolved.move_to_end(path)
+                self._resolve_hits += 1
+                return fixed_path
+            self._resolve_misses += 1
+            generation: int = self._resolve_generation
         if os.path.exists(fixed_path := os.path.join(self.project_path, path)):
-            return fixed_path.replace(".gyml", ".bgyml")
-        return os.path.join(self.romfs_path, path).replace(".gyml", ".bgyml")
+            fixed_path = fixed_path.replace(".gyml", ".bgyml")
+        else:
+            fixed_path = os.path.join(self.romfs_path, path).replace(".gyml", ".bgyml")
+        with self._resolve_lock:
+            if generation != self._resolve_generation:
+                return fixed_path
+            self._resolved[path] = fixed_path
+            if len(self._resolved) > ResourceSystem.RESOLVE_CACHE_SIZE:
+                self._resolved.popitem(last=False)
+        return fixed_path
+
+    def invalidate_path(self, path: str) -> None:
+        path = ResourceSystem._local_path(path)[0]
+        # the cache is keyed by the path as it was requested which could be either extension
+        with self._resolve_lock:
+            self._resolve_generation += 1
+            for key in (path, path.replace(".bgyml", ".gyml")):
+                if self._resolved.pop(key, None) is not None:
+                    self._resolve_invalidations += 1
+
+    def clear_resolve_cache(self) -> None:
+        with self._resolve_lock:
+            self._resolve_generation += 1
+            self._resolved.clear()
+
+    @property
+    def resolve_stats(self) -> Dict[str, Any]:
+        lookups: int = self._resolve_hits + self._resolve_misses
+        return {
+            "hits" : self._resolve_hits,
+            "misses" : self._resolve_misses,
+            "hit_rate" : self._resolve_hits / lookups if lookups else 0.0,
+            "invalidations" : self._resolve_invalidations,
+            "size" : len(self._resolved),
+            "local_hits" : ResourceSystem._local_path.cache_info().hits,
+            "local_misses" : ResourceSystem._local_path.cache_info().misses
+        }
 
     def _load_file(self, path: str) -> bytes:
         if self._is_log:
-            print(f"Loading {path}")
+            self.log(f"Loading {path}")
+        if (data := self._prefetched.pop(path, None)) is not None:
+            return data
+        with self.tracer.span("decompress", "io", path=path) as span:
+            data = self._read_file(path)
+            span.set(bytes=len(data))
+        self._record_read(path)
+        return data
+
+    def _record_read(self, path: str) -> None:
+        try:
+            stat: os.stat_result = os.stat(path)
+        except OSError:
+            return
+        self.read_files[path] = [stat.st_mtime_ns, stat.st_size]
+
+    # everything that can't be pickled (the thread pool, locks, zstd contexts) is set up again on load
+    def __getstate__(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = self.__dict__.copy()
+        for key in ("tracer", "ctx", "_executor", "_executor_pid", "_resolve_lock", "_prefetched"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.tracer = Tracer.get()
+        self._executor = None
+        self._executor_pid = 0
+        self._resolve_lock = threading.Lock()
+        self._resolve_generation = 0
+        self._prefetched = {}
+        if self.is_init_ctx:
+            self.init_zstd_ctx(self.romfs_path)
+
+    def _read_file(self, path: str) -> bytes:
         if self.is_init_ctx:
             return self.ctx.decompress_file(path)
         return Path(path).read_bytes()
+
+    # thread pool for file reads + decompression (zstandard releases the GIL so this does actually run in parallel)
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # the threads don't survive a fork so worker processes need their own pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.io_workers)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    # loads a batch of loose files ahead of time in parallel, they get picked up by _load_file later
+    # anything from the previous batch that never got used is dropped so this doesn't grow forever
+    def prefetch(self, paths: List[str]) -> int:
+        self._prefetched = {}
+        full_paths: List[str] = []
+        for path in paths:
+            local_path: str = self.resolve_path(path, False)
+            if self.resident_common is not None and self.resident_common.is_exist(local_path):
+                continue
+            if self.bootup is not None and self.bootup.is_exist(local_path):
+                continue
+            if os.path.exists(full_path := self.resolve_path(path)) and full_path not in full_paths:
+                full_paths.append(full_path)
+        if not full_paths:
+            return 0
+        with self.tracer.span("prefetch", "io", files=len(full_paths)) as span:
+            self._prefetched = dict(zip(full_paths, self.executor.map(self._read_file, full_paths)))
+            span.set(bytes=sum(len(data) for data in self._prefetched.values()))
+        return len(full_paths)
     
     def outpath(self, path: str) -> str:
         return os.path.join(self.project_path, path)
@@ -74,7 +221,9 @@ class ResourceSystem:
         fixed_path = self.resolve_path(path)
         if os.path.exists(fixed_path):
             try:
-                return Archive.from_sarc(oead.Sarc(self._load_file(fixed_path)), path)
+                data: bytes = self._load_file(fixed_path)
+                with self.tracer.span("parse", "sarc", path=path, bytes=len(data)):
+                    return Archive.from_sarc(oead.Sarc(data), path)
             except:
                 pass
         return None
@@ -89,14 +238,18 @@ class ResourceSystem:
             self.log(f"Loading {path} from {os.path.basename(archive.path)}")
         return file
     
-    def load_file(self, path: str) -> bytes | None:
+    # archives are all in memory so they're always checked on the calling thread
+    def _load_from_archives(self, path: str) -> bytes | None:
         file = self.load_archive_file(self._current_archive, path)
         if file is not None:
             return file
         file = self.load_archive_file(self.resident_common, path)
         if file is not None:
             return file
-        file = self.load_archive_file(self.bootup, path)
+        return self.load_archive_file(self.bootup, path)
+
+    def load_file(self, path: str) -> bytes | None:
+        file = self._load_from_archives(path)
         if file is not None:
             return file
         path = self.resolve_path(path)
@@ -104,19 +257,56 @@ class ResourceSystem:
             return self._load_file(path)
         else:
             if self._is_log:
-                print(f"Failed to load {path}")
+                self.log(f"Failed to load {path}")
             return None
+
+    # same as load_file but the disk read + decompression happens on the thread pool
+    async def load_file_async(self, path: str) -> bytes | None:
+        file = self._load_from_archives(path)
+        if file is not None:
+            return file
+        path = self.resolve_path(path)
+        if os.path.exists(path):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._load_file, path)
+        if self._is_log:
+            self.log(f"Failed to load {path}")
+        return None
+
+    async def load_many_async(self, paths: Iterable[str]) -> List[bytes | None]:
+        return list(await asyncio.gather(*(self.load_file_async(path) for path in paths)))
+
+    # loads all the files at once, for when there's no event loop running already
+    def load_many(self, paths: Iterable[str]) -> List[bytes | None]:
+        return asyncio.run(self.load_many_async(paths))
+
+    # items are either archives or (path, data, compress type) like save_file, everything is hashed, compressed and
+    # written in parallel
+    async def save_many_async(self, items: Iterable[Archive | tuple[str, bytes | None, int]]) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        jobs: List[asyncio.Future] = []
+        for item in items:
+            if isinstance(item, Archive):
+                jobs.append(loop.run_in_executor(self.executor, self.save_archive, item))
+            else:
+                jobs.append(loop.run_in_executor(self.executor, self.save_file, *item))
+        await asyncio.gather(*jobs)
+
+    def save_many(self, items: Iterable[Archive | tuple[str, bytes | None, int]]) -> None:
+        asyncio.run(self.save_many_async(items))
     
     def save_file(self, path: str, data: bytes | None, compress_type: int = ZstdContext.DICT_TYPE_NONE) -> None:
         if data is None:
             return
+        with self.tracer.span("hash", "io", path=path, bytes=len(data)):
+            digest: str = self.hash_data(data)
+            unchanged: bool = self.is_unchanged(path, digest)
+        if unchanged:
+            if self._is_log:
+                self.log(f"Skipping {path} (unchanged)")
+            return
         if self._is_log:
             self.log(f"Saving {path}")
-        path = os.path.join(self.project_path, path)
-        if (dir := os.path.dirname(path)) != "":
-            os.makedirs(dir, exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(self.ctx.compress(data, compress_type))
+        self.write_file(path, self.compress(data, compress_type, path), digest)
 
     def save_archive_file(self, path: str, data: bytes | None, archive_type: int = ARCHIVE_CURRENT) -> None:
         if data is None:
@@ -138,32 +328,136 @@ class ResourceSystem:
     def save_archive(self, archive: Archive) -> None:
         if archive is None:
             return
-        data = archive.serialize()
+        with self.tracer.span("serialize", "sarc", path=archive.path) as span:
+            data = archive.serialize()
+            span.set(bytes=len(data) if data is not None else 0)
         if data is None:
             return
+        with self.tracer.span("hash", "io", path=archive.path, bytes=len(data)):
+            digest: str = self.hash_data(data)
+            unchanged: bool = self.is_unchanged(archive.path, digest)
+        if unchanged:
+            if self._is_log:
+                self.log(f"Skipping {os.path.basename(archive.path)} (unchanged)")
+            return
         if self._is_log:
             self.log(f"Saving {os.path.basename(archive.path)}")
-        path: str = os.path.join(self.project_path, archive.path)
-        if (dir := os.path.dirname(path)) != "":
+        self.write_file(archive.path, self.compress(data, ZstdContext.DICT_TYPE_PACK, archive.path), digest)
+
+    def compress(self, data: bytes, compress_type: int, path: str = "") -> bytes:
+        with self.tracer.span("compress", "io", path=path, bytes=len(data)) as span:
+            output: bytes = self.ctx.compress(data, compress_type)
+            span.set(out_bytes=len(output))
+        return output
+
+    # writes already compressed data straight to the project directory
+    # digest should be the hash of the uncompressed data, if provided it gets stored in the manifest
+    def write_file(self, path: str, data: bytes, digest: str = "") -> None:
+        full_path: str = os.path.join(self.project_path, path)
+        if (dir := os.path.dirname(full_path)) != "":
             os.makedirs(dir, exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(self.ctx.compress(data, ZstdContext.DICT_TYPE_PACK))
+        with self.tracer.span("write", "io", path=path, bytes=len(data)), open(full_path, "wb") as f:
+            f.write(data)
+        self.invalidate_path(path) # might have been resolved to the romfs copy before
+        # what's in memory now matches the project copy rather than whatever it was loaded from
+        self.read_files.pop(os.path.join(self.romfs_path, path), None)
+        self._record_read(full_path)
+        if digest:
+            self._record_hash(path, digest, os.stat(full_path))
+
+    @staticmethod
+    def hash_data(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    # Generated files (session snapshots, indexes, the daemon socket) go here instead of in the project, projects get
+    # shared along with the mod so nothing in them can be trusted enough to be unpickled (and shouldn't get shipped anyway)
+    # One directory per romfs + project pair, only readable by the current user
+    @staticmethod
+    def cache_dir(project_path: str, romfs_path: str) -> str:
+        if os.name == "nt":
+            root: str = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        key: str = hashlib.sha256(f"{os.path.abspath(romfs_path)}\0{os.path.abspath(project_path)}".encode("utf-8")).hexdigest()[:24]
+        path: str = os.path.join(root, ResourceSystem.CACHE_NAME, key)
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return path
+
+    @property
+    def cache_path(self) -> str:
+        return ResourceSystem.cache_dir(self.project_path, self.romfs_path)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_path, ResourceSystem.MANIFEST_NAME)
+
+    def load_manifest(self) -> None:
+        self._manifest: Dict[str, List[str | int]]
+        try:
+            self._manifest = json.loads(Path(self.manifest_path).read_text())
+        except (OSError, ValueError):
+            self._manifest = {}
+        self._manifest_changed: bool = False
+
+    def save_manifest(self) -> None:
+        if not self._manifest_changed:
+            return
+        Path(self.manifest_path).write_text(json.dumps(self._manifest, indent=4, sort_keys=True))
+        self._manifest_changed = False
+
+    def _record_hash(self, path: str, digest: str, stat: os.stat_result) -> None:
+        self._manifest[path] = [digest, stat.st_mtime_ns, stat.st_size]
+        self._manifest_changed = True
+
+    # checks if the file in the project directory already contains this data (digest is the hash of the uncompressed data)
+    def is_unchanged(self, path: str, digest: str) -> bool:
+        full_path: str = os.path.join(self.project_path, path)
+        try:
+            stat: os.stat_result = os.stat(full_path)
+        except OSError:
+            return False
+        # the mtime and size are stored too so files that were changed by something else don't get skipped
+        if (entry := self._manifest.get(path)) is not None and entry[1:] == [stat.st_mtime_ns, stat.st_size]:
+            return entry[0] == digest
+        # no up-to-date record of this file so check what's actually there (still much cheaper than compressing)
+        try:
+            existing: str = self.hash_data(self.ctx.decompress_file(full_path))
+        except:
+            return False
+        self._record_hash(path, existing, stat)
+        return existing == digest
     
     def save(self) -> None:
         self.save_archive(self.bootup)
         self.save_archive(self.resident_common)
         self.save_archive(self._current_archive)
+        self.save_manifest()
         if self._is_log:
             self.log("Saved project files")
 
     def change_project_dir(self, project_path: str, is_save: bool = True) -> None:
         if is_save:
             self.save()
+        self.save_manifest()
+        old_project_path: str = self.project_path
         self.project_path = project_path
-        self.resident_common: Archive | None = self.load_archive("Pack/ResidentCommon.pack.zs")
-        self.bootup: Archive | None = self.load_archive("Pack/Bootup.Nin_NX_NVN.pack.zs")
+        self._prefetched = {}
+        self.clear_resolve_cache()
+        self.load_manifest()
+        # nothing that was read from the old project matters anymore
+        old_prefix: str = os.path.join(os.path.abspath(old_project_path), "")
+        self.read_files = {path: stat for path, stat in self.read_files.items() if not os.path.abspath(path).startswith(old_prefix)}
+        self.resident_common: Archive | None = self._reload_archive(self.resident_common, "Pack/ResidentCommon.pack.zs", old_project_path)
+        self.bootup: Archive | None = self._reload_archive(self.bootup, "Pack/Bootup.Nin_NX_NVN.pack.zs", old_project_path)
         self._current_archive: Archive | None = None
 
+    # the romfs copy is kept as long as neither project has its own and it hasn't been edited
+    def _reload_archive(self, archive: Archive | None, path: str, old_project_path: str) -> Archive | None:
+        if archive is not None and not archive.is_changed and not os.path.exists(os.path.join(old_project_path, path)) \
+           and not self.exists_in_project(path):
+            return archive
+        return self.load_archive(path)
+
     @property
     def archive(self) -> Archive:
         return self._current_archive
@@ -1,29 +1,93 @@
+from journal import ChangeJournal, Edit, MISSING, NUMBER_TYPES, TrackedDict, snapshot
 from res import ResourceSystem
+from strpool import StringPool
 from utils import *
 from zstd import ZstdContext
 
 from bitarray import bitarray
+import numpy as np
 import oead
 
 import copy
+import os
+import sqlite3
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Callable, Dict, List
 
 GLOBAL_RSDBMGR_INSTANCE = None
 
 RSDB_EXT_MAP = {
     "ActorInfo" : "engine__rsdb__ActorInfoTable.bgyml",
     "GameActorInfo" : "game__GameActorInfoTable.bgyml",
+    "PouchActorInfo" : "game__PouchActorInfo.bgyml",
     "AttachmentActorInfo" : "game__AttachmentActorInfoTable.bgyml",
     "XLinkPropertyTable" : "engine__rsdb__XLinkPropertyTable.bgyml",
-    "XLinkPropertyTableList" : "engine__rsdb__XLinkProeprtyTableListTable.bgyml",
+    "XLinkPropertyTableList" : "engine__rsdb__XLinkPropertyTableListTable.bgyml",
     "EnhancementMaterialInfo" : "game__EnhancementMaterialInfoTable.bgyml"
 }
 
+# column type -> (sqlite type, value -> sqlite, sqlite -> value) for the SQLite export
+# anything that isn't a plain scalar (or a column with mixed types) is stored as a byml blob of a one element array
+SQL_TYPES: Dict[str, tuple[str, Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "Bool" : ("INTEGER", int, bool),
+    "S32" : ("INTEGER", int, lambda v: oead.S32(int(v))),
+    "U32" : ("INTEGER", int, lambda v: oead.U32(int(v))),
+    "S64" : ("INTEGER", int, lambda v: oead.S64(int(v))),
+    # sqlite integers are signed 64 bit so these are stored as two's complement
+    "U64" : ("INTEGER", lambda v: int(v) - (1 << 64) if int(v) >= 1 << 63 else int(v), lambda v: oead.U64(int(v) & 0xFFFFFFFFFFFFFFFF)),
+    "F32" : ("REAL", float, lambda v: oead.F32(float(v))),
+    "F64" : ("REAL", float, lambda v: oead.F64(float(v))),
+    "String" : ("TEXT", str, str),
+    "Byml" : ("BLOB", lambda v: serialize_byml(to_array([snapshot(v)])), lambda v: snapshot(parse_byml(bytes(v))[0]))
+}
+
+SQL_NUMBER_TYPES: Dict[type, str] = {t: t.__name__ for t in NUMBER_TYPES}
+
+def sql_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "Bool"
+    if isinstance(value, str):
+        return "String"
+    if type(value) in SQL_NUMBER_TYPES:
+        return SQL_NUMBER_TYPES[type(value)]
+    return "Byml"
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+# column type -> (numpy dtype, numpy value -> oead value) for TableColumn
+NUMPY_TYPES: Dict[str, tuple[Any, Callable[[Any], Any]]] = {
+    "Bool" : (np.bool_, bool),
+    "S32" : (np.int32, lambda v: oead.S32(int(v))),
+    "U32" : (np.uint32, lambda v: oead.U32(int(v))),
+    "S64" : (np.int64, lambda v: oead.S64(int(v))),
+    "U64" : (np.uint64, lambda v: oead.U64(int(v))),
+    "F32" : (np.float32, lambda v: oead.F32(float(v))),
+    "F64" : (np.float64, lambda v: oead.F64(float(v))),
+    "String" : (object, str)
+}
+
+# weapon type -> (multiplier, rounding) to go from attack power to PouchActorInfo.EquipmentPerformance
+EQUIPMENT_PERFORMANCE_SCALE: Dict[str, tuple[float, Callable[[Any], Any]]] = {
+    "SmallSword" : (1.0, np.floor),
+    "Spear" : (1.326856, np.ceil),
+    "LargeSword" : (0.95, np.floor)
+}
+
+# works on both single values and arrays, anything that isn't a one-handed sword or spear is scaled like a two-hander
+def scale_weapon_dmg(dmg: Any, weapon_type: str) -> Any:
+    factor, rounding = EQUIPMENT_PERFORMANCE_SCALE.get(weapon_type, EQUIPMENT_PERFORMANCE_SCALE["LargeSword"])
+    if isinstance(dmg, np.ndarray):
+        return rounding(dmg.astype(np.float64) * factor).astype(dmg.dtype)
+    return int(rounding(int(dmg) * factor))
+
 # ignores the RankTable since it's seemingly unused
 class TagTable:
+    TARGET: str = "RSDB/Tag"
+
     def __init__(self, data: oead.byml.Dictionary):
-        self._tags: List[sorted] = list(data["TagList"])
+        pool: StringPool = StringPool.get()
+        self._tags: List[sorted] = pool.intern_all(data["TagList"], "RSDB")
         tag_count = len(self._tags)
         tag_data = bitarray()
         tag_data.frombytes(data["BitTable"])
@@ -33,16 +97,44 @@ class TagTable:
         actor_count: int = int(len(data["PathList"]) / 3)
         for actor_id in range(actor_count):
             if data["PathList"][actor_id * 3 + 2] == ".engine__actor__ActorParam.gyml":
-                self._actors[name := data["PathList"][actor_id * 3 + 1]] = []
+                self._actors[name := pool.intern(data["PathList"][actor_id * 3 + 1], "RSDB")] = []
                 for tag_id, tag in enumerate(self._tags):
                     if tag_data[actor_id * tag_count + tag_id]:
                         self._actors[name].append(tag)
             else:
-                self._scenes[name := data["PathList"][actor_id * 3 + 1]] = []
+                self._scenes[name := pool.intern(data["PathList"][actor_id * 3 + 1], "RSDB")] = []
                 for tag_id, tag in enumerate(self._tags):
                     if tag_data[actor_id * tag_count + tag_id]:
                         self._scenes[name].append(tag)
-        self._is_changed: bool = False
+
+    @property
+    def _is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed(TagTable.TARGET)
+
+    @_is_changed.setter
+    def _is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed(TagTable.TARGET, state)
+
+    def _record_tags(self, old: List[str]) -> None:
+        tags: List[str] = self._tags
+        new: List[str] = copy.copy(tags)
+        def restore(value: List[str]) -> None:
+            tags[:] = value
+        ChangeJournal.get().record(Edit(TagTable.TARGET, "", "TagList", old, new, lambda: restore(old), lambda: restore(new)))
+
+    # old should be None if the actor didn't exist before
+    def _record_actor(self, actor: str, old: List[str] | None) -> None:
+        actors: Dict[str, List[str]] = self._actors
+        new: List[str] | None = copy.copy(actors.get(actor))
+        def restore(value: List[str] | None) -> None:
+            if value is None:
+                actors.pop(actor, None)
+            elif actor in actors:
+                actors[actor][:] = value
+            else:
+                actors[actor] = copy.copy(value)
+        ChangeJournal.get().record(Edit(TagTable.TARGET, actor, "Tags", MISSING if old is None else old, MISSING if new is None else new,
+                                        lambda: restore(old), lambda: restore(new)))
         
     def serialize(self) -> bytes | None:
         if self._is_changed:
@@ -81,20 +173,22 @@ class TagTable:
             bit_table.bytereverse()
             output["BitTable"] = oead.Bytes(bit_table.tobytes())
             self._is_changed = False
-            return oead.byml.to_binary(output, False, 7)
+            return serialize_byml(output)
         return None
     
     def add_tag(self, tag: str) -> None:
         if tag not in self._tags:
+            old: List[str] = copy.copy(self._tags)
             self._tags.append(tag)
-            self._is_changed = True
+            self._record_tags(old)
 
     # this might break things in tag def
     def remove_tag(self, tag: str) -> None:
         if tag in self._tags:
             print(f"Warning: Globally removing tag {tag} from tag list")
+            old: List[str] = copy.copy(self._tags)
             self._tags.remove(tag)
-            self._is_changed = True
+            self._record_tags(old)
 
     @property
     def tags(self) -> List[str]:
@@ -110,16 +204,19 @@ class TagTable:
         return bool(self._actors[actor])
     
     def actor_add_tag(self, actor: str, tag: str, force_add: bool = False) -> bool:
+        old: List[str] | None = copy.copy(self._actors.get(actor))
         if actor not in self._actors:
             self._actors[actor] = []
         if tag in self._tags:
             self._actors[actor].append(tag)
-            self._is_changed = True
+            self._record_actor(actor, old)
             return True
         elif force_add:
+            old_tags: List[str] = copy.copy(self._tags)
             self._tags.append(tag)
+            self._record_tags(old_tags)
             self._actors[actor].append(tag)
-            self._is_changed = True
+            self._record_actor(actor, old)
             return True
         else:
             return False
@@ -128,49 +225,306 @@ class TagTable:
         if actor not in self._actors:
             return
         if tag in self._actors[actor]:
+            old: List[str] = copy.copy(self._actors[actor])
             self._actors[actor].remove(tag)
-            self._is_changed = True
+            self._record_actor(actor, old)
     
     def actor_clear_tags(self, actor: str) -> None:
         if actor not in self._actors:
             return
+        old: List[str] = copy.copy(self._actors[actor])
         self._actors[actor] = []
-        self._is_changed = True
+        self._record_actor(actor, old)
 
     def actor_set_tags(self, actor: str, tags: List[str]) -> None:
+        old: List[str] | None = copy.copy(self._actors.get(actor))
         if actor not in self._actors:
             self._actors[actor] = []
         tags = [tag for tag in tags if tag in self.tags]
         self._actors[actor] = tags
-        self._is_changed = True
+        self._record_actor(actor, old)
 
     def add_actor(self, actor: str) -> None:
         if actor not in self._actors:
             self._actors[actor] = []
-            self._is_changed = True
+            self._record_actor(actor, None)
     
     def delete_actor(self, actor: str) -> None:
         if actor in self._actors:
+            old: List[str] = self._actors[actor]
             del self._actors[actor]
-            self._is_changed = True
+            self._record_actor(actor, old)
 
     def copy_actor(self, new_actor: str, base_actor: str, allow_overwrite: bool = False) -> bool:
         if base_actor not in self._actors:
             return False
         if new_actor in self._actors and not allow_overwrite:
             return False
+        old: List[str] | None = copy.copy(self._actors.get(new_actor))
         self._actors[new_actor] = copy.copy(self._actors[base_actor])
-        self._is_changed = True
+        self._record_actor(new_actor, old)
         return True
 
     def get_actor_tags(self, actor: str) -> List[str]:
         return self._actors.get(actor, [])
 
+    # swaps out the whole table at once (used by the SQLite importer), returns False if nothing actually changed
+    def replace(self, tags: List[str], actors: Dict[str, List[str]], scenes: Dict[str, List[str]]) -> bool:
+        if sorted(tags) == sorted(self._tags) and actors == self._actors and scenes == self._scenes:
+            return False
+        old: tuple = (copy.copy(self._tags), copy.deepcopy(self._actors), copy.deepcopy(self._scenes))
+        new: tuple = (copy.copy(tags), copy.deepcopy(actors), copy.deepcopy(scenes))
+        # done in place since earlier edits hold on to these
+        def restore(value: tuple) -> None:
+            self._tags[:] = value[0]
+            self._actors.clear()
+            self._actors.update(copy.deepcopy(value[1]))
+            self._scenes.clear()
+            self._scenes.update(copy.deepcopy(value[2]))
+        restore(new)
+        ChangeJournal.get().record(Edit(TagTable.TARGET, "", "", old, new, lambda: restore(old), lambda: restore(new)))
+        return True
+
+# Read-only view of a row in CompactRows, behaves enough like an oead.byml.Dictionary for lookups and iteration
+class CompactRowView:
+    __slots__ = ("_rows", "_index")
+
+    def __init__(self, rows: "CompactRows", index: int):
+        self._rows: CompactRows = rows
+        self._index: int = index
+
+    def __contains__(self, key: str) -> bool:
+        return self._rows._has(self._index, key)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._rows._get(self._index, key)
+
+    def __iter__(self):
+        return iter(self._rows._keys(self._index))
+
+    def __len__(self) -> int:
+        return len(self._rows._keys(self._index))
+
+    def __eq__(self, other: Any) -> bool:
+        return self.to_dict() == (other.to_dict() if isinstance(other, CompactRowView) else other)
+
+    def keys(self) -> List[str]:
+        return self._rows._keys(self._index)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._rows._get(self._index, key) if self._rows._has(self._index, key) else default
+
+    def to_dict(self) -> oead.byml.Dictionary:
+        return self._rows._dict(self._index)
+
+# Stand-in for a ResourceTable's oead.byml.Array that keeps rows as plain columns (numpy arrays for numbers, lists of
+# interned strings) following the schema of the table's default row
+# Values that don't fit the schema go in a per row dict, rows are only turned into oead dictionaries when indexed (which
+# is what anything that edits a row does) or when the table is serialized
+class CompactRows:
+    def __init__(self, data: oead.byml.Array, schema: Dict[str, str]):
+        count: int = len(data)
+        self._schema: Dict[str, str] = {key: t for key, t in schema.items() if t in NUMPY_TYPES} # containers always go in _extra
+        self._values: Dict[str, Any] = {}
+        self._present: Dict[str, np.ndarray] = {}
+        for key, t in self._schema.items():
+            if t == "String":
+                self._values[key] = [None] * count
+            else:
+                self._values[key] = np.zeros(count, dtype=NUMPY_TYPES[t][0])
+                self._present[key] = np.zeros(count, dtype=np.bool_)
+        self._extra: Dict[int, Dict[str, Any]] = {}
+        self._rows: List[int | oead.byml.Dictionary] = list(range(count)) # column index or the row once it's been converted
+        pool: StringPool = StringPool.get()
+        for i, row in enumerate(data):
+            for key in row:
+                value: Any = row[key]
+                if (t := self._schema.get(key)) is not None and sql_type(value) == t:
+                    if t == "String":
+                        self._values[key][i] = pool.intern(value, "RSDB")
+                    else:
+                        self._values[key][i] = value.v if hasattr(value, "v") else value
+                        self._present[key][i] = True
+                else:
+                    self._extra.setdefault(i, {})[key] = snapshot(value)
+
+    def _has(self, index: int, key: str) -> bool:
+        if index in self._extra and key in self._extra[index]:
+            return True
+        if (t := self._schema.get(key)) is None:
+            return False
+        return self._values[key][index] is not None if t == "String" else bool(self._present[key][index])
+
+    def _get(self, index: int, key: str) -> Any:
+        if index in self._extra and key in self._extra[index]:
+            return self._extra[index][key]
+        if not self._has(index, key):
+            raise KeyError(key)
+        t: str = self._schema[key]
+        return self._values[key][index] if t == "String" else NUMPY_TYPES[t][1](self._values[key][index])
+
+    def _keys(self, index: int) -> List[str]:
+        return [key for key in self._schema if self._has(index, key)] + [key for key in self._extra.get(index, {}) if key not in self._schema]
+
+    def _dict(self, index: int) -> oead.byml.Dictionary:
+        return to_dict({key: snapshot(self._get(index, key)) for key in self._keys(index)})
+
+    def get_value(self, i: int, key: str) -> Any:
+        entry: int | oead.byml.Dictionary = self._rows[i]
+        return self._get(entry, key) if isinstance(entry, int) else entry[key]
+
+    # writes straight into the columns if the row hasn't been converted
+    def set_value(self, i: int, key: str, value: Any) -> None:
+        if not isinstance(entry := self._rows[i], int):
+            entry[key] = value
+            return
+        if (t := self._schema.get(key)) is not None and sql_type(value) == t:
+            if entry in self._extra:
+                self._extra[entry].pop(key, None)
+            if t == "String":
+                self._values[key][entry] = StringPool.get().intern(value, "RSDB")
+            else:
+                self._values[key][entry] = value.v if hasattr(value, "v") else value
+                self._present[key][entry] = True
+        else:
+            self._extra.setdefault(entry, {})[key] = snapshot(value)
+
+    def delete_value(self, i: int, key: str) -> None:
+        if not isinstance(entry := self._rows[i], int):
+            if key in entry:
+                del entry[key]
+            return
+        if entry in self._extra:
+            self._extra[entry].pop(key, None)
+        if (t := self._schema.get(key)) == "String":
+            self._values[key][entry] = None
+        elif t is not None:
+            self._present[key][entry] = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self):
+        for entry in self._rows:
+            yield CompactRowView(self, entry) if isinstance(entry, int) else entry
+
+    # converts the row so it can be edited like a normal one
+    def __getitem__(self, i: int) -> oead.byml.Dictionary:
+        if isinstance(entry := self._rows[i], int):
+            entry = self._rows[i] = self._dict(entry)
+        return entry
+
+    def __setitem__(self, i: int, row: oead.byml.Dictionary) -> None:
+        self._rows[i] = row
+
+    def append(self, row: oead.byml.Dictionary) -> None:
+        self._rows.append(row)
+
+    def pop(self, i: int = -1) -> oead.byml.Dictionary:
+        entry: int | oead.byml.Dictionary = self._rows.pop(i)
+        return self._dict(entry) if isinstance(entry, int) else entry
+
+    def clear(self) -> None:
+        self._rows.clear()
+
+    @property
+    def converted_count(self) -> int:
+        return sum(1 for entry in self._rows if not isinstance(entry, int))
+
+    def to_array(self) -> oead.byml.Array:
+        return to_array([self._dict(entry) if isinstance(entry, int) else entry for entry in self._rows])
+
+# One key of a ResourceTable as a numpy array (one entry per row in table order) so it can be edited in bulk
+# Rows without the key get the default value, present says which rows actually have it
+# Edit values in place (masks from other columns of the same table line up) then commit() to write back the changed cells
+class TableColumn:
+    def __init__(self, table: "ResourceTable", key: str, type: str = "", default: Any = None):
+        self.table: ResourceTable = table
+        self.key: str = key
+        rows: oead.byml.Array = table.rows
+        raw: List[Any] = [row[key] if key in row else None for row in rows]
+        if not type:
+            types: set = {sql_type(value) for value in raw if value is not None}
+            if len(types) > 1 or (types and next(iter(types)) not in NUMPY_TYPES):
+                raise ValueError(f"{table.name}.{key} is not a scalar column")
+            type = next(iter(types)) if types else "S32"
+        self.type: str = type
+        dtype, self._to_oead = NUMPY_TYPES[type]
+        if default is None:
+            default = "" if dtype is object else 0
+        self.present: np.ndarray = np.fromiter((value is not None for value in raw), dtype=np.bool_, count=len(raw))
+        self.values: np.ndarray = np.array([default if value is None else (value.v if hasattr(value, "v") else value) for value in raw], dtype=dtype)
+        self._original: np.ndarray = self.values.copy()
+        self.row_ids: np.ndarray = np.array([row["__RowId"] if "__RowId" in row else "" for row in rows], dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def mask_ids(self, row_ids: List[str]) -> np.ndarray:
+        return np.isin(self.row_ids, np.array(list(row_ids), dtype=object))
+
+    def get(self, row_id: str) -> Any:
+        indices: np.ndarray = np.flatnonzero(self.row_ids == row_id)
+        return self.values[indices[0]] if len(indices) else None
+
+    def changed(self) -> np.ndarray:
+        return np.flatnonzero(self.values != self._original)
+
+    # writes every changed cell back to the table as a single edit (rows without the key get it added)
+    # returns the number of cells written
+    def commit(self) -> int:
+        indices: np.ndarray = self.changed()
+        if len(indices) == 0:
+            return 0
+        table: ResourceTable = self.table
+        key: str = self.key
+        old: List[Any] = [snapshot(table._get_value(i, key)) if self.present[i] else MISSING for i in indices]
+        new: List[Any] = [self._to_oead(value) for value in self.values[indices]]
+        def restore(values: List[Any]) -> None:
+            for i, value in zip(indices, values):
+                if value is MISSING:
+                    table._delete_value(i, key)
+                else:
+                    table._set_value(i, key, snapshot(value))
+        restore(new)
+        ChangeJournal.get().record(Edit(self.table.target, "", key, old, new, lambda: restore(old), lambda: restore(new)))
+        self.present[indices] = True
+        self._original = self.values.copy()
+        return len(indices)
+
 class ResourceTable:
-    def __init__(self, data: oead.byml.Array, name: str):
-        self._table: oead.byml.Array = data
+    # compact keeps the rows as CompactRows instead of oead dictionaries to save memory
+    def __init__(self, data: oead.byml.Array, name: str, compact: bool = False):
         self._name: str = name
-        self._is_changed: bool = False
+        self._table: oead.byml.Array | CompactRows = CompactRows(data, self.schema(data)) if compact else data
+
+    @property
+    def is_compact(self) -> bool:
+        return isinstance(self._table, CompactRows)
+
+    # key -> type of the table's default row, falls back to whatever the rows themselves use
+    def schema(self, data: oead.byml.Array | None = None) -> Dict[str, str]:
+        try:
+            default: oead.byml.Dictionary = self.get_default_row()
+            return {key: sql_type(default[key]) for key in default}
+        except (KeyError, OSError):
+            return self.columns(data)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def target(self) -> str:
+        return f"RSDB/{self._name}"
+
+    @property
+    def _is_changed(self) -> bool:
+        return ChangeJournal.get().is_changed(self.target)
+
+    @_is_changed.setter
+    def _is_changed(self, state: bool) -> None:
+        ChangeJournal.get().set_changed(self.target, state)
 
     def is_exist(self, key: str) -> bool:
         for row in self._table:
@@ -178,19 +532,28 @@ class ResourceTable:
                 return True
         return False
 
-    def find_row(self, key: str) -> oead.byml.Dictionary | None:
-        for row in self._table:
+    def find_index(self, key: str) -> int:
+        for i, row in enumerate(self._table):
             if row["__RowId"] == key:
-                return row
-        return None
+                return i
+        return -1
+
+    # rows are wrapped so any edits made to them get recorded
+    def find_row(self, key: str) -> TrackedDict | None:
+        if (i := self.find_index(key)) == -1:
+            return None
+        return TrackedDict(self._table[i], self.target, key)
     
     def add_row(self, row: oead.byml.Dictionary) -> None:
-        self._table.append(row)
-        self._is_changed = True
+        table: oead.byml.Array = self._table
+        table.append(row)
+        new: oead.byml.Dictionary = snapshot(row)
+        ChangeJournal.get().record(Edit(self.target, new["__RowId"] if "__RowId" in new else "", "", MISSING, new,
+                                        lambda: table.pop(), lambda: table.append(snapshot(new))))
     
-    def add_row_by_id(self, row_id: str) -> None:
+    def add_row_by_id(self, row_id: str) -> TrackedDict | None:
         self.add_row(self.get_new_default_row(row_id))
-        self._is_changed = True
+        return self.find_row(row_id)
 
     def copy_row(self, from_id: str, to_id: str) -> bool:
         if self.is_exist(to_id):
@@ -200,8 +563,7 @@ class ResourceTable:
             return False
         new_row: oead.byml.Dictionary = copy_dict(row)
         new_row["__RowId"] = to_id
-        self._table.append(new_row)
-        self._is_changed = True
+        self.add_row(new_row)
         return True
     
     def copy_row_to(self, from_id: str, to_id: str) -> bool:
@@ -210,28 +572,110 @@ class ResourceTable:
             return False
         new_row: oead.byml.Dictionary = copy_dict(row)
         new_row["__RowId"] = to_id
-        if self.is_exist(to_id):
-            for i, r in enumerate(self._table):
-                if r["__RowId"] == to_id:
-                    self._table[i] = new_row
-                    break
+        if (i := self.find_index(to_id)) != -1:
+            table: oead.byml.Array = self._table
+            old: oead.byml.Dictionary = copy_dict(table[i])
+            table[i] = new_row
+            new: oead.byml.Dictionary = snapshot(new_row)
+            def undo() -> None:
+                table[i] = snapshot(old)
+            def redo() -> None:
+                table[i] = snapshot(new)
+            ChangeJournal.get().record(Edit(self.target, to_id, "", old, new, undo, redo))
         else:
-            self._table.append(new_row)
-        self._is_changed = True
+            self.add_row(new_row)
         return True
     
+    def row_ids(self) -> List[str]:
+        return [row["__RowId"] for row in self._table if "__RowId" in row]
+
+    @property
+    def rows(self) -> oead.byml.Array | CompactRows:
+        return self._table
+
+    # single cell access that doesn't convert compact rows
+    def _get_value(self, i: int, key: str) -> Any:
+        return self._table.get_value(i, key) if self.is_compact else self._table[i][key]
+
+    def _set_value(self, i: int, key: str, value: Any) -> None:
+        if self.is_compact:
+            self._table.set_value(i, key, value)
+        else:
+            self._table[i][key] = value
+
+    def _delete_value(self, i: int, key: str) -> None:
+        if self.is_compact:
+            self._table.delete_value(i, key)
+        elif key in self._table[i]:
+            del self._table[i][key]
+
+    def column(self, key: str, type: str = "", default: Any = None) -> TableColumn:
+        return TableColumn(self, key, type, default)
+
+    # func gets the values of the rows selected by where (a mask or a function that takes the column and returns one)
+    # and returns the new values, e.g. update_column("Price", lambda v: v * 2, lambda c: c.values > 100)
+    # returns the number of rows that changed
+    def update_column(self, key: str, func: Callable[[np.ndarray], Any], where: np.ndarray | Callable[[TableColumn], np.ndarray] | None = None,
+                      type: str = "") -> int:
+        column: TableColumn = self.column(key, type)
+        mask: np.ndarray = column.present.copy() if where is None else (where(column) if callable(where) else where)
+        column.values[mask] = func(column.values[mask])
+        return column.commit()
+
+    # every key used by any row in the order they first show up -> column type
+    def columns(self, data: oead.byml.Array | None = None) -> Dict[str, str]:
+        columns: Dict[str, str] = {}
+        for row in (self._table if data is None else data):
+            for key in row:
+                if (t := sql_type(row[key])) != columns.setdefault(key, t):
+                    columns[key] = "Byml"
+        return columns
+
+    # bulk replacement (used by the SQLite importer), if the rows are the same ones in the same order only the rows that
+    # actually differ are swapped out, otherwise the entire table is replaced
+    # returns the number of rows that changed
+    def set_rows(self, rows: List[oead.byml.Dictionary]) -> int:
+        table: oead.byml.Array = self._table
+        ids: List[Any] = [row["__RowId"] if "__RowId" in row else None for row in rows]
+        if ids == [row["__RowId"] if "__RowId" in row else None for row in table]:
+            # recorded as a single edit like TableColumn.commit so a big import can't push everything else out of the history
+            indices: List[int] = [i for i, (current, row) in enumerate(zip(list(table), rows)) if current != row]
+            if not indices:
+                return 0
+            old: List[oead.byml.Dictionary] = [copy_dict(table[i]) for i in indices]
+            new: List[oead.byml.Dictionary] = [snapshot(rows[i]) for i in indices]
+            def swap(values: List[oead.byml.Dictionary]) -> None:
+                for i, value in zip(indices, values):
+                    table[i] = snapshot(value)
+            swap(new)
+            ChangeJournal.get().record(Edit(self.target, "", "", f"{len(indices)} rows", f"{len(indices)} rows",
+                                            lambda: swap(old), lambda: swap(new)))
+            return len(indices)
+        # done in place since earlier edits hold on to the array
+        old_rows: List[oead.byml.Dictionary] = [copy_dict(row) for row in table]
+        new_rows: List[oead.byml.Dictionary] = [copy_dict(row) for row in rows]
+        def restore(value: List[oead.byml.Dictionary]) -> None:
+            table.clear()
+            for row in value:
+                table.append(copy_dict(row))
+        restore(new_rows)
+        ChangeJournal.get().record(Edit(self.target, "", "", f"{len(old_rows)} rows", f"{len(new_rows)} rows",
+                                        lambda: restore(old_rows), lambda: restore(new_rows)))
+        return len(rows)
+
     def get_default_row(self) -> oead.byml.Dictionary:
-        return oead.byml.from_binary(Path(f"res/RSDB/{RSDB_EXT_MAP[self._name]}").read_bytes())
+        return parse_byml(Path(f"res/RSDB/{RSDB_EXT_MAP[self._name]}").read_bytes())
 
     def get_new_default_row(self, row_id: str) -> oead.byml.Dictionary:
         row: oead.byml.Dictionary = self.get_default_row()
         row["__RowId"] = row_id
         return row
     
+    # rows are looked up by scanning the table so it's kept fully parsed and written in full, unlike the lazy documents
     def serialize(self) -> bytes | None:
         if self._is_changed == True:
             self._is_changed = False
-            return oead.byml.to_binary(self._table, False, 7)
+            return serialize_byml(self._table.to_array() if self.is_compact else self._table)
         return None
 
 class RSDBMgr:
@@ -242,24 +686,25 @@ class RSDBMgr:
             raise Exception("RSDBMGr has not yet been initialized")
         return GLOBAL_RSDBMGR_INSTANCE
 
-    def __init__(self):
+    # compact stores the table rows as CompactRows, see ResourceTable
+    def __init__(self, compact: bool = False):
         sys: ResourceSystem = ResourceSystem.get()
-        self._tag: TagTable = TagTable(oead.byml.from_binary(
+        self._tag: TagTable = TagTable(parse_byml(
             sys.load_file(f"RSDB/Tag.Product.{sys.version}.rstbl.byml.zs")))
-        self._actorinfo: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/ActorInfo.Product.{sys.version}.rstbl.byml.zs")), "ActorInfo")
-        self._gameactorinfo: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/GameActorInfo.Product.{sys.version}.rstbl.byml.zs")), "GameActorInfo")
-        self._pouchactorinfo: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/PouchActorInfo.Product.{sys.version}.rstbl.byml.zs")), "PouchActorInfo")
-        self._attachmentactorinfo: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/AttachmentActorInfo.Product.{sys.version}.rstbl.byml.zs")), "AttachmentActorInfo")
-        self._xlinkpropertytable: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/XLinkPropertyTable.Product.{sys.version}.rstbl.byml.zs")), "XLinkPropertyTable")
-        self._xlinkpropertytablelist: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/XLinkPropertyTableList.Product.{sys.version}.rstbl.byml.zs")), "XLinkPropertyTableList")
-        self._enhancementmaterialinfo: ResourceTable = ResourceTable(oead.byml.from_binary(
-            sys.load_file(f"RSDB/EnhancementMaterialInfo.Product.{sys.version}.rstbl.byml.zs")), "EnhancementMaterialInfo")
+        self._actorinfo: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/ActorInfo.Product.{sys.version}.rstbl.byml.zs")), "ActorInfo", compact)
+        self._gameactorinfo: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/GameActorInfo.Product.{sys.version}.rstbl.byml.zs")), "GameActorInfo", compact)
+        self._pouchactorinfo: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/PouchActorInfo.Product.{sys.version}.rstbl.byml.zs")), "PouchActorInfo", compact)
+        self._attachmentactorinfo: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/AttachmentActorInfo.Product.{sys.version}.rstbl.byml.zs")), "AttachmentActorInfo", compact)
+        self._xlinkpropertytable: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/XLinkPropertyTable.Product.{sys.version}.rstbl.byml.zs")), "XLinkPropertyTable", compact)
+        self._xlinkpropertytablelist: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/XLinkPropertyTableList.Product.{sys.version}.rstbl.byml.zs")), "XLinkPropertyTableList", compact)
+        self._enhancementmaterialinfo: ResourceTable = ResourceTable(parse_byml(
+            sys.load_file(f"RSDB/EnhancementMaterialInfo.Product.{sys.version}.rstbl.byml.zs")), "EnhancementMaterialInfo", compact)
         global GLOBAL_RSDBMGR_INSTANCE
         GLOBAL_RSDBMGR_INSTANCE = self
     
@@ -294,6 +739,12 @@ class RSDBMgr:
     @property
     def tagtable(self) -> TagTable:
         return self._tag
+
+    # every table except the TagTable by name
+    @property
+    def resource_tables(self) -> Dict[str, ResourceTable]:
+        return {table.name: table for table in (self._actorinfo, self._gameactorinfo, self._pouchactorinfo, self._attachmentactorinfo,
+                                                 self._xlinkpropertytable, self._xlinkpropertytablelist, self._enhancementmaterialinfo)}
     
     def save(self) -> None:
         sys: ResourceSystem = ResourceSystem.get()
@@ -304,4 +755,117 @@ class RSDBMgr:
         sys.save_file(f"RSDB/AttachmentActorInfo.Product.{sys.version}.rstbl.byml.zs", self.attachmentactorinfo.serialize(), ZstdContext.DICT_TYPE_DEFAULT)
         sys.save_file(f"RSDB/XLinkPropertyTable.Product.{sys.version}.rstbl.byml.zs", self.xlinkpropertytable.serialize(), ZstdContext.DICT_TYPE_DEFAULT)
         sys.save_file(f"RSDB/XLinkPropertyTableList.Product.{sys.version}.rstbl.byml.zs", self.xlinkpropertytablelist.serialize(), ZstdContext.DICT_TYPE_DEFAULT)
-        sys.save_file(f"RSDB/EnhancementMaterialInfo.Product.{sys.version}.rstbl.byml.zs", self.enhancementmaterialinfo.serialize(), ZstdContext.DICT_TYPE_DEFAULT)
\ No newline at end of file
+        sys.save_file(f"RSDB/EnhancementMaterialInfo.Product.{sys.version}.rstbl.byml.zs", self.enhancementmaterialinfo.serialize(), ZstdContext.DICT_TYPE_DEFAULT)
+
+    # dumps the tables to an SQLite database, one table per resource table (with a typed column per row key, NULL means the
+    # key isn't in that row and __Index keeps the original row order) plus the TagTable as a join table
+    # bulk edits can then be done in SQL and brought back in with import_sqlite
+    def export_sqlite(self, path: str) -> None:
+        sys: ResourceSystem = ResourceSystem.get()
+        with sys.tracer.span("RSDBMgr.export_sqlite", "rsdb", path=path):
+            if os.path.exists(path):
+                os.remove(path)
+            db: sqlite3.Connection = sqlite3.connect(path)
+            try:
+                db.execute("CREATE TABLE __Meta (Key TEXT PRIMARY KEY, Value TEXT)")
+                db.executemany("INSERT INTO __Meta VALUES (?, ?)", [("Version", sys.version), ("RomfsPath", sys.romfs_path)])
+                db.execute("CREATE TABLE __Columns (TableName TEXT, Name TEXT, Type TEXT, Position INTEGER, PRIMARY KEY (TableName, Name))")
+                for name, table in self.resource_tables.items():
+                    columns: Dict[str, str] = table.columns()
+                    db.executemany("INSERT INTO __Columns VALUES (?, ?, ?, ?)",
+                                   [(name, key, t, i) for i, (key, t) in enumerate(columns.items())])
+                    definition: str = ", ".join(["__Index INTEGER PRIMARY KEY"] + [f"{quote(key)} {SQL_TYPES[t][0]}" for key, t in columns.items()])
+                    db.execute(f"CREATE TABLE {quote(name)} ({definition})")
+                    if "__RowId" in columns:
+                        db.execute(f"CREATE INDEX {quote(name + '_RowId')} ON {quote(name)} (__RowId)")
+                    encoders: List[tuple[str, Callable[[Any], Any]]] = [(key, SQL_TYPES[t][1]) for key, t in columns.items()]
+                    placeholders: str = ", ".join(["?"] * (len(columns) + 1))
+                    db.executemany(f"INSERT INTO {quote(name)} VALUES ({placeholders})",
+                                   ([i] + [encode(row[key]) if key in row else None for key, encode in encoders]
+                                    for i, row in enumerate(table.rows)))
+                tags: TagTable = self.tagtable
+                db.execute("CREATE TABLE TagList (Tag TEXT PRIMARY KEY, Position INTEGER)")
+                db.executemany("INSERT INTO TagList VALUES (?, ?)", [(tag, i) for i, tag in enumerate(tags.tags)])
+                # Kind is either Actor or Scene, paths are listed separately so entries without any tags aren't lost
+                db.execute("CREATE TABLE TagPath (Name TEXT, Kind TEXT, PRIMARY KEY (Kind, Name))")
+                db.execute("CREATE TABLE Tag (Name TEXT, Kind TEXT, Tag TEXT)")
+                db.execute("CREATE INDEX Tag_Name ON Tag (Kind, Name)")
+                db.execute("CREATE INDEX Tag_Tag ON Tag (Tag)")
+                for kind, entries in (("Actor", tags._actors), ("Scene", tags._scenes)):
+                    db.executemany("INSERT INTO TagPath VALUES (?, ?)", [(name, kind) for name in entries])
+                    db.executemany("INSERT INTO Tag VALUES (?, ?, ?)", [(name, kind, tag) for name in entries for tag in entries[name]])
+                db.commit()
+            finally:
+                db.close()
+
+    # reads back a database written by export_sqlite, only tables that are in the database are touched and only rows that
+    # differ from the current ones are replaced (each one as an edit so they can be undone)
+    # returns the number of changed rows per table
+    def import_sqlite(self, path: str) -> Dict[str, int]:
+        sys: ResourceSystem = ResourceSystem.get()
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        changed: Dict[str, int] = {}
+        with sys.tracer.span("RSDBMgr.import_sqlite", "rsdb", path=path):
+            db: sqlite3.Connection = sqlite3.connect(path)
+            try:
+                existing: List[str] = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+                types: Dict[str, Dict[str, str]] = {}
+                if "__Columns" in existing:
+                    for table, key, t in db.execute("SELECT TableName, Name, Type FROM __Columns ORDER BY TableName, Position"):
+                        types.setdefault(table, {})[key] = t
+                for name, table in self.resource_tables.items():
+                    if name not in existing:
+                        continue
+                    cursor: sqlite3.Cursor = db.execute(f"SELECT * FROM {quote(name)} ORDER BY __Index")
+                    keys: List[str] = [column[0] for column in cursor.description]
+                    decoders: List[Callable[[Any], Any] | None] = []
+                    for key in keys:
+                        if key == "__Index":
+                            decoders.append(None)
+                        elif key in types.get(name, {}):
+                            decoders.append(SQL_TYPES[types[name][key]][2])
+                        else:
+                            decoders.append(None) # column added in SQL, typed by whatever sqlite stored
+                    rows: List[oead.byml.Dictionary] = []
+                    for values in cursor:
+                        row: oead.byml.Dictionary = to_dict({})
+                        for key, value, decode in zip(keys, values, decoders):
+                            if value is None or key == "__Index":
+                                continue
+                            row[key] = decode(value) if decode is not None else self._infer_sql_value(value)
+                        rows.append(row)
+                    changed[name] = table.set_rows(rows)
+                if "TagList" in existing and "Tag" in existing:
+                    changed["Tag"] = self._import_tags(db, "TagPath" in existing)
+            finally:
+                db.close()
+        return changed
+
+    @staticmethod
+    def _infer_sql_value(value: Any) -> Any:
+        if isinstance(value, int):
+            return oead.S32(value)
+        if isinstance(value, float):
+            return oead.F32(value)
+        if isinstance(value, bytes):
+            return SQL_TYPES["Byml"][2](value)
+        return str(value)
+
+    def _import_tags(self, db: sqlite3.Connection, has_paths: bool) -> int:
+        tags: List[str] = [row[0] for row in db.execute("SELECT Tag FROM TagList ORDER BY Position")]
+        known: set = set(tags)
+        entries: Dict[str, Dict[str, List[str]]] = {"Actor" : {}, "Scene" : {}}
+        if has_paths:
+            for name, kind in db.execute("SELECT Name, Kind FROM TagPath"):
+                entries.setdefault(kind, {})[name] = []
+        # tags are kept in TagList order like they would be when read from the bit table
+        for name, kind, tag in db.execute("SELECT Tag.Name, Tag.Kind, Tag.Tag FROM Tag LEFT JOIN TagList ON TagList.Tag = Tag.Tag "
+                                          "ORDER BY Tag.Kind, Tag.Name, TagList.Position IS NULL, TagList.Position, Tag.Tag"):
+            if tag not in known:
+                known.add(tag)
+                tags.append(tag)
+            entry: List[str] = entries.setdefault(kind, {}).setdefault(name, [])
+            if tag not in entry:
+                entry.append(tag)
+        return int(self.tagtable.replace(tags, entries["Actor"], entries["Scene"]))
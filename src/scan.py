@@ -0,0 +1,53 @@
+from res import ResourceSystem
+
+import oead
+
+import os
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Iterator, List
+
+# Walks every actor pack (romfs + project, project takes priority) with the reads/decompression done on the
+# ResourceSystem's thread pool, only parsing happens on the calling thread
+class PackScanner:
+    PACK_DIR: str = "Pack/Actor"
+
+    def __init__(self, window: int = 64):
+        self.sys: ResourceSystem = ResourceSystem.get()
+        self.window: int = window # max number of packs in flight at once so memory doesn't blow up
+
+    # actor name -> full path of the pack that would actually get loaded
+    def pack_paths(self) -> Dict[str, str]:
+        paths: Dict[str, str] = {}
+        for root in (self.sys.romfs_path, self.sys.project_path):
+            directory: str = os.path.join(root, PackScanner.PACK_DIR)
+            if not root or not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.endswith(".pack.zs"):
+                    paths[entry.name[:-len(".pack.zs")]] = entry.path
+        return paths
+
+    # (mtime in ns, size) of each pack, used to check if an index is out of date
+    @staticmethod
+    def stat(path: str) -> List[int]:
+        stat: os.stat_result = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    # yields (actor name, full pack path, sarc) in the order given, packs that fail to load are skipped
+    def scan(self, paths: Dict[str, str]) -> Iterator[tuple[str, str, oead.Sarc]]:
+        names: List[str] = list(paths)
+        pending: deque[tuple[str, Future]] = deque()
+        index: int = 0
+        while index < len(names) or pending:
+            while index < len(names) and len(pending) < self.window:
+                pending.append((names[index], self.sys.executor.submit(self.sys._read_file, paths[names[index]])))
+                index += 1
+            name, future = pending.popleft()
+            try:
+                with self.sys.tracer.span("scan", "io", actor=name):
+                    sarc: oead.Sarc = oead.Sarc(future.result())
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"Failed to read {paths[name]}: {e}")
+                continue
+            yield name, paths[name], sarc
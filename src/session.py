@@ -0,0 +1,107 @@
+from journal import NUMBER_TYPES
+
+import oead
+
+import os
+import pickle
+import struct
+from typing import Any, Dict, List
+
+# Snapshot file for the whole parsed App state (see App.snapshot/App.restore)
+# Unpickling runs whatever the file says to so these are only ever read from the per-user cache directory (see
+# ResourceSystem.cache_dir), never from a project
+# Layout: header, info pickle (small, checked before anything else is loaded), state pickle, out-of-band buffers
+# The state is pickled with protocol 5 and every large buffer (numpy columns, BYML documents) is written out-of-band
+# after it so loading them back is just slicing the file instead of copying each one out of the pickle stream
+# oead types can't be pickled so containers are stored as BYML, which oead parses a lot faster than it decompresses
+# and parses the original files
+SESSION_MAGIC: bytes = b"ATSESS\0\0"
+SESSION_VERSION: int = 2
+SESSION_ALIGNMENT: int = 64
+
+# header: magic, version, buffer count, info size, state size
+HEADER: struct.Struct = struct.Struct("<8sIIQQ")
+
+def _load_byml(data: memoryview) -> Any:
+    return oead.byml.from_binary(data)
+
+# hash dictionaries and other values can't be the root of a document so they're wrapped in an array
+def _load_byml_value(data: memoryview) -> Any:
+    return oead.byml.from_binary(data)[0]
+
+class SessionPickler(pickle.Pickler):
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, (oead.byml.Dictionary, oead.byml.Array)):
+            return _load_byml, (pickle.PickleBuffer(oead.byml.to_binary(obj, False, 7)),)
+        if isinstance(obj, NUMBER_TYPES):
+            return type(obj), (obj.v,)
+        if isinstance(obj, (oead.byml.Hash32, oead.byml.Hash64)):
+            return _load_byml_value, (pickle.PickleBuffer(oead.byml.to_binary(oead.byml.Array([obj]), False, 7)),)
+        return NotImplemented
+
+# [mtime, size] of a file or None if it doesn't exist
+def file_stat(path: str) -> List[int] | None:
+    try:
+        stat: os.stat_result = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _align(offset: int) -> int:
+    return (offset + SESSION_ALIGNMENT - 1) // SESSION_ALIGNMENT * SESSION_ALIGNMENT
+
+def write_session(path: str, info: Dict[str, Any], state: Any) -> int:
+    buffers: List[pickle.PickleBuffer] = []
+    info_data: bytes = pickle.dumps(info, protocol=5)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path := f"{path}.{os.getpid()}.tmp", "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        f.write(info_data)
+        state_start: int = f.tell()
+        pickler: SessionPickler = SessionPickler(f, protocol=5, buffer_callback=buffers.append)
+        pickler.dump(state)
+        state_size: int = f.tell() - state_start
+        sizes: List[int] = [buffer.raw().nbytes for buffer in buffers]
+        f.write(struct.pack(f"<{len(sizes)}Q", *sizes))
+        for buffer in buffers:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(buffer.raw())
+        size: int = f.tell()
+        f.seek(0)
+        f.write(HEADER.pack(SESSION_MAGIC, SESSION_VERSION, len(buffers), len(info_data), state_size))
+    # written to the side first so a snapshot that failed halfway through (or is being written by another process too)
+    # never replaces a good one
+    os.replace(tmp_path, path)
+    return size
+
+# None if the file isn't a snapshot this version can read
+def read_session_info(path: str) -> Dict[str, Any] | None:
+    try:
+        with open(path, "rb") as f:
+            magic, version, count, info_size, state_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != SESSION_MAGIC or version != SESSION_VERSION:
+                return None
+            return pickle.loads(f.read(info_size))
+    except (OSError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+
+def read_session(path: str) -> Any:
+    # read in one go into a writable buffer, the numpy arrays are views into it and can still be edited in place
+    data: bytearray = bytearray(os.path.getsize(path))
+    with open(path, "rb") as f:
+        f.readinto(data)
+    view: memoryview = memoryview(data)
+    magic, version, count, info_size, state_size = HEADER.unpack_from(view)
+    if magic != SESSION_MAGIC or version != SESSION_VERSION:
+        raise ValueError(f"{path} is not a session snapshot")
+    offset: int = HEADER.size + info_size
+    state: memoryview = view[offset:offset + state_size]
+    offset += state_size
+    sizes: tuple = struct.unpack_from(f"<{count}Q", view, offset)
+    offset += 8 * count
+    buffers: List[memoryview] = []
+    for size in sizes:
+        offset = _align(offset)
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(state, buffers=buffers)
@@ -0,0 +1,55 @@
+import sys
+from typing import Dict, Iterable, List
+
+GLOBAL_STRINGPOOL_INSTANCE = None
+
+# Shared pool for strings that get created over and over (actor names, tags, component ref paths, flag names, etc.)
+# Every string read out of an oead container is a new object so keeping them around as-is means one copy per use
+# Pooled strings are sys.intern'd so they also compare by identity first and hash only once
+# Keeps counts per subsystem so report() can show what the pool is actually saving
+class StringPool:
+    @classmethod
+    def get(cls) -> "StringPool":
+        global GLOBAL_STRINGPOOL_INSTANCE
+        if GLOBAL_STRINGPOOL_INSTANCE is None:
+            GLOBAL_STRINGPOOL_INSTANCE = cls()
+        return GLOBAL_STRINGPOOL_INSTANCE
+
+    def __init__(self):
+        self.enabled: bool = True
+        self._stats: Dict[str, List[int]] = {} # subsystem -> [lookups, duplicates, bytes saved]
+
+    def intern(self, string: str, subsystem: str = "") -> str:
+        if not self.enabled or type(string) is not str:
+            return string
+        pooled: str = sys.intern(string)
+        stats: List[int] = self._stats.setdefault(subsystem, [0, 0, 0])
+        stats[0] += 1
+        if pooled is not string: # the copy that was passed in can now be freed
+            stats[1] += 1
+            stats[2] += sys.getsizeof(string)
+        return pooled
+
+    def intern_all(self, strings: Iterable[str], subsystem: str = "") -> List[str]:
+        return [self.intern(string, subsystem) for string in strings]
+
+    def reset_stats(self) -> None:
+        self._stats.clear()
+
+    # subsystem -> lookups, duplicates (strings that were already in the pool) and the bytes those duplicates took up
+    def report(self) -> Dict[str, Dict[str, int]]:
+        return {subsystem: {"lookups" : stats[0], "duplicates" : stats[1], "bytes_saved" : stats[2]}
+                for subsystem, stats in sorted(self._stats.items())}
+
+    def format_report(self) -> str:
+        report: Dict[str, Dict[str, int]] = self.report()
+        lines: List[str] = [f"{'Subsystem':<16}{'Lookups':>12}{'Duplicates':>12}{'Saved':>12}"]
+        for subsystem, stats in report.items():
+            lines.append(f"{subsystem or '<none>':<16}{stats['lookups']:>12}{stats['duplicates']:>12}{stats['bytes_saved'] / 1024:>10.1f}KB")
+        total: int = sum(stats["bytes_saved"] for stats in report.values())
+        lines.append(f"{'Total':<16}{'':>24}{total / 1024:>10.1f}KB")
+        return "\n".join(lines)
+
+# module level shortcut
+def pooled(string: str, subsystem: str = "") -> str:
+    return StringPool.get().intern(string, subsystem)
@@ -1,3 +1,4 @@
+from instrument import Tracer
 from res import ResourceSystem
 from utils import *
 
@@ -14,14 +15,15 @@ class TypedParam:
 
     def __init__(self, data: oead.byml.Dictionary, ext: str):
         self._ext: str = ext.replace(".bgyml", "").replace(".", "")
-        self.data: oead.byml.Dictionary = TypedParam.resolve_typed_param(data, self._ext)
+        with Tracer.get().span("resolve", "typedparam", type=self._ext):
+            self.data: oead.byml.Dictionary = TypedParam.resolve_typed_param(data, self._ext)
 
     @lru_cache
     @staticmethod
     def load_default(ext: str) -> oead.byml.Dictionary:
         path: str = f"res/TypedParam/{ext}.bgyml"
         if os.path.exists(path):
-            return oead.byml.from_binary(Path(path).read_bytes())
+            return parse_byml(Path(path).read_bytes())
         return to_dict({})
 
     @classmethod
@@ -29,7 +31,7 @@ class TypedParam:
         if "$parent" not in data:
             parent = copy_dict(cls.load_default(ext))
         else:
-            parent = cls.resolve_typed_param(oead.byml.from_binary(ResourceSystem.get().load_file(data["$parent"])), ext)
+            parent = cls.resolve_typed_param(parse_byml(ResourceSystem.get().load_file(data["$parent"])), ext)
         for prop in cls.classes[ext]["Props"]:
             if prop not in data:
                 data[prop] = parent[prop]
@@ -87,4 +89,4 @@ class TypedParam:
         return self._ext
     
     def serialize(self) -> bytes:
-        return oead.byml.to_binary(self.data, False, 7)
\ No newline at end of file
+        return serialize_byml(self.data)
\ No newline at end of file
@@ -1,3 +1,6 @@
+from byml import LazyNode, from_binary_lazy, to_binary_lazy
+from instrument import Tracer
+
 import oead
 
 import os
@@ -7,17 +10,48 @@ def to_dict(d: dict) -> oead.byml.Dictionary:
     return oead.byml.Dictionary(d)
 
 def copy_dict(d: oead.byml.Dictionary) -> oead.byml.Dictionary:
+    if isinstance(d, LazyNode):
+        d = d.to_oead()
+    elif hasattr(d, "raw"): # journal-tracked rows
+        d = d.raw
     return oead.byml.Dictionary(dict(d)) # casting to a pydict here is necessary
 
 def to_array(a: list) -> oead.byml.Array:
     return oead.byml.Array(a)
 
 def copy_array(a: oead.byml.Array) -> oead.byml.Array:
+    if isinstance(a, LazyNode):
+        a = a.to_oead()
+    elif hasattr(a, "raw"):
+        a = a.raw
     return oead.byml.Array(a)
 
 def concat_array(a: oead.byml.Array, b: oead.byml.Array) -> oead.byml.Array:
     return oead.byml.Array(list(a) + list(b))
 
+# what parsing a broken file can raise
+BYML_ERRORS: tuple = (oead.InvalidDataError, ValueError, RuntimeError)
+
+# oead.byml.from_binary/to_binary with timing spans
+def parse_byml(data: bytes) -> Any:
+    with Tracer.get().span("parse", "byml", bytes=len(data)):
+        return oead.byml.from_binary(data)
+
+# only decodes the parts of the document that actually get accessed, see byml.LazyNode
+def parse_byml_lazy(data: bytes) -> Any:
+    with Tracer.get().span("parse_lazy", "byml", bytes=len(data)):
+        return from_binary_lazy(data)
+
+# lazily loaded documents only re-encode what changed (see byml.BymlSplicer)
+def serialize_byml(data: Any, big_endian: bool = False, version: int = 7) -> bytes:
+    with Tracer.get().span("serialize", "byml") as span:
+        if isinstance(data, LazyNode):
+            output: bytes = to_binary_lazy(data, big_endian, version)
+        else:
+            output = oead.byml.to_binary(data, big_endian, version)
+        span.set(bytes=len(output))
+        return output
+
 # for things with double extensions (like .pack.zs or .engine__actor__ActorParam.bgyml)
 def name_no_ext(path: str) -> str:
     return os.path.splitext(os.path.splitext(os.path.basename(path))[0])[0]
@@ -0,0 +1,199 @@
+from app import App, AppCache
+from instrument import Tracer
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, List
+
+GLOBAL_APPWORKER_INSTANCE = None
+
+# not an Exception so the places that skip over files that fail to load (like PackScanner.scan) don't swallow it
+class JobCancelled(BaseException):
+    pass
+
+# A piece of work for the AppWorker, the worker thread updates it and the UI reads it (poll() gives the progress events
+# in order, progress/message/status are always the latest)
+# Progress is split into phases by the job itself, within a phase every file that gets decompressed/parsed/compressed/
+# written moves the bar a bit closer to the end of the phase
+class Job:
+    QUEUED: str = "Queued"
+    RUNNING: str = "Running"
+    DONE: str = "Done"
+    FAILED: str = "Failed"
+    CANCELLED: str = "Cancelled"
+
+    # span name -> what gets shown for it
+    FILE_EVENTS: Dict[str, str] = {
+        "decompress" : "Decompressing",
+        "parse" : "Parsing",
+        "compress" : "Compressing",
+        "write" : "Writing",
+        "scan" : "Scanning"
+    }
+
+    def __init__(self, name: str, project_path: str, romfs_path: str, func: Callable[["Job", App], Any]):
+        self.name: str = name
+        self.project_path: str = project_path
+        self.romfs_path: str = romfs_path
+        self.func: Callable[[Job, App], Any] = func
+        self.status: str = Job.QUEUED
+        self.progress: float = 0.0
+        self.message: str = ""
+        self.result: Any = None
+        self.error: Exception | None = None
+        self.cancellable: bool = True # turned off once the job starts writing files, it can't be stopped halfway through that
+        self._phase_end: float = 0.0
+        self._events: queue.Queue = queue.Queue() # (progress, message)
+        self._lock: threading.Lock = threading.Lock()
+        self._cancel: threading.Event = threading.Event()
+        self._done: threading.Event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def is_cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    # takes effect at the next file/span boundary (unless the job has started writing), everything the job changed in
+    # memory gets undone
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    # progress events since the last call
+    def poll(self) -> List[tuple[float, str]]:
+        events: List[tuple[float, str]] = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def report(self, progress: float, message: str) -> None:
+        with self._lock:
+            self.progress = min(max(progress, self.progress), 1.0)
+            self.message = message
+            self._events.put((self.progress, message))
+
+    def phase(self, start: float, end: float, message: str) -> None:
+        self.check()
+        self._phase_end = end
+        self.report(start, message)
+
+    def check(self) -> None:
+        if self.cancellable and self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    # Tracer listener, runs on whatever thread the span ended on
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        if (verb := Job.FILE_EVENTS.get(event["name"])) is not None and event["ph"] == "X":
+            target: str = event["args"].get("path") or event["args"].get("actor", "")
+            self.report(self.progress + (self._phase_end - self.progress) * 0.05, f"{verb} {os.path.basename(target)}")
+        self.check()
+
+    def _finish(self, status: str, message: str) -> None:
+        self.status = status
+        self.report(1.0 if status == Job.DONE else self.progress, message)
+        self._done.set()
+
+# Runs App work (loading, copying, saving, indexing) on a background thread so the UI keeps drawing, jobs run one at a
+# time in the order they were submitted
+# Apps are kept loaded between jobs (see AppCache) so only the first job for a romfs has to load everything
+class AppWorker:
+    @classmethod
+    def get(cls) -> "AppWorker":
+        global GLOBAL_APPWORKER_INSTANCE
+        if GLOBAL_APPWORKER_INSTANCE is None:
+            GLOBAL_APPWORKER_INSTANCE = cls()
+        return GLOBAL_APPWORKER_INSTANCE
+
+    # how much of the progress bar loading takes up when the App has to be opened
+    LOAD_PHASE: float = 0.4
+
+    def __init__(self):
+        self.app: App | None = None
+        self.current: Job | None = None
+        self._jobs: queue.Queue = queue.Queue() # None stops the thread
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="AppWorker", daemon=True)
+        self._thread.start()
+
+    # func gets the job (to report progress with) and the loaded App, whatever it returns ends up in job.result
+    def submit(self, name: str, project_path: str, romfs_path: str, func: Callable[[Job, App], Any]) -> Job:
+        job: Job = Job(name, project_path, romfs_path, func)
+        self._jobs.put(job)
+        return job
+
+    def stop(self) -> None:
+        if self.current is not None:
+            self.current.cancel()
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while (job := self._jobs.get()) is not None:
+            self.current = job
+            self._run_job(job)
+            self.current = None
+
+    def _open(self, job: Job) -> App:
+        cache: AppCache = AppCache.get()
+        if cache.find(job.project_path, job.romfs_path) is None:
+            job.phase(0.0, AppWorker.LOAD_PHASE, "Loading romfs and project")
+        try:
+            self.app = cache.open(job.project_path, job.romfs_path)
+        except JobCancelled:
+            # whatever was loaded so far has already replaced the global instances
+            if self.app is not None and cache.find(self.app.sys.project_path, self.app.sys.romfs_path, self.app.compact_rsdb) is self.app:
+                self.app._set_instances()
+            else:
+                self.app = None
+            raise
+        return self.app
+
+    # False (with job.error set) if the job made more edits than the journal keeps, whatever it changed after those is
+    # still in memory and would go out with the next save
+    @staticmethod
+    def _rewind(job: Job, app: App, position: int) -> bool:
+        try:
+            app.journal.rewind(position)
+        except ValueError as e:
+            job.error = e
+            print(f"{job.name} could not be undone: {e}")
+            return False
+        return True
+
+    def _run_job(self, job: Job) -> None:
+        tracer: Tracer = Tracer.get()
+        tracer.add_listener(job._on_event)
+        job.status = Job.RUNNING
+        app: App | None = None
+        position: int = 0
+        try:
+            if job.is_cancel_requested:
+                raise JobCancelled(job.name)
+            app = self._open(job)
+            position = app.journal.position
+            job.result = job.func(job, app)
+            job._finish(Job.DONE, f"{job.name} finished")
+        except JobCancelled:
+            job.cancellable = False # undoing can end spans too
+            if app is not None and not self._rewind(job, app, position):
+                job._finish(Job.CANCELLED, f"{job.name} cancelled, but some of its changes could not be undone")
+            else:
+                job._finish(Job.CANCELLED, f"{job.name} cancelled")
+        except Exception as e:
+            # same as cancelling, a copy that failed halfway through shouldn't get saved with the next one
+            job.cancellable = False
+            print(f"{job.name} failed: {type(e).__name__}: {e}")
+            if app is not None and not self._rewind(job, app, position):
+                job._finish(Job.FAILED, f"{job.name} failed: {e} (some of its changes could not be undone)")
+            else:
+                job.error = e
+                job._finish(Job.FAILED, f"{job.name} failed: {e}")
+        finally:
+            tracer.remove_listener(job._on_event)
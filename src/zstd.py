@@ -1,6 +1,9 @@
 import zstandard
 from oead import Sarc
 
+import mmap
+import os
+import threading
 from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
@@ -12,11 +15,18 @@ class ZstdContext:
     DICT_TYPE_BCETT: int = 2
     DICT_TYPE_PACK: int = 3
 
+    # compressed files at least this big are mapped instead of read so there's no intermediate copy of the compressed
+    # data and the pages are only read in as the decompressor gets to them
+    MMAP_THRESHOLD: int = 0x100000
+
     @lru_cache
     def __init__(self, dict_path: str = ""):
         decompressor_none: zstandard.ZstdDecompressor = zstandard.ZstdDecompressor()
         archive: Sarc = Sarc(decompressor_none.decompress(Path(dict_path).read_bytes()))
         dicts: Dict[str, zstandard.ZstdCompressionDict] = {f.name: zstandard.ZstdCompressionDict(f.data) for f in archive.get_files()}
+        self._dicts: Dict[str, zstandard.ZstdCompressionDict] = dicts
+        self._main_thread: int = threading.get_ident()
+        self._local: threading.local = threading.local()
         self.decompressors: List[zstandard.ZstdDecompressor] = [
             decompressor_none, # redundant but left in so the indices line up
             zstandard.ZstdDecompressor(dict_data = dicts["zs.zsdic"]),
@@ -30,20 +40,51 @@ class ZstdContext:
             zstandard.ZstdCompressor(level = 22, dict_data = dicts["pack.zsdic"], write_dict_id = True, write_content_size = True)
         ]
     
+    # zstandard (de)compressors can't be shared between threads so other threads get their own set
+    def get_decompressors(self) -> List[zstandard.ZstdDecompressor]:
+        if threading.get_ident() == self._main_thread:
+            return self.decompressors
+        if not hasattr(self._local, "decompressors"):
+            self._local.decompressors = [
+                zstandard.ZstdDecompressor(),
+                zstandard.ZstdDecompressor(dict_data = self._dicts["zs.zsdic"]),
+                zstandard.ZstdDecompressor(dict_data = self._dicts["bcett.byml.zsdic"]),
+                zstandard.ZstdDecompressor(dict_data = self._dicts["pack.zsdic"])
+            ]
+        return self._local.decompressors
+
+    def get_compressors(self) -> List[zstandard.ZstdCompressor]:
+        if threading.get_ident() == self._main_thread:
+            return self.compressors
+        if not hasattr(self._local, "compressors"):
+            self._local.compressors = [
+                zstandard.ZstdCompressor(level = 22),
+                zstandard.ZstdCompressor(level = 22, dict_data = self._dicts["zs.zsdic"], write_dict_id = True, write_content_size = True),
+                zstandard.ZstdCompressor(level = 22, dict_data = self._dicts["bcett.byml.zsdic"], write_dict_id = True, write_content_size = True),
+                zstandard.ZstdCompressor(level = 22, dict_data = self._dicts["pack.zsdic"], write_dict_id = True, write_content_size = True)
+            ]
+        return self._local.compressors
+
     def decompress_file(self, filepath: str) -> bytes:
         if not(filepath.endswith(".zs") or filepath.endswith(".zstd")):
             return Path(filepath).read_bytes()
-        data: bytes = Path(filepath).read_bytes()
-        return self.decompressors[self.get_dict_id(data)].decompress(data)
+        with open(filepath, "rb") as f:
+            if os.fstat(f.fileno()).st_size < ZstdContext.MMAP_THRESHOLD:
+                data: bytes = f.read()
+                return self.get_decompressors()[self.get_dict_id(data)].decompress(data)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise"): # not available on Windows
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                return self.get_decompressors()[self.get_dict_id(mapped)].decompress(mapped)
     
     def compress_file(self, filepath: str, dict_id: int) -> bytes:
-        return self.compressors[dict_id].compress(Path(filepath).read_bytes())
+        return self.get_compressors()[dict_id].compress(Path(filepath).read_bytes())
     
     def decompress(self, data: bytes) -> bytes:
-        return self.decompressors[self.get_dict_id(data)].decompress(data)
+        return self.get_decompressors()[self.get_dict_id(data)].decompress(data)
     
     def compress(self, data: bytes, dict_id: int) -> bytes:
-        return self.compressors[dict_id].compress(data)
+        return self.get_compressors()[dict_id].compress(data)
 
     @staticmethod
     def get_dict_id(data: bytes) -> int:
@@ -0,0 +1,118 @@
+import os
+import sys
+
+import oead
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from byml import BymlSplicer, LazyDict, from_binary_lazy, to_binary_lazy
+
+from typing import Any
+
+# Round trips through BymlSplicer, every spliced document has to parse to the same thing oead writes for it
+
+# these documents are tiny so anything appended would go past the limit and get the whole file rewritten
+@pytest.fixture(autouse=True)
+def no_growth_limit(monkeypatch):
+    monkeypatch.setattr(BymlSplicer, "MAX_GROWTH", 100.0)
+
+def make_params() -> oead.byml.Dictionary:
+    return oead.byml.Dictionary({"Scale": oead.F32(1.0), "Tags": oead.byml.Array(["A", "B"])})
+
+def make_doc() -> oead.byml.Dictionary:
+    return oead.byml.Dictionary({
+        "Actors": oead.byml.Array([
+            oead.byml.Dictionary({"Name": "Enemy_Bokoblin", "Hp": oead.S32(13), "Params": make_params()}),
+            oead.byml.Dictionary({"Name": "Enemy_Moblin", "Hp": oead.S32(60), "Params": make_params()}),
+        ]),
+        "Count": oead.U32(2),
+        "Version": oead.S64(1 << 40),
+    })
+
+def load(doc: Any) -> tuple[bytes, LazyDict]:
+    data: bytes = oead.byml.to_binary(doc, False, 7)
+    root: Any = from_binary_lazy(data)
+    assert isinstance(root, LazyDict)
+    return data, root
+
+def write(root: LazyDict) -> bytes:
+    return to_binary_lazy(root, False, root.reader.version)
+
+# splices directly (so a fallback to a full write can't hide a broken splice) and checks it against oead
+def check_splice(root: LazyDict, expected: oead.byml.Dictionary) -> bytes:
+    data: bytes = BymlSplicer(root).write()
+    assert oead.byml.from_binary(data) == oead.byml.from_binary(oead.byml.to_binary(expected, False, 7))
+    assert write(root) == data
+    return data
+
+def test_clean_document_is_returned_as_is():
+    data, root = load(make_doc())
+    assert root["Actors"][1]["Params"]["Tags"][0] == "A"
+    assert not root.is_dirty
+    assert write(root) is data
+
+def test_new_root_key():
+    doc: oead.byml.Dictionary = make_doc()
+    data, root = load(doc)
+    root["AAA_First"] = "new"
+    root["Zone"] = oead.byml.Dictionary({"Id": oead.U32(7), "Name": "Enemy_Bokoblin"})
+    doc["AAA_First"] = "new"
+    doc["Zone"] = oead.byml.Dictionary({"Id": oead.U32(7), "Name": "Enemy_Bokoblin"})
+    spliced: bytes = check_splice(root, doc)
+    assert len(spliced) > len(data)
+    assert spliced[16:32] == data[16:32] # the untouched nodes stay where they were
+
+def test_nested_edit():
+    doc: oead.byml.Dictionary = make_doc()
+    data, root = load(doc)
+    root["Actors"][0]["Hp"] = oead.S32(20)
+    root["Actors"][1]["Params"]["Tags"].append("C")
+    doc["Actors"][0]["Hp"] = oead.S32(20)
+    doc["Actors"][1]["Params"]["Tags"].append("C")
+    check_splice(root, doc)
+
+def test_shared_subtree():
+    doc: oead.byml.Dictionary = make_doc()
+    data, root = load(doc)
+    # oead writes identical containers once so both actors point to the same Params node
+    assert root["Actors"][0]["Params"].offset == root["Actors"][1]["Params"].offset
+    root["Actors"][0]["Params"]["Scale"] = oead.F32(2.0)
+    doc["Actors"][0]["Params"]["Scale"] = oead.F32(2.0)
+    check_splice(root, doc)
+    assert oead.byml.from_binary(write(root))["Actors"][1]["Params"]["Scale"] == oead.F32(1.0)
+
+def test_undo_restores_original_bytes():
+    data, root = load(make_doc())
+    actor: Any = root["Actors"][0]
+    actor["Hp"] = oead.S32(99)
+    del actor["Name"]
+    root["Extra"] = oead.byml.Array([oead.S32(1)])
+    assert root.is_dirty
+    actor["Hp"] = oead.S32(13)
+    actor["Name"] = "Enemy_Bokoblin"
+    del root["Extra"]
+    assert not root.is_dirty
+    assert write(root) is data
+
+def test_undo_back_to_a_different_type_stays_dirty():
+    doc: oead.byml.Dictionary = make_doc()
+    data, root = load(doc)
+    root["Count"] = oead.S32(2)
+    doc["Count"] = oead.S32(2)
+    assert root.is_dirty
+    check_splice(root, doc)
+
+def test_reading_hash_dictionary_keeps_document_clean():
+    doc: oead.byml.Dictionary = make_doc()
+    doc["Flags"] = oead.byml.Hash32({0x1234: oead.S32(1), 0x5678: "On"})
+    data, root = load(doc)
+    assert root["Flags"][0x1234] == oead.S32(1)
+    assert not root.is_dirty
+    assert write(root) is data
+    # the clean hash dictionary is reused when something else changes
+    root["Count"] = oead.U32(3)
+    doc["Count"] = oead.U32(3)
+    check_splice(root, doc)
+    root["Flags"][0x1234] = oead.S32(2)
+    assert root.is_dirty